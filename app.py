@@ -1,10 +1,78 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, g, Response
+import csv
+import io
+import itertools
+import logging
 import os
+import time
+from datetime import datetime
+from werkzeug.exceptions import RequestEntityTooLarge
 import db_manager
 import external_api
+import json_codec
+import metrics
+import note_ingest
+import singleflight
+import stock_promotion
+from config import (NOTES_PAGE_SIZE, NOTES_PAGE_MAX_SIZE, NOTES_BULK_MAX_ROWS, NOTES_BULK_MAX_BYTES,
+                    NOTES_CHANGES_POLL_INTERVAL,
+                    STOCK_PROMOTION_ENABLED, METRICS_ENABLED)
+from log_config import setup_logging
+from notes_cache import notes_cache
+from stock_cache import stock_directory
+
+setup_logging()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key_here'
+# 請求內容上限：超過時在讀取前拒絕（批次匯入以外的表單遠小於此值）
+app.config['MAX_CONTENT_LENGTH'] = NOTES_BULK_MAX_BYTES
+# jsonify 以 orjson 序列化（未安裝時與 Flask 預設相同）
+app.json = json_codec.FastJSONProvider(app)
+
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+
+def _observe_request(status):
+    start = g.pop('request_start', None)
+    if start is None:
+        return
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.HTTP_REQUEST_DURATION.observe(time.perf_counter() - start,
+                                          method=request.method, route=route, status=status)
+
+
+@app.after_request
+def _record_request(response):
+    _observe_request(response.status_code)
+    return response
+
+
+@app.teardown_request
+def _record_failed_request(exc):
+    # 未處理的例外不會經過 after_request，以 500 記錄
+    _observe_request(500)
+
+
+def _get_page_limit():
+    """從 URL 取得每頁筆數，限制在 1 ~ NOTES_PAGE_MAX_SIZE 之間"""
+    limit = request.args.get('limit', type=int) or NOTES_PAGE_SIZE
+    return max(1, min(limit, NOTES_PAGE_MAX_SIZE))
+
+
+def _get_notes_format():
+    """筆記列表的回應格式：notes（預設，每筆為一個物件）或 columns（欄位名稱只列一次的 {columns, rows}）"""
+    return 'columns' if request.args.get('format') == 'columns' else 'notes'
+
+
+def _revalidate(response):
+    """要求瀏覽器每次都以 If-None-Match 重新驗證（瀏覽器會自動送出並在 304 時沿用快取內容）"""
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 
 @app.route('/', methods=['GET'])
@@ -15,48 +83,113 @@ def index():
         sort_by = request.args.get('sort_by', 'created_at')
         sort_order = request.args.get('sort_order', 'DESC')
 
-        # 呼叫更新後的函式
-        notes = db_manager.get_all_notes(search_term, sort_by, sort_order)
+        # 先取得變更游標再查詢（行程內快取），查詢期間的變更會在之後的同步中再次返回（前端重複套用無妨）
+        changes_cursor = db_manager.current_changes_cursor()
+
+        # 只渲染第一頁，其餘由前端捲動時透過 /api/notes 載入
+        page = db_manager.get_notes_page(search_term, sort_by, sort_order, limit=NOTES_PAGE_SIZE)
         
         # 將參數傳給模板，以便在介面上顯示當前狀態
         return render_template('index.html', 
-                               notes=notes, 
+                               notes=page['notes'], 
+                               next_cursor=page['next_cursor'],
                                search_term=search_term,
-                               sort_by=sort_by,
-                               sort_order=sort_order)
+                               sort_by=page['sort_by'],
+                               sort_order=page['sort_order'],
+                               changes_cursor=changes_cursor,
+                               changes_poll_interval=NOTES_CHANGES_POLL_INTERVAL)
     except Exception as e:
-        print(f"主頁加載錯誤: {e}")
+        logger.exception("主頁加載錯誤: %s", e)
         flash('加載數據時發生錯誤', 'error')
-        return render_template('index.html', notes=[])
+        return render_template('index.html', notes=[], next_cursor=None, search_term='',
+                               sort_by='created_at', sort_order='DESC')
 
 # --- 新增 API 路由 ---
 
 @app.route('/api/notes', methods=['GET'])
 def api_get_notes():
-    """API 路由：獲取筆記列表（支援搜尋和排序）"""
+    """API 路由：獲取筆記列表（支援搜尋、排序和游標分頁）"""
     try:
         search_term = request.args.get('search', '').strip()
         sort_by = request.args.get('sort_by', 'created_at')
         sort_order = request.args.get('sort_order', 'DESC')
+        after = request.args.get('after', '').strip() or None
+        limit = _get_page_limit()
+        notes_format = _get_notes_format()
+
+        # 先讀版本再查詢：查詢期間有寫入時，返回的 ETag 較舊，下次請求只會多查一次
+        etag = None
+        data_version = db_manager.get_notes_version()
+        if data_version is not None:
+            notes_cache.observe(data_version)
+            etag = notes_cache.etag(data_version, search_term, sort_by, sort_order, after, limit, notes_format)
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                return _revalidate(response)
 
-        notes = db_manager.get_all_notes(search_term, sort_by, sort_order)
+        try:
+            page = db_manager.get_notes_page(search_term, sort_by, sort_order, after=after, limit=limit)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': '無效的分頁游標',
+                'message': str(e)
+            }), 400
         
-        return jsonify({
+        data = {
             'success': True,
-            'notes': notes,
-            'total': len(notes),
+            'notes': page['notes'],
+            'total': len(page['notes']),
+            'next_cursor': page['next_cursor'],
+            'has_more': page['has_more'],
+            'limit': limit,
             'search_term': search_term,
-            'sort_by': sort_by,
-            'sort_order': sort_order
-        })
+            'sort_by': page['sort_by'],
+            'sort_order': page['sort_order']
+        }
+        if notes_format == 'columns':
+            data.update(db_manager.notes_to_columns(data.pop('notes')))
+        response = jsonify(data)
+        if etag is not None:
+            response.set_etag(etag)
+        return _revalidate(response)
     except Exception as e:
-        print(f"API 獲取筆記錯誤: {e}")
+        logger.exception("API 獲取筆記錯誤: %s", e)
         return jsonify({
             'success': False,
             'error': '獲取筆記時發生錯誤',
             'message': str(e)
         }), 500
 
+@app.route('/api/notes/changes', methods=['GET'])
+def api_get_note_changes():
+    """
+    API 路由：增量同步
+    返回游標（since）之後新增/修改的筆記與已刪除的筆記ID；未提供 since 時只返回目前的游標
+    """
+    try:
+        since = request.args.get('since', '').strip() or None
+        limit = _get_page_limit()
+
+        try:
+            changes = db_manager.get_note_changes(since, limit=limit)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': '無效的變更游標',
+                'message': str(e)
+            }), 400
+
+        return jsonify(dict(changes, success=True))
+    except Exception as e:
+        logger.exception("API 獲取筆記變更錯誤: %s", e)
+        return jsonify({
+            'success': False,
+            'error': '獲取筆記變更時發生錯誤',
+            'message': str(e)
+        }), 500
+
 @app.route('/api/notes/<int:note_id>', methods=['GET'])
 def api_get_note(note_id):
     """API 路由：獲取單一筆記"""
@@ -64,23 +197,191 @@ def api_get_note(note_id):
         note = db_manager.get_note_by_id(note_id)
         
         if note:
-            return jsonify({
+            response = jsonify({
                 'success': True,
-                'note': note
+                'note': db_manager.format_note_times(dict(note), ('updated_at',))
             })
+            # ETag 依內容計算（股票更名時也會改變）；Last-Modified 取自筆記的 updated_at（本地時間）
+            response.add_etag()
+            response.last_modified = note['updated_at'].astimezone()
+            return _revalidate(response).make_conditional(request)
         else:
             return jsonify({
                 'success': False,
                 'error': '找不到該筆記'
             }), 404
     except Exception as e:
-        print(f"API 獲取筆記錯誤: {e}")
+        logger.exception("API 獲取筆記錯誤: %s", e)
         return jsonify({
             'success': False,
             'error': '獲取筆記時發生錯誤',
             'message': str(e)
         }), 500
 
+@app.route('/api/notes/bulk', methods=['POST'])
+def api_bulk_add_notes():
+    """
+    API 路由：批次新增筆記
+    請求內容為 JSON 陣列（或 {"notes": [...]}），或 Content-Type 為 application/x-ndjson 的 NDJSON
+    NDJSON 逐行讀取，超過 NOTES_BULK_MAX_ROWS 筆時不再讀取其餘內容；請求內容超過 NOTES_BULK_MAX_BYTES 時返回 413
+    返回每筆資料的驗證/寫入結果與處理速度
+    """
+    try:
+        if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            # 多讀一筆即可判斷是否超過上限
+            rows = list(itertools.islice(note_ingest.iter_ndjson(request.stream), NOTES_BULK_MAX_ROWS + 1))
+        else:
+            payload = request.get_json(silent=True)
+            if isinstance(payload, dict):
+                payload = payload.get('notes')
+            if not isinstance(payload, list):
+                return jsonify({
+                    'success': False,
+                    'error': '請求內容必須是筆記陣列或 NDJSON'
+                }), 400
+            rows = payload
+
+        if len(rows) > NOTES_BULK_MAX_ROWS:
+            return jsonify({
+                'success': False,
+                'error': f'單次最多匯入 {NOTES_BULK_MAX_ROWS} 筆'
+            }), 413
+
+        summary = note_ingest.ingest_notes(rows)
+        summary['success'] = summary['failed'] == 0
+        return jsonify(summary)
+    except RequestEntityTooLarge:
+        return jsonify({
+            'success': False,
+            'error': f'請求內容超過 {NOTES_BULK_MAX_BYTES} 位元組'
+        }), 413
+    except Exception as e:
+        logger.exception("API 批次新增筆記錯誤: %s", e)
+        return jsonify({
+            'success': False,
+            'error': '批次新增筆記時發生錯誤',
+            'message': str(e)
+        }), 500
+
+# 匯出欄位（順序即 CSV 欄位順序）
+EXPORT_COLUMNS = ('id', 'stock_code', 'stock_name', 'note_type', 'content', 'ref', 'ref_time', 'created_at')
+
+
+def _export_ndjson(batches):
+    # 與 /api/notes 相同以 json_codec 序列化（orjson 可用時使用 orjson，日期時間等型別的輸出也相同）
+    for notes in batches:
+        yield b''.join(json_codec.dumps(note) + b'\n' for note in notes)
+
+
+def _export_error(export_format, message):
+    """匯出中斷時最後送出的一行（NDJSON 為 {"error": ...}，CSV 為 id 欄位是 #error 的資料列）"""
+    if export_format == 'csv':
+        buffer = io.StringIO()
+        csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS).writerow({'id': '#error', 'content': message})
+        return buffer.getvalue()
+    return json_codec.dumps({'error': message}) + b'\n'
+
+
+def _export_guarded(chunks, export_format):
+    """
+    送出匯出內容；中途發生錯誤時狀態碼已送出無法更改，改為記錄錯誤並在最後送出錯誤行，
+    客戶端才能判斷匯出不完整
+    """
+    try:
+        yield from chunks
+    except Exception as e:
+        logger.exception("匯出筆記中斷: %s", e)
+        yield _export_error(export_format, f'匯出未完成: {e}')
+
+
+def _export_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction='ignore')
+    # 加上 BOM，Excel 才能辨識 UTF-8；scripts/import_notes.py 讀取時會略過
+    buffer.write('\ufeff')
+    writer.writeheader()
+    for notes in batches:
+        writer.writerows(notes)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # 沒有任何筆記時仍送出標題列
+        yield buffer.getvalue()
+
+
+@app.route('/api/notes/export', methods=['GET'])
+def api_export_notes():
+    """
+    API 路由：匯出筆記（format=ndjson 或 csv），搜尋與排序參數同 /api/notes
+    以產生器逐批讀取並送出，記憶體用量與筆記數量無關；送出後才失敗時以最後一行錯誤標示匯出不完整
+    """
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({
+            'success': False,
+            'error': 'format 必須是 ndjson 或 csv'
+        }), 400
+
+    search_term = request.args.get('search', '').strip()
+    sort_by = request.args.get('sort_by', 'created_at')
+    sort_order = request.args.get('sort_order', 'DESC')
+    batches = db_manager.iter_notes(search_term, sort_by, sort_order)
+    chunks = _export_csv(batches) if export_format == 'csv' else _export_ndjson(batches)
+
+    # 先讀取第一批：連線或查詢失敗時仍可返回錯誤狀態碼
+    try:
+        first = next(chunks, '')
+    except Exception as e:
+        logger.exception("匯出筆記錯誤: %s", e)
+        return jsonify({
+            'success': False,
+            'error': '匯出筆記時發生錯誤',
+            'message': str(e)
+        }), 500
+
+    body = _export_guarded(itertools.chain([first], chunks), export_format)
+    if export_format == 'csv':
+        response = Response(body, mimetype='text/csv')
+    else:
+        response = Response(body, mimetype='application/x-ndjson')
+    filename = f"stock_notes_{datetime.now():%Y%m%d_%H%M%S}.{export_format}"
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@app.route('/api/stocks/<stock_code>/summary', methods=['GET'])
+def api_get_stock_summary(stock_code):
+    """API 路由：單一股票的筆記統計（各類型筆數、最後筆記時間、常用來源），由摘要表讀取"""
+    try:
+        summary = db_manager.get_stock_summary(stock_code.strip())
+        if summary is None:
+            return jsonify({
+                'success': False,
+                'error': '找不到該股票'
+            }), 404
+        return jsonify({'success': True, 'summary': summary})
+    except Exception as e:
+        logger.exception("API 獲取股票筆記統計錯誤: %s", e)
+        return jsonify({
+            'success': False,
+            'error': '獲取股票筆記統計時發生錯誤',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/refs', methods=['GET'])
+def api_get_refs():
+    """API 路由：最常用的來源及其筆數（limit 預設 10，上限 100）"""
+    try:
+        limit = max(1, min(request.args.get('limit', type=int) or 10, 100))
+        return jsonify({'success': True, 'refs': db_manager.get_ref_stats(limit)})
+    except Exception as e:
+        logger.exception("API 獲取來源統計錯誤: %s", e)
+        return jsonify({
+            'success': False,
+            'error': '獲取來源統計時發生錯誤',
+            'message': str(e)
+        }), 500
+
 # --- 修改現有的編輯和刪除路由，支援 JSON 回應 ---
 
 @app.route('/edit/<int:note_id>', methods=['GET', 'POST'])
@@ -104,7 +405,7 @@ def edit_note(note_id):
                 from datetime import datetime
                 ref_time_parsed = datetime.strptime(ref_time, '%Y-%m-%dT%H:%M')
             except ValueError:
-                print(f"無效的來源時間格式: {ref_time}")
+                logger.warning("無效的來源時間格式: %s", ref_time)
 
         success = db_manager.update_note(note_id, note_type, content, ref if ref else None, ref_time_parsed)
         if success:
@@ -155,9 +456,8 @@ def search_stocks():
 
         results = []
         
-        print("嘗試本地搜尋...")
         locals_ = db_manager.search_stocks(query, limit=10)
-        print(f"本地搜尋返回 {len(locals_)} 個結果")
+        logger.debug("本地搜尋返回 %d 個結果", len(locals_))
         
         for s in locals_:
             results.append({
@@ -167,9 +467,12 @@ def search_stocks():
             })
 
         if not results:
-            print("本地無結果，呼叫 Yahoo Finance API...")
             externals = external_api.search_yahoo_stocks(query, limit=10)
-            print(f"Yahoo API 返回 {len(externals)} 個結果")
+            logger.debug("本地無結果，Yahoo API 返回 %d 個結果", len(externals))
+            
+            # 在背景寫回本地股票資料表，下次相同查詢可直接由本地搜尋命中
+            if externals and STOCK_PROMOTION_ENABLED:
+                stock_promotion.promoter.submit(externals)
             
             for s in externals:
                 if not any(r['code'] == s['code'] for r in results):
@@ -179,13 +482,10 @@ def search_stocks():
                         'display': f"{s['code']} - {s['name']}"
                     })
 
-        print(f"最終返回 {len(results)} 個結果")
         return jsonify(results)
         
     except Exception as e:
-        print(f"股票搜尋錯誤: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("股票搜尋錯誤: %s", e)
         return jsonify([])
 
 @app.route('/get-stock-info', methods=['GET'])
@@ -200,12 +500,21 @@ def get_stock_info():
 			return jsonify({'code': stock['stock_code'], 'name': stock['stock_name'], 'industry': stock.get('industry', '')})
 		return jsonify({'error': '找不到該股票'})
 	except Exception as e:
-		print(f"獲取股票信息錯誤: {e}")
+		logger.exception("獲取股票信息錯誤: %s", e)
 		return jsonify({'error': '系統錯誤'})
 
 
 @app.route('/add', methods=['POST'])
 def add_note():
+	# 前端以 AJAX 送出時帶 Accept: application/json，直接返回新增的筆記
+	wants_json = request.headers.get('Accept') == 'application/json'
+
+	def fail(message, status):
+		if wants_json:
+			return jsonify({'success': False, 'error': message}), status
+		flash(message, 'error')
+		return redirect(url_for('index'))
+
 	try:
 		stock_code = request.form.get('stock_code', '').strip()
 		stock_name = request.form.get('stock_name', '').strip()
@@ -215,11 +524,9 @@ def add_note():
 		ref_time = request.form.get('ref_time', '').strip()
 
 		if not all([stock_code, stock_name, note_type, content]):
-			flash('所有欄位都是必填的', 'error')
-			return redirect(url_for('index'))
+			return fail('所有欄位都是必填的', 400)
 		if note_type not in ['TAG', 'STORY']:
-			flash('無效的筆記類型', 'error')
-			return redirect(url_for('index'))
+			return fail('無效的筆記類型', 400)
 
 		# 處理來源時間：轉換為 datetime 格式，如果提供了的話
 		ref_time_parsed = None
@@ -228,13 +535,17 @@ def add_note():
 				from datetime import datetime
 				ref_time_parsed = datetime.strptime(ref_time, '%Y-%m-%dT%H:%M')
 			except ValueError:
-				print(f"無效的來源時間格式: {ref_time}")
+				logger.warning("無效的來源時間格式: %s", ref_time)
 
-		success = db_manager.add_note(stock_code, stock_name, note_type, content, ref if ref else None, ref_time_parsed)
-		flash(f'成功添加筆記: {stock_code} - {stock_name}', 'success' if success else '添加筆記失敗', 'error')
+		note = db_manager.add_note(stock_code, stock_name, note_type, content, ref if ref else None, ref_time_parsed)
+		if not note:
+			return fail('添加筆記失敗', 500)
+		if wants_json:
+			return jsonify({'success': True, 'note': note}), 201
+		flash(f'成功添加筆記: {stock_code} - {note["stock_name"]}', 'success')
 	except Exception as e:
-		print(f"添加筆記時發生錯誤: {e}")
-		flash('系統錯誤，請稍後重試', 'error')
+		logger.exception("添加筆記時發生錯誤: %s", e)
+		return fail('系統錯誤，請稍後重試', 500)
 	return redirect(url_for('index'))
 
 # ... (health_check, test_database 等函式維持不變) ...
@@ -242,11 +553,32 @@ def add_note():
 def health_check():
 	try:
 		db_status = 'connected' if db_manager.test_connection() else 'disconnected'
-		return {'status': 'healthy', 'message': '股票筆記管理系統運行正常', 'database': db_status, 'environment': os.getenv('FLASK_ENV', 'production')}
+		return {
+			'status': 'healthy',
+			'message': '股票筆記管理系統運行正常',
+			'database': db_status,
+			'database_backend': db_manager.get_backend().name,
+			'db_pool': db_manager.get_pool_stats(),
+			'stock_directory': stock_directory.stats(),
+			'notes_cache': notes_cache.stats(),
+			'yahoo_cache': external_api.get_cache_stats(),
+			'yahoo_client': external_api.get_client_stats(),
+			'singleflight': singleflight.stats(),
+			'stock_promotion': stock_promotion.promoter.stats(),
+			'environment': os.getenv('FLASK_ENV', 'production')
+		}
 	except Exception as e:
 		return {'status': 'unhealthy', 'message': f'系統錯誤: {str(e)}', 'database': 'unknown'}
 
 
+@app.route('/metrics')
+def metrics_endpoint():
+	"""Prometheus 格式的效能指標（每個 worker 行程各自統計）"""
+	if not METRICS_ENABLED:
+		return Response('metrics disabled\n', status=404, mimetype='text/plain')
+	return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
 @app.route('/test-db')
 def test_database():
 	try:
@@ -255,15 +587,10 @@ def test_database():
 		return {'status': 'error', 'message': f'測試失敗: {str(e)}'}
 
 if __name__ == '__main__':
-    print('啟動股票筆記管理系統...')
-    if db_manager.test_connection():
-        print("✅ 數據庫連接成功")
-        if db_manager.init_common_stocks():
-            print("✅ 股票資料初始化完成")
-        else:
-            print("❌ 股票資料初始化失敗")
-    else:
-        print("❌ 數據庫連接失敗")
+    # 開發模式（單一行程）：生產環境請使用 gunicorn -c gunicorn.conf.py wsgi:application
+    import startup
+    if startup.run_startup_tasks() and db_manager.load_stock_directory():
+        logger.info("股票目錄快取載入完成")
     
     debug_mode = os.getenv('FLASK_ENV') == 'development'
-    app.run(debug=debug_mode, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=debug_mode, host='0.0.0.0', port=5000)
@@ -0,0 +1,260 @@
+"""
+ASGI 入口
+JSON API（/api/notes、/api/notes/<id>、/search-stocks、/get-stock-info）以非同步方式處理：
+等待 MySQL（aiomysql）與 Yahoo（httpx）時不佔用執行緒，少數 worker 即可同時處理大量慢查詢；
+其餘路由（HTML 頁面、表單、批次匯入、匯出等）轉交原本的 Flask 應用，在執行緒池中執行
+
+生產環境啟動方式：GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py asgi:application
+回應格式、快取與 ETag 行為與 Flask 路由相同
+"""
+
+import asyncio
+import contextlib
+import functools
+import logging
+import time
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette import responses
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from werkzeug.http import generate_etag, http_date, is_resource_modified, quote_etag
+
+import db_async
+import db_manager
+import external_api
+import json_codec
+import metrics
+import stock_promotion
+from app import app as flask_app
+from config import NOTES_PAGE_SIZE, NOTES_PAGE_MAX_SIZE, STOCK_PROMOTION_ENABLED, ASGI_WSGI_THREADS
+from notes_cache import notes_cache
+
+logger = logging.getLogger(__name__)
+
+
+class JSONResponse(responses.JSONResponse):
+    """以 json_codec 序列化（與 Flask 路由相同使用 orjson）"""
+
+    def render(self, content):
+        return json_codec.dumps(content)
+
+
+def _timed(route):
+    """記錄請求處理時間（route 與 Flask 的路由規則相同，指標可直接合併）"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            start = time.perf_counter()
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status_code
+                return response
+            finally:
+                metrics.HTTP_REQUEST_DURATION.observe(time.perf_counter() - start,
+                                                      method=request.method, route=route, status=status)
+        return wrapper
+    return decorator
+
+
+def _get_page_limit(request):
+    """從 URL 取得每頁筆數，限制在 1 ~ NOTES_PAGE_MAX_SIZE 之間"""
+    try:
+        limit = int(request.query_params.get('limit', ''))
+    except ValueError:
+        limit = 0
+    limit = limit or NOTES_PAGE_SIZE
+    return max(1, min(limit, NOTES_PAGE_MAX_SIZE))
+
+
+def _is_modified(request, etag, last_modified=None):
+    """以 werkzeug 相同的規則判斷 If-None-Match / If-Modified-Since（與 Flask 的 make_conditional 一致）"""
+    environ = {'REQUEST_METHOD': request.method}
+    for header in ('if-none-match', 'if-modified-since'):
+        if header in request.headers:
+            environ['HTTP_' + header.upper().replace('-', '_')] = request.headers[header]
+    return is_resource_modified(environ, etag, last_modified=last_modified)
+
+
+def _revalidate_headers(etag, last_modified=None):
+    """要求瀏覽器每次都以 If-None-Match 重新驗證（etag 為 None 時只加上 Cache-Control）"""
+    headers = {'Cache-Control': 'no-cache'}
+    if etag is not None:
+        headers['ETag'] = quote_etag(etag)
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+    return headers
+
+
+@_timed('/api/notes')
+async def api_get_notes(request):
+    """API 路由：獲取筆記列表（支援搜尋、排序和游標分頁）"""
+    try:
+        params = request.query_params
+        search_term = params.get('search', '').strip()
+        sort_by = params.get('sort_by', 'created_at')
+        sort_order = params.get('sort_order', 'DESC')
+        after = params.get('after', '').strip() or None
+        limit = _get_page_limit(request)
+        notes_format = 'columns' if params.get('format') == 'columns' else 'notes'
+
+        # 先讀版本再查詢：查詢期間有寫入時，返回的 ETag 較舊，下次請求只會多查一次
+        etag = None
+        data_version = await db_async.get_notes_version()
+        if data_version is not None:
+            notes_cache.observe(data_version)
+            etag = notes_cache.etag(data_version, search_term, sort_by, sort_order, after, limit, notes_format)
+            if not _is_modified(request, etag):
+                return Response(status_code=304, headers=_revalidate_headers(etag))
+
+        try:
+            page = await db_async.get_notes_page(search_term, sort_by, sort_order, after=after, limit=limit)
+        except ValueError as e:
+            return JSONResponse({
+                'success': False,
+                'error': '無效的分頁游標',
+                'message': str(e)
+            }, status_code=400)
+
+        data = {
+            'success': True,
+            'notes': page['notes'],
+            'total': len(page['notes']),
+            'next_cursor': page['next_cursor'],
+            'has_more': page['has_more'],
+            'limit': limit,
+            'search_term': search_term,
+            'sort_by': page['sort_by'],
+            'sort_order': page['sort_order']
+        }
+        if notes_format == 'columns':
+            data.update(db_manager.notes_to_columns(data.pop('notes')))
+        return JSONResponse(data, headers=_revalidate_headers(etag))
+    except Exception as e:
+        logger.exception("API 獲取筆記錯誤: %s", e)
+        return JSONResponse({
+            'success': False,
+            'error': '獲取筆記時發生錯誤',
+            'message': str(e)
+        }, status_code=500)
+
+
+@_timed('/api/notes/<int:note_id>')
+async def api_get_note(request):
+    """API 路由：獲取單一筆記"""
+    try:
+        note = await db_async.get_note_by_id(request.path_params['note_id'])
+
+        if not note:
+            return JSONResponse({
+                'success': False,
+                'error': '找不到該筆記'
+            }, status_code=404)
+
+        response = JSONResponse({
+            'success': True,
+            'note': db_manager.format_note_times(dict(note), ('updated_at',))
+        })
+        # ETag 依內容計算（股票更名時也會改變）；Last-Modified 取自筆記的 updated_at（本地時間）
+        etag = generate_etag(response.body)
+        last_modified = note['updated_at'].astimezone()
+        headers = _revalidate_headers(etag, last_modified)
+        if not _is_modified(request, etag, last_modified):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+        return response
+    except Exception as e:
+        logger.exception("API 獲取筆記錯誤: %s", e)
+        return JSONResponse({
+            'success': False,
+            'error': '獲取筆記時發生錯誤',
+            'message': str(e)
+        }, status_code=500)
+
+
+@_timed('/search-stocks')
+async def search_stocks(request):
+    """優先從本地 DB 模糊搜尋，若無結果再退回 Yahoo Finance API（等待 Yahoo 時不佔用執行緒）"""
+    try:
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return JSONResponse([])
+
+        results = []
+
+        locals_ = await db_async.search_stocks(query, limit=10)
+        logger.debug("本地搜尋返回 %d 個結果", len(locals_))
+
+        for s in locals_:
+            results.append({
+                'code': s['stock_code'],
+                'name': s['stock_name'],
+                'display': f"{s['stock_code']} - {s['stock_name']}"
+            })
+
+        if not results:
+            externals = await external_api.search_yahoo_stocks_async(query, limit=10)
+            logger.debug("本地無結果，Yahoo API 返回 %d 個結果", len(externals))
+
+            # 在背景寫回本地股票資料表（只排入佇列，不會阻塞事件迴圈）
+            if externals and STOCK_PROMOTION_ENABLED:
+                stock_promotion.promoter.submit(externals)
+
+            for s in externals:
+                if not any(r['code'] == s['code'] for r in results):
+                    results.append({
+                        'code': s['code'],
+                        'name': s['name'],
+                        'display': f"{s['code']} - {s['name']}"
+                    })
+
+        return JSONResponse(results)
+
+    except Exception as e:
+        logger.exception("股票搜尋錯誤: %s", e)
+        return JSONResponse([])
+
+
+@_timed('/get-stock-info')
+async def get_stock_info(request):
+    try:
+        stock_code = request.query_params.get('code', '').strip()
+        if not stock_code:
+            return JSONResponse({'error': '股票代號不能為空'})
+
+        stock = await db_async.get_stock_by_code(stock_code)
+        if stock:
+            return JSONResponse({'code': stock['stock_code'], 'name': stock['stock_name'], 'industry': stock.get('industry', '')})
+        return JSONResponse({'error': '找不到該股票'})
+    except Exception as e:
+        logger.exception("獲取股票信息錯誤: %s", e)
+        return JSONResponse({'error': '系統錯誤'})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    # worker 結束時關閉非同步連線池與 Yahoo 連線（同步連線池由 gunicorn 的 worker_exit 關閉）
+    await asyncio.to_thread(stock_promotion.promoter.close)
+    await db_async.close_pool()
+    await external_api.yahoo_client.aclose()
+
+
+application = Starlette(
+    routes=[
+        Route('/api/notes', api_get_notes, methods=['GET']),
+        Route('/api/notes/{note_id:int}', api_get_note, methods=['GET']),
+        Route('/search-stocks', search_stocks, methods=['GET']),
+        Route('/get-stock-info', get_stock_info, methods=['GET']),
+        # 其餘路由（以及上述路徑的其他 HTTP 方法）交給 Flask
+        Mount('/', WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS)),
+    ],
+    lifespan=lifespan,
+)
+
+if __name__ == '__main__':
+    # 開發模式（單一行程）
+    import uvicorn
+    uvicorn.run(application, host='0.0.0.0', port=5000)
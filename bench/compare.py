@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+比較兩次效能測試結果
+用法:
+    python bench/compare.py 基準.json 新結果.json [--metric p95_ms] [--threshold 10]
+任一情境的指定延遲指標變慢超過 threshold 百分比時以結束碼 1 結束（可用於 CI）
+"""
+
+import argparse
+import json
+import sys
+
+
+def compare(base, new, metric='p95_ms', threshold=10.0):
+    """
+    比較兩份結果
+    返回: (比較列表, 是否有退步)；比較列表元素為 (情境, 基準值, 新值, 變化百分比, 狀態)
+    """
+    rows = []
+    regressed = False
+    base_results = base.get('results', {})
+    new_results = new.get('results', {})
+    for name in sorted(set(base_results) | set(new_results)):
+        old_value = base_results.get(name, {}).get(metric)
+        new_value = new_results.get(name, {}).get(metric)
+        if old_value is None or new_value is None:
+            rows.append((name, old_value, new_value, None, 'missing'))
+            continue
+        change = (new_value - old_value) / old_value * 100 if old_value else 0.0
+        if change > threshold:
+            status = 'slower'
+            regressed = True
+        elif change < -threshold:
+            status = 'faster'
+        else:
+            status = 'same'
+        rows.append((name, old_value, new_value, round(change, 1), status))
+    return rows, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較兩次效能測試結果")
+    parser.add_argument("base", help="基準結果 JSON")
+    parser.add_argument("new", help="新結果 JSON")
+    parser.add_argument("--metric", default="p95_ms", help="比較的指標（預設 p95_ms）")
+    parser.add_argument("--threshold", type=float, default=10.0, help="視為退步的變慢百分比（預設 10）")
+    args = parser.parse_args()
+
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+
+    print(f"基準: {base['meta'].get('commit')}  新: {new['meta'].get('commit')}  指標: {args.metric}")
+    rows, regressed = compare(base, new, args.metric, args.threshold)
+    for name, old_value, new_value, change, status in rows:
+        change_text = f"{change:+.1f}%" if change is not None else '-'
+        print(f"{name:<40} {old_value if old_value is not None else '-':>10} {new_value if new_value is not None else '-':>10} "
+              f"{change_text:>9}  {status}")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
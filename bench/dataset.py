@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+效能測試資料集
+產生可重現的合成資料（N 檔股票、M 條中文筆記）並寫入目前設定的資料庫
+
+用法:
+    python bench/dataset.py --stocks 2000 --notes 100000
+    python bench/dataset.py --reset --notes 20000      # 先清空 notes/stocks（名稱不含 bench 的資料庫需加 --force）
+
+請使用獨立的資料庫（例如 bench/docker-compose.yml 啟動的 MySQL），不要對正式資料執行
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_manager
+
+INDUSTRIES = ['半導體', '電子零組件', '光電', '通信網路', '電腦及週邊', '金融保險', '航運',
+              '鋼鐵', '塑膠', '生技醫療', '紡織纖維', '食品', '建材營造', '汽車', '綠能環保']
+
+NAME_HEADS = ['台', '華', '聯', '國', '中', '大', '新', '宏', '富', '永', '長', '統', '南', '東',
+              '元', '群', '友', '光', '欣', '凱', '世', '健', '嘉', '瑞', '信', '正', '日', '和']
+NAME_BODIES = ['積', '達', '亞', '碩', '鋼', '塑', '泰', '興', '豐', '益', '昌', '源', '盛', '鼎',
+               '通', '訊', '航', '捷', '寶', '茂', '晶', '創', '揚', '勝', '德', '聚', '騰', '毅']
+NAME_TAILS = ['電', '科', '光', '通', '金', '精密', '材料', '生技', '半導體', '電子', '國際', '實業', '']
+
+# 常見的 TAG 關鍵字（也作為搜尋測試的關鍵字）
+TAGS = ['AI伺服器', '法說會', '高股息', '外資買超', '營收創新高', 'CoWoS', '電動車', '減資',
+        '除息', '庫藏股', '轉單效應', '毛利率提升', '漲價', '擴產', '低軌衛星', '散熱',
+        '矽光子', '重電', '併購', '接單滿載', '庫存去化', '匯損', '董監改選', '現金增資']
+
+REFS = ['經濟日報', '工商時報', '鉅亨網', 'MoneyDJ', '公司法說會', '券商研究報告',
+        'Yahoo股市', 'PTT股板', '財報狗', '公開資訊觀測站']
+
+STORY_TEMPLATES = [
+    '{name}第{q}季營收年增{pct}%，受惠{tag}需求，法人預估{year}年EPS可達{eps}元。',
+    '{name}董事會通過{tag}相關計畫，預計{month}月開始貢獻營收，毛利率有望回升至{pct}%。',
+    '市場傳出{name}取得大客戶{tag}訂單，股價連續{days}天上漲，成交量放大至{volume}張。',
+    '{name}表示{tag}需求仍強，下半年產能利用率維持在{pct}%以上，全年營收可望成長。',
+    '{name}公告{month}月營收{revenue}億元，月增{pct}%，主要來自{tag}出貨增加。',
+    '外資調升{name}目標價至{price}元，認為{tag}題材將帶動未來兩年獲利成長。',
+]
+
+
+def _stock_name(rng, used):
+    while True:
+        name = rng.choice(NAME_HEADS) + rng.choice(NAME_BODIES) + rng.choice(NAME_TAILS)
+        if name not in used:
+            used.add(name)
+            return name
+
+
+def generate_stocks(count, seed=42):
+    """
+    產生股票資料
+    返回: [{stock_code, stock_name, industry}, ...]（代號 1101 起，四碼）
+    """
+    rng = random.Random(seed)
+    used = set()
+    codes = rng.sample(range(1101, 9999), min(count, 9999 - 1101))
+    return [
+        {'stock_code': str(code), 'stock_name': _stock_name(rng, used), 'industry': rng.choice(INDUSTRIES)}
+        for code in sorted(codes)
+    ]
+
+
+def generate_notes(stocks, count, seed=42, now=None):
+    """
+    產生筆記資料（依時間先後產生，約 30% 為 STORY）
+    返回: 產生器，元素為 (stock_code, note_type, content, ref, ref_time, created_at)
+    """
+    rng = random.Random(seed + 1)
+    now = now or datetime.now().replace(microsecond=0)
+    start = now - timedelta(days=730)
+    step = timedelta(days=730) / max(count, 1)
+
+    for i in range(count):
+        stock = rng.choice(stocks)
+        tag = rng.choice(TAGS)
+        created_at = start + step * i + timedelta(seconds=rng.randint(0, 59))
+        if rng.random() < 0.3:
+            note_type = 'STORY'
+            content = rng.choice(STORY_TEMPLATES).format(
+                name=stock['stock_name'], tag=tag, q=rng.randint(1, 4), pct=rng.randint(3, 65),
+                year=created_at.year + 1, eps=round(rng.uniform(1, 40), 2), month=rng.randint(1, 12),
+                days=rng.randint(2, 8), volume=rng.randint(1000, 90000), revenue=round(rng.uniform(5, 900), 1),
+                price=rng.randint(30, 1500),
+            )
+        else:
+            note_type = 'TAG'
+            content = tag
+        if rng.random() < 0.7:
+            ref = rng.choice(REFS)
+            ref_time = (created_at - timedelta(hours=rng.randint(0, 72))).replace(minute=0, second=0)
+        else:
+            ref, ref_time = None, None
+        yield stock['stock_code'], note_type, content, ref, ref_time, created_at
+
+
+def reset_tables(force=False):
+    """清空 notes 與 stocks（名稱不含 bench 的資料庫需指定 force）"""
+    target = db_manager.get_backend().describe()
+    if 'bench' not in target and not force:
+        raise SystemExit(f"拒絕清空資料庫 {target}：確定是測試用資料庫請加上 --force")
+    connection = db_manager.get_db_connection()
+    if not connection:
+        raise SystemExit("無法連接到數據庫")
+    try:
+        cursor = connection.cursor()
+        cursor.execute("DELETE FROM notes")
+        cursor.execute("DELETE FROM stocks")
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+
+
+def insert_notes(rows, batch_size=2000):
+    """批次寫入筆記，返回寫入筆數"""
+    connection = db_manager.get_db_connection()
+    if not connection:
+        raise SystemExit("無法連接到數據庫")
+    insert_sql = """
+        INSERT INTO notes (stock_code, note_type, content, ref, ref_time, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """
+    total = 0
+    try:
+        cursor = connection.cursor()
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(insert_sql, batch)
+                connection.commit()
+                total += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(insert_sql, batch)
+            connection.commit()
+            total += len(batch)
+        cursor.close()
+    finally:
+        connection.close()
+    return total
+
+
+def seed(stock_count, note_count, seed_value=42, reset=False, force=False):
+    """
+    寫入合成資料集
+    返回: {'stocks': 股票數, 'notes': 筆記數, 'seconds': 耗時}
+    """
+    start = time.perf_counter()
+    if reset:
+        reset_tables(force)
+    stocks = generate_stocks(stock_count, seed_value)
+    db_manager.import_stocks_from_iterable(stocks)
+    notes = insert_notes(generate_notes(stocks, note_count, seed_value))
+    # 資料集直接寫入 notes，統計摘要需重新計算
+    db_manager.rebuild_note_stats()
+    db_manager.update_statistics()
+    return {'stocks': len(stocks), 'notes': notes, 'seconds': round(time.perf_counter() - start, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="寫入效能測試用的合成資料集")
+    parser.add_argument("--stocks", type=int, default=2000, help="股票數（預設 2000）")
+    parser.add_argument("--notes", type=int, default=50000, help="筆記數（預設 50000）")
+    parser.add_argument("--seed", type=int, default=42, help="亂數種子（相同種子產生相同資料）")
+    parser.add_argument("--reset", action="store_true", help="寫入前先清空 notes 與 stocks")
+    parser.add_argument("--force", action="store_true", help="允許清空名稱不含 bench 的資料庫")
+    args = parser.parse_args()
+
+    result = seed(args.stocks, args.notes, args.seed, args.reset, args.force)
+    print(f"已寫入 {result['stocks']} 檔股票、{result['notes']} 條筆記，耗時 {result['seconds']} 秒")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
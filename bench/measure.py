@@ -0,0 +1,98 @@
+"""
+效能測試共用工具：計時、百分位數與結果摘要
+"""
+
+import math
+import threading
+import time
+
+
+def percentile(sorted_values, pct):
+    """
+    最近排名法（nearest-rank）百分位數
+    參數:
+        sorted_values: 已排序的數值列表
+        pct: 百分位（0 ~ 100）
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    """
+    彙整單一情境的結果
+    參數:
+        latencies: 每次呼叫的耗時（秒）
+        errors: 失敗次數
+        elapsed: 整體耗時（秒）
+    返回: 結果字典（時間單位為毫秒）
+    """
+    values = sorted(latencies)
+    count = len(values)
+
+    def ms(value):
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        'count': count,
+        'errors': errors,
+        'throughput_rps': round(count / elapsed, 1) if elapsed > 0 else None,
+        'mean_ms': ms(sum(values) / count) if count else None,
+        'p50_ms': ms(percentile(values, 50)),
+        'p95_ms': ms(percentile(values, 95)),
+        'p99_ms': ms(percentile(values, 99)),
+        'max_ms': ms(values[-1]) if values else None,
+    }
+
+
+def run_load(call, args_list, concurrency=1, warmup=0):
+    """
+    以固定執行緒數依序執行 args_list 中的每組參數並計時
+    參數:
+        call: 被測函式，返回 False 表示該次呼叫失敗（拋出例外也視為失敗）
+        args_list: 每次呼叫的參數（tuple）
+        concurrency: 並行執行緒數
+        warmup: 前幾次呼叫不計入結果
+    返回: summarize() 的結果字典
+    """
+    for args in args_list[:warmup]:
+        try:
+            call(*args)
+        except Exception:
+            pass
+    measured = args_list[warmup:]
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    position = iter(range(len(measured)))
+
+    def worker():
+        local_latencies = []
+        local_errors = 0
+        while True:
+            with lock:
+                index = next(position, None)
+            if index is None:
+                break
+            start = time.perf_counter()
+            try:
+                ok = call(*measured[index])
+            except Exception:
+                ok = False
+            local_latencies.append(time.perf_counter() - start)
+            if ok is False:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker) for _ in range(max(1, concurrency))]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], time.perf_counter() - start)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+筆記列表 CPU 剖析
+以 cProfile 重複請求 /api/notes（Flask test client，不經過網路），列出耗時最多的函式，
+用來比較資料列解碼、時間格式化與 JSON 序列化各佔多少 CPU
+
+用法:
+    python bench/dataset.py --reset --notes 50000       # 先寫入資料集
+    python bench/profile_notes.py                       # 每頁 500 筆、重複 50 次
+    python bench/profile_notes.py --format columns      # 欄位/資料列格式的回應
+    python bench/profile_notes.py --cached              # 只剖析快取命中後的序列化
+    python bench/profile_notes.py -o notes.prof         # 另存 pstats 檔供其他工具檢視
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+
+# 每次請求的日誌會影響量測結果，預設只輸出警告以上
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import db_manager
+from app import app
+from config import NOTES_PAGE_MAX_SIZE
+from notes_cache import notes_cache
+
+
+def profile_requests(client, params, repeat):
+    """
+    重複請求 /api/notes 並剖析
+    返回: (pstats.Stats, 每次請求的平均 CPU 毫秒數, 回應大小)
+    """
+    # 暖身：建立連線池與語句註冊表，不計入結果
+    response = client.get('/api/notes', query_string=params)
+    if response.status_code != 200:
+        raise RuntimeError(f"/api/notes 返回 {response.status_code}")
+
+    profiler = cProfile.Profile()
+    started = time.process_time()
+    profiler.enable()
+    for _ in range(repeat):
+        client.get('/api/notes', query_string=params)
+    profiler.disable()
+    cpu_ms = (time.process_time() - started) * 1000 / repeat
+    return pstats.Stats(profiler), cpu_ms, len(response.data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="剖析筆記列表 API 的 CPU 使用")
+    parser.add_argument("-n", "--repeat", type=int, default=50, help="請求次數（預設 50）")
+    parser.add_argument("--limit", type=int, default=NOTES_PAGE_MAX_SIZE, help=f"每頁筆數（預設 {NOTES_PAGE_MAX_SIZE}）")
+    parser.add_argument("--sort-by", default='created_at', help="排序欄位（預設 created_at）")
+    parser.add_argument("--format", default='notes', choices=['notes', 'columns'], help="回應格式")
+    parser.add_argument("--cached", action="store_true", help="保留筆記快取（只剖析序列化）；預設每次都查詢資料庫")
+    parser.add_argument("--top", type=int, default=25, help="列出的函式數（預設 25）")
+    parser.add_argument("--sort", default='tottime', help="pstats 排序方式（預設 tottime）")
+    parser.add_argument("-o", "--output", help="另存 pstats 檔")
+    args = parser.parse_args()
+
+    notes_cache.enabled = args.cached
+    params = {'limit': args.limit, 'sort_by': args.sort_by, 'format': args.format}
+    print(f"資料庫: {db_manager.get_backend().describe()}；參數: {params}；快取: {'啟用' if args.cached else '停用'}")
+
+    stats, cpu_ms, size = profile_requests(app.test_client(), params, args.repeat)
+    print(f"每次請求 CPU {cpu_ms:.2f} ms，回應 {size / 1024:.1f} KiB（{args.repeat} 次）")
+    if args.output:
+        stats.dump_stats(args.output)
+        print(f"剖析結果已寫入 {args.output}")
+    stats.strip_dirs().sort_stats(args.sort).print_stats(args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
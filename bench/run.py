@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+筆記 API 效能測試
+量測各端點與 db_manager 函式的吞吐量與 p50/p95/p99 延遲，結果輸出為 JSON 供跨版本比較
+
+用法:
+    python bench/dataset.py --reset --notes 50000          # 先寫入資料集
+    python bench/run.py                                     # 以 Flask test client 在行程內測試
+    python bench/run.py --url http://127.0.0.1:5000 -c 8    # 測試執行中的伺服器（例如 gunicorn）
+    python bench/run.py --suite db -n 500                   # 只跑 db_manager 微基準測試
+    python bench/compare.py bench/results/舊.json bench/results/新.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.append(ROOT_DIR)
+
+# 每次請求的日誌會影響量測結果，預設只輸出警告以上
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import db_manager
+from dataset import TAGS, insert_notes
+from measure import run_load
+
+NOTE_SORTS = ['created_at', 'stock_code', 'stock_name', 'note_type']
+ADD_MARKER = '[bench-add]'
+DELETE_MARKER = '[bench-delete]'
+BULK_ROWS = 100
+
+
+class InProcessClient:
+    """以 Flask test client 在行程內送出請求（每條執行緒各自一個 client）"""
+
+    def __init__(self):
+        from app import app
+        self._app = app
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self._app.test_client()
+        return client
+
+    def get(self, path, params=None):
+        resp = self._client().get(path, query_string=params)
+        return resp.status_code, resp.get_data()
+
+    def post(self, path, data=None):
+        resp = self._client().post(path, data=data)
+        return resp.status_code, resp.get_data()
+
+
+class RemoteClient:
+    """對執行中的伺服器送出 HTTP 請求（每條執行緒各自一個 Session）"""
+
+    def __init__(self, base_url):
+        import requests
+        self._requests = requests
+        self._base_url = base_url.rstrip('/')
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        return session
+
+    def get(self, path, params=None):
+        resp = self._session().get(self._base_url + path, params=params, allow_redirects=False)
+        return resp.status_code, resp.content
+
+    def post(self, path, data=None):
+        resp = self._session().post(self._base_url + path, data=data, allow_redirects=False)
+        return resp.status_code, resp.content
+
+
+def _query(sql, params=()):
+    connection = db_manager.get_db_connection()
+    if not connection:
+        raise SystemExit("無法連接到數據庫，請確認資料庫設定（見 bench/README.md）")
+    try:
+        cursor = connection.cursor()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall() if cursor.description else []
+        connection.commit()
+        cursor.close()
+        return rows
+    finally:
+        connection.close()
+
+
+class Fixture:
+    """從資料集中抽樣測試用的筆記 id、股票與搜尋關鍵字"""
+
+    def __init__(self, rng):
+        stocks = _query("SELECT stock_code, stock_name FROM stocks")
+        note_ids = [row[0] for row in _query("SELECT id FROM notes ORDER BY id DESC LIMIT 20000")]
+        if not stocks or not note_ids:
+            raise SystemExit("資料庫沒有股票或筆記，請先執行 python bench/dataset.py")
+        self.rng = rng
+        self.stocks = stocks
+        self.note_ids = note_ids
+        self.stock_count = _query("SELECT COUNT(*) FROM stocks")[0][0]
+        self.note_count = _query("SELECT COUNT(*) FROM notes")[0][0]
+
+    def note_id(self):
+        return self.rng.choice(self.note_ids)
+
+    def stock(self):
+        return self.rng.choice(self.stocks)
+
+    def note_search_term(self):
+        # 一半搜尋筆記內容常見的關鍵字，一半搜尋股票名稱
+        if self.rng.random() < 0.5:
+            return self.rng.choice(TAGS)
+        return self.stock()[1]
+
+    def stock_search_term(self):
+        code, name = self.stock()
+        return self.rng.choice([code, code[:2], name, name[:2], name[1:]])
+
+    def create_deletable_notes(self, count):
+        """寫入待刪除的筆記並返回其 id（不計入量測時間）"""
+        rows = [(self.stock()[0], 'TAG', DELETE_MARKER, None, None, datetime.now()) for _ in range(count)]
+        insert_notes(rows)
+        return [row[0] for row in _query("SELECT id FROM notes WHERE content = %s ORDER BY id", (DELETE_MARKER,))][-count:]
+
+    def cleanup(self):
+        _query("DELETE FROM notes WHERE content LIKE %s OR content = %s", (ADD_MARKER + '%', DELETE_MARKER))
+        # 直接刪除的筆記不會扣除統計摘要
+        db_manager.rebuild_note_stats()
+
+
+def _ok(status):
+    return status < 400
+
+
+def http_scenarios(client, fixture, n):
+    """返回 {情境名稱: (呼叫函式, 參數列表)}"""
+    rng = fixture.rng
+    scenarios = {}
+
+    def get(path, params):
+        status, _ = client.get(path, params)
+        return _ok(status)
+
+    def post(path, data):
+        status, _ = client.post(path, data)
+        return _ok(status)
+
+    scenarios['index'] = (get, [('/', None)] * n)
+    for sort_by in NOTE_SORTS:
+        scenarios[f'api_notes:{sort_by}'] = (get, [
+            ('/api/notes', {'sort_by': sort_by, 'sort_order': rng.choice(['ASC', 'DESC'])}) for _ in range(n)
+        ])
+    for sort_by in NOTE_SORTS + ['relevance']:
+        scenarios[f'api_notes_search:{sort_by}'] = (get, [
+            ('/api/notes', {'search': fixture.note_search_term(), 'sort_by': sort_by, 'sort_order': 'DESC'})
+            for _ in range(n)
+        ])
+
+    # 第二頁（keyset 分頁）
+    status, body = client.get('/api/notes', {'sort_by': 'created_at', 'sort_order': 'DESC'})
+    cursor = json.loads(body).get('next_cursor') if _ok(status) else None
+    if cursor:
+        scenarios['api_notes:next_page'] = (get, [
+            ('/api/notes', {'sort_by': 'created_at', 'sort_order': 'DESC', 'after': cursor})
+        ] * n)
+
+    scenarios['search_stocks'] = (get, [('/search-stocks', {'q': fixture.stock_search_term()}) for _ in range(n)])
+
+    def add_args():
+        code, name = fixture.stock()
+        return ('/add', {
+            'stock_code': code, 'stock_name': name, 'note_type': rng.choice(['TAG', 'STORY']),
+            'content': f"{ADD_MARKER} {rng.choice(TAGS)}", 'ref': rng.choice(['', '經濟日報', '鉅亨網']),
+        })
+
+    scenarios['add'] = (post, [add_args() for _ in range(n)])
+    scenarios['edit'] = (post, [
+        (f'/edit/{fixture.note_id()}', {'note_type': 'TAG', 'content': rng.choice(TAGS), 'ref': '工商時報'})
+        for _ in range(n)
+    ])
+    scenarios['delete'] = lambda: (post, [(f'/delete/{note_id}', None) for note_id in fixture.create_deletable_notes(n)])
+    return scenarios
+
+
+def db_scenarios(fixture, n):
+    """db_manager 函式微基準測試"""
+    rng = fixture.rng
+    scenarios = {}
+
+    def truthy(func):
+        return lambda *args: bool(func(*args))
+
+    for sort_by in NOTE_SORTS:
+        scenarios[f'get_notes_page:{sort_by}'] = (db_manager.get_notes_page, [
+            ('', sort_by, rng.choice(['ASC', 'DESC'])) for _ in range(n)
+        ])
+    scenarios['get_notes_page:search'] = (db_manager.get_notes_page, [
+        (fixture.note_search_term(), 'created_at', 'DESC') for _ in range(n)
+    ])
+    # 從資料中間的游標位置讀取下一頁
+    scenarios['get_notes_page:paged'] = (db_manager.get_notes_page, [
+        ('', 'stock_code', 'ASC',
+         db_manager.make_notes_cursor({'stock_code': fixture.stock()[0], 'id': fixture.note_id()}, 'stock_code'))
+        for _ in range(n)
+    ])
+    scenarios['get_all_notes:search'] = (db_manager.get_all_notes, [
+        (fixture.note_search_term(), 'created_at', 'DESC') for _ in range(max(1, n // 10))
+    ])
+    scenarios['search_stocks:directory'] = (db_manager.search_stocks, [(fixture.stock_search_term(),) for _ in range(n)])
+    scenarios['search_stocks:sql'] = (db_manager._search_stocks_sql, [(fixture.stock_search_term(),) for _ in range(n)])
+    scenarios['get_note_by_id'] = (truthy(db_manager.get_note_by_id), [(fixture.note_id(),) for _ in range(n)])
+    scenarios['get_stock_by_code'] = (truthy(db_manager.get_stock_by_code), [(fixture.stock()[0],) for _ in range(n)])
+    scenarios['get_ref_options'] = (db_manager.get_ref_options, [()] * n)
+    scenarios['get_stock_summary'] = (truthy(db_manager.get_stock_summary), [(fixture.stock()[0],) for _ in range(n)])
+    scenarios['add_note'] = (truthy(db_manager.add_note), [
+        (*fixture.stock(), 'TAG', f"{ADD_MARKER} {rng.choice(TAGS)}", '經濟日報', None) for _ in range(n)
+    ])
+    # 每次呼叫寫入 BULK_ROWS 條筆記，每秒寫入筆數 = req/s × BULK_ROWS
+    scenarios[f'add_notes_bulk:{BULK_ROWS}'] = (truthy(db_manager.add_notes_bulk), [
+        ([{'stock_code': fixture.stock()[0], 'stock_name': None, 'note_type': 'TAG',
+           'content': f"{ADD_MARKER} {rng.choice(TAGS)}", 'ref': '經濟日報'} for _ in range(BULK_ROWS)],)
+        for _ in range(max(1, n // 10))
+    ])
+    scenarios['update_note'] = (truthy(db_manager.update_note), [
+        (fixture.note_id(), 'STORY', rng.choice(TAGS), '工商時報', None) for _ in range(n)
+    ])
+    scenarios['delete_note'] = lambda: (truthy(db_manager.delete_note), [
+        (note_id,) for note_id in fixture.create_deletable_notes(n)
+    ])
+    return scenarios
+
+
+def _git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT_DIR,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except Exception:
+        return 'unknown'
+
+
+def run_suite(name, scenarios, only, concurrency, warmup, results):
+    for scenario, spec in scenarios.items():
+        key = f'{name}/{scenario}'
+        if only and not any(part in key for part in only):
+            continue
+        # 需要事先準備資料的情境（例如刪除）以函式延遲建立
+        call, args_list = spec() if callable(spec) else spec
+        result = run_load(call, args_list, concurrency=concurrency, warmup=min(warmup, len(args_list) // 2))
+        results[key] = result
+        print(f"{key:<40} {result['throughput_rps'] or 0:>9.1f} req/s  "
+              f"p50 {result['p50_ms'] or 0:>8.2f} ms  p95 {result['p95_ms'] or 0:>8.2f} ms  "
+              f"p99 {result['p99_ms'] or 0:>8.2f} ms  errors {result['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="筆記 API 與 db_manager 效能測試")
+    parser.add_argument("--suite", default="http,db", help="要執行的測試組：http、db（預設兩者）")
+    parser.add_argument("--url", help="測試執行中的伺服器；未指定時以 Flask test client 在行程內測試")
+    parser.add_argument("-n", "--requests", type=int, default=200, help="每個情境的請求數（預設 200）")
+    parser.add_argument("-c", "--concurrency", type=int, default=1, help="並行執行緒數（預設 1）")
+    parser.add_argument("--warmup", type=int, default=10, help="每個情境不計入結果的暖身請求數")
+    parser.add_argument("--only", action="append", help="只執行名稱包含此字串的情境（可重複指定）")
+    parser.add_argument("--seed", type=int, default=42, help="亂數種子")
+    parser.add_argument("-o", "--output", help="結果 JSON 路徑（預設 bench/results/<時間>-<commit>.json）")
+    args = parser.parse_args()
+
+    suites = [suite.strip() for suite in args.suite.split(',') if suite.strip()]
+    fixture = Fixture(random.Random(args.seed))
+    commit = _git_commit()
+    results = {}
+    n = args.requests + args.warmup
+
+    print(f"資料集: {fixture.stock_count} 檔股票、{fixture.note_count} 條筆記；commit {commit}")
+    started = time.time()
+    try:
+        if 'http' in suites:
+            client = RemoteClient(args.url) if args.url else InProcessClient()
+            run_suite('http', http_scenarios(client, fixture, n), args.only, args.concurrency, args.warmup, results)
+        if 'db' in suites:
+            run_suite('db', db_scenarios(fixture, n), args.only, args.concurrency, args.warmup, results)
+    finally:
+        fixture.cleanup()
+
+    report = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'duration_seconds': round(time.time() - started, 1),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'target': args.url or 'in-process',
+            'database': db_manager.get_backend().describe(),
+            'dataset': {'stocks': fixture.stock_count, 'notes': fixture.note_count},
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        BENCH_DIR, 'results', f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"結果已寫入 {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
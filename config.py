@@ -2,6 +2,7 @@
 # 支援環境變數配置，方便 Docker 部署和外部資料庫連接
 
 import os
+import tempfile
 
 DB_CONFIG = {
     'host': os.getenv('MYSQL_HOST', 'localhost'),        # MySQL主機地址
@@ -12,3 +13,96 @@ DB_CONFIG = {
     'charset': 'utf8mb4',
     'autocommit': True
 }
+
+# 資料庫後端：mysql（預設）或 sqlite（內嵌，單機部署與測試用，不需 MySQL 伺服器）
+DB_BACKEND = os.getenv('DB_BACKEND', 'mysql').lower()
+SQLITE_PATH = os.getenv('SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'stock_note.db'))  # SQLite 資料庫檔案
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', '5'))  # 等待寫入鎖的秒數
+
+# 連線池配置
+DB_POOL_CONFIG = {
+    'size': int(os.getenv('MYSQL_POOL_SIZE', '10')),                           # 連線數上限
+    'max_idle': int(os.getenv('MYSQL_POOL_MAX_IDLE', '300')),                  # 閒置連線回收秒數
+    'max_lifetime': int(os.getenv('MYSQL_POOL_MAX_LIFETIME', '3600')),         # 連線最長使用秒數（需小於 wait_timeout）
+    'checkout_timeout': float(os.getenv('MYSQL_POOL_TIMEOUT', '5')),           # 借用連線等待秒數
+    'health_check_interval': int(os.getenv('MYSQL_POOL_PING_INTERVAL', '30')), # 閒置超過此秒數借出前先檢查
+}
+
+# 筆記列表分頁配置
+NOTES_PAGE_SIZE = int(os.getenv('NOTES_PAGE_SIZE', '50'))          # 預設每頁筆數
+NOTES_PAGE_MAX_SIZE = int(os.getenv('NOTES_PAGE_MAX_SIZE', '500'))  # 每頁筆數上限
+
+# JSON 回應以 orjson 序列化（需安裝 orjson；未安裝或停用時使用標準函式庫）
+ORJSON_ENABLED = os.getenv('ORJSON_ENABLED', 'true').lower() == 'true'
+
+# 筆記列表查詢結果快取（寫入後以世代計數器失效）
+NOTES_CACHE_ENABLED = os.getenv('NOTES_CACHE_ENABLED', 'true').lower() == 'true'  # 是否啟用
+NOTES_CACHE_SIZE = int(os.getenv('NOTES_CACHE_SIZE', '256'))                      # 最多快取的查詢數
+NOTES_CACHE_TTL = int(os.getenv('NOTES_CACHE_TTL', '300'))                        # 存活秒數（涵蓋不經過應用程式的寫入）
+NOTES_CACHE_MAX_ROWS = int(os.getenv('NOTES_CACHE_MAX_ROWS', '5000'))             # 超過此筆數的結果不快取
+NOTES_CACHE_GENERATION_FILE = os.getenv(                                          # 同一主機上各行程共用的世代檔案（空字串表示僅行程內）
+    'NOTES_CACHE_GENERATION_FILE', os.path.join(tempfile.gettempdir(), 'stock_note_notes.generation'))
+
+# 筆記增量同步配置（/api/notes/changes）
+NOTES_CHANGES_SETTLE_SECONDS = int(os.getenv('NOTES_CHANGES_SETTLE_SECONDS', '2'))    # 只返回此秒數以前的變更，避免遺漏較晚提交的交易
+NOTES_CHANGES_RETENTION_DAYS = int(os.getenv('NOTES_CHANGES_RETENTION_DAYS', '30'))   # 刪除紀錄保留天數，游標更舊時需重新載入
+NOTES_CHANGES_POLL_INTERVAL = int(os.getenv('NOTES_CHANGES_POLL_INTERVAL', '15'))     # 前端輪詢間隔秒數（0 表示停用）
+NOTES_CHANGES_CURSOR_TTL = int(os.getenv('NOTES_CHANGES_CURSOR_TTL', '30'))           # 頁面的同步起點游標在行程內快取的秒數
+
+# 筆記批次匯入配置（POST /api/notes/bulk、scripts/import_notes.py）
+NOTES_BULK_CHUNK_SIZE = int(os.getenv('NOTES_BULK_CHUNK_SIZE', '500'))   # 每個交易寫入的筆數
+NOTES_BULK_MAX_ROWS = int(os.getenv('NOTES_BULK_MAX_ROWS', '10000'))     # 單次 API 請求的筆數上限
+NOTES_BULK_MAX_BYTES = int(os.getenv('NOTES_BULK_MAX_BYTES', str(32 * 1024 * 1024)))  # 請求內容大小上限（所有路由，MAX_CONTENT_LENGTH）
+
+# 筆記匯出配置（GET /api/notes/export）
+NOTES_EXPORT_BATCH_SIZE = int(os.getenv('NOTES_EXPORT_BATCH_SIZE', '500'))  # 每次從資料庫讀取並送出的筆數
+
+# 筆記全文搜尋配置（需執行 migrations/002 建立 ngram 全文索引）
+NOTES_FULLTEXT_SEARCH = os.getenv('NOTES_FULLTEXT_SEARCH', 'true').lower() == 'true'  # 是否啟用全文搜尋
+NOTES_FULLTEXT_MIN_LENGTH = int(os.getenv('NOTES_FULLTEXT_MIN_LENGTH', '2'))          # 應與 MySQL ngram_token_size 一致，較短的關鍵字改用 LIKE
+
+# 股票目錄快取配置（/search-stocks 在記憶體中搜尋）
+STOCK_CACHE_ENABLED = os.getenv('STOCK_CACHE_ENABLED', 'true').lower() == 'true'  # 是否啟用股票目錄快取
+STOCK_CACHE_TTL = int(os.getenv('STOCK_CACHE_TTL', '300'))                        # 完整重新載入間隔秒數（涵蓋其他行程的寫入）
+
+# 股票匯入配置（scripts/seed_stocks.py）
+STOCK_IMPORT_CHUNK_SIZE = int(os.getenv('STOCK_IMPORT_CHUNK_SIZE', '1000'))  # 每次提交的筆數
+
+# 相同查詢的請求合併（同時進行的相同股票搜尋、股票/筆記查詢與 Yahoo 搜尋只執行一次）
+SINGLEFLIGHT_ENABLED = os.getenv('SINGLEFLIGHT_ENABLED', 'true').lower() == 'true'  # 是否啟用
+
+# Yahoo Finance 搜尋配置
+YAHOO_CACHE_SIZE = int(os.getenv('YAHOO_CACHE_SIZE', '1024'))                 # 最多快取的查詢數
+YAHOO_CACHE_TTL = int(os.getenv('YAHOO_CACHE_TTL', '86400'))                  # 有結果的快取秒數
+YAHOO_NEGATIVE_CACHE_TTL = int(os.getenv('YAHOO_NEGATIVE_CACHE_TTL', '900'))  # 空結果（負快取）的快取秒數
+YAHOO_SEARCH_DEADLINE = float(os.getenv('YAHOO_SEARCH_DEADLINE', '10'))       # 單次搜尋（所有並行請求）的總時限秒數
+YAHOO_MAX_WORKERS = int(os.getenv('YAHOO_MAX_WORKERS', '12'))                 # 並行請求的執行緒數
+
+# Yahoo HTTP 用戶端配置（連線重用、重試與斷路器）
+YAHOO_CLIENT_CONFIG = {
+    'timeout': float(os.getenv('YAHOO_HTTP_TIMEOUT', '8')),                 # 單一請求逾時秒數
+    'pool_maxsize': int(os.getenv('YAHOO_POOL_MAXSIZE', '6')),              # 每個主機的連線數上限
+    'max_retries': int(os.getenv('YAHOO_MAX_RETRIES', '1')),                # 429/5xx/連線錯誤的重試次數
+    'backoff_base': float(os.getenv('YAHOO_BACKOFF_BASE', '0.2')),          # 退避基準秒數
+    'backoff_max': float(os.getenv('YAHOO_BACKOFF_MAX', '2')),              # 單次退避上限秒數
+    'breaker_threshold': int(os.getenv('YAHOO_BREAKER_THRESHOLD', '5')),    # 連續失敗幾次後開啟斷路器
+    'breaker_reset': float(os.getenv('YAHOO_BREAKER_RESET', '30')),         # 斷路器開啟後多久試探恢復
+}
+
+# Yahoo 搜尋結果寫回 stocks 表的配置
+STOCK_PROMOTION_ENABLED = os.getenv('STOCK_PROMOTION_ENABLED', 'true').lower() == 'true'  # 是否寫回
+STOCK_PROMOTION_CONFIG = {
+    'queue_size': int(os.getenv('STOCK_PROMOTION_QUEUE_SIZE', '1000')),          # 佇列上限
+    'batch_size': int(os.getenv('STOCK_PROMOTION_BATCH_SIZE', '200')),           # 每批最多寫入筆數
+    'flush_interval': float(os.getenv('STOCK_PROMOTION_FLUSH_INTERVAL', '1')),   # 湊批最長等待秒數
+    'dedupe_ttl': int(os.getenv('STOCK_PROMOTION_DEDUPE_TTL', '3600')),          # 同一代號不重複排入的秒數
+}
+
+# ASGI 模式配置（GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker，入口 asgi:application）
+ASYNC_DB_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', '20'))  # 每個 worker 的非同步 MySQL 連線數上限
+ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '8'))     # 轉交 Flask 處理的 HTML 頁面等請求所用的執行緒數
+
+# 日誌與效能指標配置
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')                            # 日誌等級（DEBUG 會輸出每條連線、每次搜尋的訊息）
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '1'))            # WARNING 以下訊息的取樣比例（0 ~ 1）
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'  # 是否提供 /metrics 端點
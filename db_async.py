@@ -0,0 +1,210 @@
+"""
+非同步資料庫查詢（ASGI 模式的 JSON API 使用）
+- MySQL：aiomysql 連線池，等待資料庫時不佔用執行緒；SQL 組合與結果格式化與 db_manager 共用
+- SQLite：沒有非同步驅動，改在執行緒中呼叫 db_manager 的同步函式
+筆記列表同樣經過 notes_cache，與同步路徑共用快取與寫入後的失效
+"""
+
+import asyncio
+import logging
+
+import db_manager
+import metrics
+from config import ASYNC_DB_POOL_SIZE, STOCK_CACHE_ENABLED, STOCK_CACHE_TTL
+from notes_cache import notes_cache
+from stock_cache import stock_directory
+
+try:
+    import aiomysql
+except ImportError:  # 只使用同步模式或 SQLite 時不需安裝
+    aiomysql = None
+
+logger = logging.getLogger(__name__)
+
+# aiomysql 的錯誤類別（未安裝時不攔截任何例外）
+_DRIVER_ERRORS = (aiomysql.Error,) if aiomysql is not None else ()
+
+# 連線池綁定建立它的事件迴圈與後端，兩者任一改變時重新建立
+_pool = None
+_pool_key = None
+_pool_lock = None
+_pool_lock_loop = None
+
+
+def _creation_lock(loop):
+    """建立連線池用的鎖（asyncio.Lock 只能在同一個事件迴圈中使用）"""
+    global _pool_lock, _pool_lock_loop
+    if _pool_lock_loop is not loop:
+        _pool_lock, _pool_lock_loop = asyncio.Lock(), loop
+    return _pool_lock
+
+
+async def _get_pool():
+    """
+    取得目前事件迴圈的連線池（延遲建立，每個 worker 行程各自一個）
+    返回: aiomysql 連線池；後端沒有非同步驅動（SQLite）時返回 None
+    """
+    global _pool, _pool_key
+    backend = db_manager.get_backend()
+    loop = asyncio.get_running_loop()
+    if _pool_key != (backend, loop):
+        async with _creation_lock(loop):
+            if _pool_key != (backend, loop):
+                _pool = await backend.create_async_pool(ASYNC_DB_POOL_SIZE)
+                _pool_key = (backend, loop)
+                if _pool is not None:
+                    logger.info("已建立非同步資料庫連線池 (上限 %d)", ASYNC_DB_POOL_SIZE)
+    return _pool
+
+
+async def close_pool():
+    """關閉非同步連線池（ASGI lifespan 結束時呼叫）"""
+    global _pool, _pool_key
+    pool, _pool, _pool_key = _pool, None, None
+    if pool is not None:
+        pool.close()
+        await pool.wait_closed()
+
+
+async def _fetch(pool, query, params, time_fields=()):
+    """執行查詢，返回字典列表（以 tuple 讀取，與同步路徑相同在一次迴圈中建立字典並格式化時間欄位）"""
+    async with pool.acquire() as connection:
+        async with connection.cursor() as cursor:
+            await cursor.execute(query, params)
+            rows = await cursor.fetchall()
+            return db_manager._rows_to_dicts(cursor.description, rows, time_fields)
+
+
+def _errno(error):
+    """aiomysql（PyMySQL）的錯誤碼放在 args[0]"""
+    code = error.args[0] if error.args else None
+    return code if isinstance(code, int) else None
+
+
+@metrics.timed_db(rows=lambda page: len(page['notes']))
+async def get_notes_page(search_term='', sort_by='created_at', sort_order='DESC', after=None, limit=50):
+    """
+    以游標分頁獲取筆記（參數與返回值同 db_manager.get_notes_page）
+    游標無效時拋出 ValueError
+    """
+    pool = await _get_pool()
+    if pool is None:
+        # __wrapped__：查詢指標由本函式記錄，避免重複計算
+        return await asyncio.to_thread(db_manager.get_notes_page.__wrapped__,
+                                       search_term, sort_by, sort_order, after, limit)
+
+    args = db_manager.notes_page_query_args(search_term, sort_by, sort_order, after, limit)
+    notes = await _query_notes(pool, *args)
+    return db_manager.make_notes_page(notes, limit, args[1], args[2])
+
+
+async def _query_notes(pool, search_term, sort_by, sort_order, after=None, limit=None, fulltext_query=None):
+    """同 db_manager._query_notes，快取鍵相同，兩種模式共用查詢結果"""
+    return await notes_cache.aget_or_load(
+        (search_term, sort_by, sort_order, after, limit, fulltext_query),
+        lambda: _load_notes(pool, search_term, sort_by, sort_order, after, limit, fulltext_query),
+    )
+
+
+async def _load_notes(pool, search_term, sort_by, sort_order, after=None, limit=None, fulltext_query=None):
+    """查詢資料庫，返回 (筆記列表, 是否可快取)；查詢失敗時返回空列表且不可快取"""
+    try:
+        try:
+            full_query, params = db_manager._build_notes_query(search_term, sort_by, sort_order, after, limit,
+                                                               fulltext_query)
+            notes = await _fetch(pool, full_query, params, db_manager.NOTE_TIME_FIELDS)
+            return notes, True
+        except _DRIVER_ERRORS as e:
+            if not (fulltext_query and _errno(e) == db_manager.ER_FT_MATCHING_KEY_NOT_FOUND):
+                raise
+            # 尚未執行 002 遷移：停用全文搜尋並改用 LIKE 重試
+            db_manager.disable_fulltext()
+            if sort_by == 'relevance':
+                return [], False
+        # 直接查詢，不經過 _query_notes（同 db_manager._load_notes）
+        full_query, params = db_manager._build_notes_query(search_term, sort_by, sort_order, after, limit)
+        return await _fetch(pool, full_query, params, db_manager.NOTE_TIME_FIELDS), False
+    except _DRIVER_ERRORS as e:
+        logger.error("獲取筆記時發生錯誤: %s", e)
+        return [], False
+
+
+@metrics.timed_db()
+async def get_notes_version():
+    """筆記列表的資料版本（同 db_manager.get_notes_version）"""
+    pool = await _get_pool()
+    if pool is None:
+        return await asyncio.to_thread(db_manager.get_notes_version.__wrapped__)
+
+    try:
+        rows = await _fetch(pool, db_manager.notes_version_query(), ())
+    except _DRIVER_ERRORS as e:
+        logger.error("獲取筆記資料版本時發生錯誤: %s", e)
+        return None
+    return db_manager.make_notes_version(rows[0])
+
+
+@metrics.timed_db(rows=lambda note: 1 if note else 0)
+async def get_note_by_id(note_id):
+    """根據ID獲取單一筆記（同 db_manager.get_note_by_id）"""
+    pool = await _get_pool()
+    if pool is None:
+        return await asyncio.to_thread(db_manager.get_note_by_id.__wrapped__, note_id)
+
+    # 同時查詢同一筆記的請求共用一次查詢
+    return await db_manager.note_lookups.ado((note_id,), lambda: _load_note(pool, note_id))
+
+
+async def _load_note(pool, note_id):
+    try:
+        notes = await _fetch(pool, db_manager.NOTE_BY_ID_SQL, (note_id,), db_manager.NOTE_BY_ID_TIME_FIELDS)
+    except _DRIVER_ERRORS as e:
+        logger.error("獲取筆記時發生錯誤: %s", e)
+        return None
+    return notes[0] if notes else None
+
+
+@metrics.timed_db(rows=lambda stock: 1 if stock else 0)
+async def get_stock_by_code(stock_code):
+    """根據股票代號獲取股票信息（同 db_manager.get_stock_by_code）"""
+    pool = await _get_pool()
+    if pool is None:
+        return await asyncio.to_thread(db_manager.get_stock_by_code.__wrapped__, stock_code)
+
+    return await db_manager.stock_lookups.ado((stock_code,), lambda: _load_stock(pool, stock_code))
+
+
+async def _load_stock(pool, stock_code):
+    try:
+        stocks = await _fetch(pool, db_manager.STOCK_BY_CODE_SQL, (stock_code,))
+        return stocks[0] if stocks else None
+    except _DRIVER_ERRORS as e:
+        logger.error("獲取股票信息時發生錯誤: %s", e)
+        return None
+
+
+@metrics.timed_db()
+async def search_stocks(query, limit=10):
+    """
+    搜尋股票（同 db_manager.search_stocks）
+    股票目錄已載入且未過期時直接在記憶體中搜尋；需要重新載入目錄時交給執行緒（一次讀取完整 stocks 表）
+    """
+    if STOCK_CACHE_ENABLED:
+        age = stock_directory.age()
+        if age is not None and age <= STOCK_CACHE_TTL:
+            return stock_directory.search(query, limit)
+        return await asyncio.to_thread(db_manager.search_stocks.__wrapped__, query, limit)
+
+    pool = await _get_pool()
+    if pool is None:
+        return await asyncio.to_thread(db_manager.search_stocks.__wrapped__, query, limit)
+
+    return await db_manager.stock_searches.ado((query, limit), lambda: _search_stocks_sql(pool, query, limit))
+
+
+async def _search_stocks_sql(pool, query, limit):
+    try:
+        return await _fetch(pool, *db_manager._search_stocks_query(query, limit))
+    except _DRIVER_ERRORS as e:
+        logger.error("搜尋股票時發生錯誤: %s", e)
+        return []
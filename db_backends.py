@@ -0,0 +1,438 @@
+"""
+資料庫後端
+db_manager 的函式介面不變，實際連線方式與少數方言差異由後端提供：
+- MySQLBackend：原本的 mysql.connector 連線
+- SQLiteBackend：內嵌 SQLite（WAL 模式、FTS5 全文搜尋），適合單機部署與測試
+
+由 config.DB_BACKEND 選擇（mysql / sqlite）
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, NamedTuple
+
+SQLITE_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations', 'sqlite', 'schema.sql')
+
+
+class QueryPlan(NamedTuple):
+    """explain() 的結果"""
+    steps: List[str]   # 各步驟的說明（依資料庫輸出順序）
+    full_scan: bool    # 是否從頭讀取某個資料表（全表或完整索引掃描）
+    filesort: bool     # 是否需要額外排序整個結果（不含只排序同值群組的部分排序）
+    scanned: List[str]  # 從頭讀取的資料表（查詢中的名稱或別名，含子查詢結果）
+
+
+class MySQLBackend:
+    """MySQL 後端（需安裝 mysql-connector-python）"""
+
+    name = 'mysql'
+
+    # 筆記類型排序：ENUM 依定義順序排序，游標比較時轉為序號
+    note_type_sort = 'n.note_type'
+    note_type_key = '(n.note_type + 0)'
+
+    # 目前時間（與 created_at 等欄位相同時區）
+    now_sql = 'CURRENT_TIMESTAMP'
+
+    # 與 NOTES_FULLTEXT_MIN_LENGTH 一致（ngram_token_size）
+    fulltext_min_length = None
+
+    # InnoDB 會自動更新索引統計資料
+    analyze_sql = None
+
+    upsert_stock_sql = (
+        "INSERT INTO stocks (stock_code, stock_name, industry) "
+        "VALUES (%s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE "
+        "stock_name = VALUES(stock_name), "
+        "industry = COALESCE(VALUES(industry), industry), "
+        "last_updated = CURRENT_TIMESTAMP"
+    )
+
+    # 新增股票或更新名稱（名稱相同時不會改動 last_updated）
+    upsert_stock_name_sql = (
+        "INSERT INTO stocks (stock_code, stock_name) VALUES (%s, %s) "
+        "ON DUPLICATE KEY UPDATE stock_name = VALUES(stock_name)"
+    )
+
+    # 股票不存在時才新增
+    insert_stock_if_missing_sql = (
+        "INSERT INTO stocks (stock_code, stock_name) VALUES (%s, %s) "
+        "ON DUPLICATE KEY UPDATE stock_code = stock_code"
+    )
+
+    # 讀取後要在同一交易中修改的資料列先鎖定
+    lock_rows_sql = ' FOR UPDATE'
+
+    # 筆記統計增減（筆數為差值；最後筆記時間取較新者，傳入 NULL 時不變）
+    upsert_note_stats_sql = (
+        "INSERT INTO stock_note_stats (stock_code, note_type, note_count, last_note_at) VALUES (%s, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE note_count = note_count + VALUES(note_count), "
+        "last_note_at = GREATEST(COALESCE(last_note_at, VALUES(last_note_at)), "
+        "COALESCE(VALUES(last_note_at), last_note_at))"
+    )
+    upsert_stock_ref_stats_sql = (
+        "INSERT INTO stock_ref_stats (stock_code, ref, note_count) VALUES (%s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE note_count = note_count + VALUES(note_count)"
+    )
+    upsert_ref_stats_sql = (
+        "INSERT INTO ref_stats (ref, note_count) VALUES (%s, %s) "
+        "ON DUPLICATE KEY UPDATE note_count = note_count + VALUES(note_count)"
+    )
+
+    # 全文搜尋比對運算式（對應 migrations/002 建立的 ngram FULLTEXT 索引）
+    FULLTEXT_MATCH = "MATCH(n.content, n.ref) AGAINST (%s IN BOOLEAN MODE)"
+
+    def __init__(self, config):
+        import mysql.connector
+        self._connector = mysql.connector
+        self.Error = mysql.connector.Error
+        self.config = config
+
+    def connect(self):
+        return self._connector.connect(**self.config)
+
+    async def create_async_pool(self, size):
+        """
+        建立 aiomysql 連線池（ASGI 模式的非同步查詢使用，需安裝 aiomysql）
+        連線設定與同步連線相同；一律 autocommit，借用的連線不會停留在舊的交易快照
+        """
+        import aiomysql
+        config = dict(self.config)
+        return await aiomysql.create_pool(
+            minsize=0,
+            maxsize=size,
+            host=config.get('host', 'localhost'),
+            port=config.get('port', 3306),
+            user=config.get('user'),
+            password=config.get('password', ''),
+            db=config.get('database'),
+            charset=config.get('charset', 'utf8mb4'),
+            autocommit=True,
+        )
+
+    @staticmethod
+    def seconds_ago_sql(seconds):
+        """目前時間往前 seconds 秒的 SQL 運算式"""
+        return f"(CURRENT_TIMESTAMP - INTERVAL {int(seconds)} SECOND)"
+
+    def describe(self):
+        return f"mysql://{self.config.get('host')}:{self.config.get('port')}/{self.config.get('database')}"
+
+    @staticmethod
+    def explain(cursor, query, params):
+        """
+        以 EXPLAIN 取得查詢計畫（cursor 需為一般游標，非 dictionary）
+        存取方式為 ALL 或 index 視為完整掃描；Extra 含 Using filesort 視為額外排序
+        """
+        cursor.execute(f"EXPLAIN {query}", params)
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        steps = [f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']} {row['Extra'] or ''}".rstrip()
+                 for row in rows]
+        return QueryPlan(
+            steps,
+            full_scan=any(row['type'] in ('ALL', 'index') for row in rows),
+            filesort=any('Using filesort' in (row['Extra'] or '') for row in rows),
+            scanned=[row['table'] for row in rows if row['type'] in ('ALL', 'index')],
+        )
+
+    def fulltext_source(self, fulltext_query, search_pattern):
+        """
+        全文搜尋模式的 SQL 片段：內容/來源走 FULLTEXT 索引，股票代碼/名稱走 stocks 表，
+        以 UNION 合併符合的筆記ID，避免 MATCH 與 OR 混用時無法使用全文索引
+        返回: (相關度 SELECT 運算式, 其參數, FROM 子句, 其參數, 游標比較用的相關度運算式, 其參數)
+        """
+        from_clause = """
+            FROM (
+                SELECT id FROM notes
+                WHERE MATCH(content, ref) AGAINST (%s IN BOOLEAN MODE)
+                UNION
+                SELECT id FROM notes
+                WHERE stock_code IN (
+                    SELECT stock_code FROM stocks
+                    WHERE stock_code LIKE %s OR stock_name LIKE %s
+                )
+            ) matched
+            JOIN notes n ON n.id = matched.id
+            JOIN stocks s ON n.stock_code = s.stock_code
+        """
+        # WHERE 中不能引用 SELECT 別名，游標比較需重複比對運算式
+        return (self.FULLTEXT_MATCH, [fulltext_query],
+                from_clause, [fulltext_query, search_pattern, search_pattern],
+                self.FULLTEXT_MATCH, [fulltext_query])
+
+
+def _convert_timestamp(value):
+    return datetime.fromisoformat(value.decode())
+
+
+def _adapt_param(value):
+    # 與 MySQL TIMESTAMP 相同只保留到秒，游標分頁比較字串時才會一致
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+class SQLiteCursor:
+    """
+    以 mysql.connector 游標的介面包裝 sqlite3 游標
+    - 參數佔位符 %s 轉為 ?
+    - dictionary=True 時每筆資料為字典
+    """
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    @staticmethod
+    def _sql(operation):
+        return operation.replace('%s', '?')
+
+    def execute(self, operation, params=()):
+        self._cursor.execute(self._sql(operation), [_adapt_param(value) for value in params or ()])
+        return self
+
+    def executemany(self, operation, seq_params):
+        self._cursor.executemany(self._sql(operation),
+                                 ([_adapt_param(value) for value in params] for params in seq_params))
+        return self
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def _rows(self, rows):
+        # tuple 游標直接返回 sqlite3 的結果；字典游標的欄位名稱只取一次
+        if not self._dictionary:
+            return rows
+        columns = [column[0] for column in self._cursor.description or ()]
+        return [dict(zip(columns, row)) for row in rows]
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return self._rows(self._cursor.fetchmany(size))
+
+    def fetchall(self):
+        return self._rows(self._cursor.fetchall())
+
+    def __iter__(self):
+        for row in self._cursor:
+            yield self._row(row)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """以 mysql.connector 連線的介面包裝 sqlite3 連線"""
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def cursor(self, dictionary=False, buffered=None):
+        return SQLiteCursor(self._raw.cursor(), dictionary)
+
+    def start_transaction(self):
+        self._raw.execute('BEGIN')
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def close(self):
+        self._raw.close()
+
+    def is_connected(self):
+        try:
+            self._raw.execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    @property
+    def in_transaction(self):
+        return self._raw.in_transaction
+
+
+class SQLiteBackend:
+    """
+    內嵌 SQLite 後端
+    - WAL 模式：讀取不會被寫入阻塞，多個 worker 行程可同時讀取
+    - notes_fts（FTS5 trigram）提供內容/來源的全文搜尋，由觸發器與 notes 同步
+    - 第一次連線時套用 migrations/sqlite/schema.sql（可重複執行）
+    參數:
+        path: 資料庫檔案路徑（:memory: 僅供單一連線測試使用）
+        busy_timeout: 寫入鎖等待秒數
+    """
+
+    name = 'sqlite'
+
+    # 與 schema.sql 的 idx_notes_note_type 運算式索引相同，排序時才能使用索引
+    note_type_sort = "CASE n.note_type WHEN 'TAG' THEN 1 ELSE 2 END"
+    note_type_key = note_type_sort
+
+    now_sql = "datetime('now', 'localtime')"
+
+    # trigram 斷詞至少需要 3 個字元，較短的關鍵字改用 LIKE
+    fulltext_min_length = 3
+
+    # SQLite 不會自動收集統計資料，沒有統計資料時多表查詢可能選錯索引
+    analyze_sql = 'ANALYZE'
+
+    upsert_stock_sql = (
+        "INSERT INTO stocks (stock_code, stock_name, industry) "
+        "VALUES (%s, %s, %s) "
+        "ON CONFLICT(stock_code) DO UPDATE SET "
+        "stock_name = excluded.stock_name, "
+        "industry = COALESCE(excluded.industry, industry), "
+        "last_updated = datetime('now', 'localtime')"
+    )
+
+    upsert_stock_name_sql = (
+        "INSERT INTO stocks (stock_code, stock_name) VALUES (%s, %s) "
+        "ON CONFLICT(stock_code) DO UPDATE SET "
+        "stock_name = excluded.stock_name, last_updated = datetime('now', 'localtime') "
+        "WHERE stock_name <> excluded.stock_name"
+    )
+
+    insert_stock_if_missing_sql = (
+        "INSERT INTO stocks (stock_code, stock_name) VALUES (%s, %s) "
+        "ON CONFLICT(stock_code) DO NOTHING"
+    )
+
+    # SQLite 的寫入交易同一時間只有一個，不需（也不支援）鎖定資料列
+    lock_rows_sql = ''
+
+    # 時間以 'YYYY-mm-dd HH:MM:SS' 字串保存，字串比較即時間先後
+    upsert_note_stats_sql = (
+        "INSERT INTO stock_note_stats (stock_code, note_type, note_count, last_note_at) VALUES (%s, %s, %s, %s) "
+        "ON CONFLICT(stock_code, note_type) DO UPDATE SET note_count = note_count + excluded.note_count, "
+        "last_note_at = MAX(COALESCE(last_note_at, excluded.last_note_at), "
+        "COALESCE(excluded.last_note_at, last_note_at))"
+    )
+    upsert_stock_ref_stats_sql = (
+        "INSERT INTO stock_ref_stats (stock_code, ref, note_count) VALUES (%s, %s, %s) "
+        "ON CONFLICT(stock_code, ref) DO UPDATE SET note_count = note_count + excluded.note_count"
+    )
+    upsert_ref_stats_sql = (
+        "INSERT INTO ref_stats (ref, note_count) VALUES (%s, %s) "
+        "ON CONFLICT(ref) DO UPDATE SET note_count = note_count + excluded.note_count"
+    )
+
+    Error = sqlite3.Error
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        sqlite3.register_converter('TIMESTAMP', _convert_timestamp)
+
+    def connect(self):
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # 連線會由連線池交給不同執行緒使用（同一時間只有一條執行緒持有）
+        raw = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                              detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        raw.execute('PRAGMA foreign_keys = ON')
+        raw.execute('PRAGMA synchronous = NORMAL')
+        if self.path != ':memory:':
+            raw.execute('PRAGMA journal_mode = WAL')
+        self._ensure_schema(raw)
+        return SQLiteConnection(raw)
+
+    async def create_async_pool(self, size):
+        """SQLite 沒有非同步驅動：返回 None，由 db_async 改在執行緒中呼叫 db_manager 的同步函式"""
+        return None
+
+    def _ensure_schema(self, raw):
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if not self._schema_ready:
+                with open(SQLITE_SCHEMA_PATH, 'r', encoding='utf-8') as f:
+                    raw.executescript(f.read())
+                self._schema_ready = True
+
+    @staticmethod
+    def seconds_ago_sql(seconds):
+        return f"datetime('now', 'localtime', '-{int(seconds)} seconds')"
+
+    def describe(self):
+        return f"sqlite://{self.path}"
+
+    @staticmethod
+    def explain(cursor, query, params):
+        """
+        以 EXPLAIN QUERY PLAN 取得查詢計畫
+        SCAN（不論是否使用索引）與 SEARCH 不同，會從頭讀取；USE TEMP B-TREE FOR ORDER BY 為完整排序，
+        RIGHT PART / LAST TERM OF ORDER BY 只排序同值群組，不視為額外排序；
+        FTS5 虛擬表的 SCAN 是以全文索引比對，不列入 scanned
+        """
+        cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)
+        steps = [row[3] for row in cursor.fetchall()]
+        return QueryPlan(
+            steps,
+            full_scan=any(step.startswith('SCAN ') for step in steps),
+            filesort=any(step == 'USE TEMP B-TREE FOR ORDER BY' for step in steps),
+            scanned=[step.split()[1] for step in steps if step.startswith('SCAN ') and 'VIRTUAL TABLE' not in step],
+        )
+
+    def fulltext_source(self, fulltext_query, search_pattern):
+        """
+        全文搜尋模式的 SQL 片段：內容/來源走 notes_fts，股票代碼/名稱走 stocks 表
+        相關度為 -bm25()（越大越相關，與 MySQL MATCH 分數方向一致），僅股票相符的筆記相關度為 0
+        返回: 與 MySQLBackend.fulltext_source 相同
+        """
+        from_clause = """
+            FROM (
+                SELECT id, MAX(relevance) AS relevance FROM (
+                    SELECT rowid AS id, -bm25(notes_fts) AS relevance FROM notes_fts
+                    WHERE notes_fts MATCH %s
+                    UNION ALL
+                    SELECT id, 0 FROM notes
+                    WHERE stock_code IN (
+                        SELECT stock_code FROM stocks
+                        WHERE stock_code LIKE %s OR stock_name LIKE %s
+                    )
+                ) GROUP BY id
+            ) matched
+            JOIN notes n ON n.id = matched.id
+            JOIN stocks s ON n.stock_code = s.stock_code
+        """
+        return ('matched.relevance', [],
+                from_clause, [fulltext_query, search_pattern, search_pattern],
+                'matched.relevance', [])
+
+
+def create_backend(name, db_config=None, sqlite_path=None, sqlite_busy_timeout=5.0):
+    """
+    依名稱建立後端
+    參數:
+        name: mysql 或 sqlite
+    """
+    if name == 'sqlite':
+        return SQLiteBackend(sqlite_path, sqlite_busy_timeout)
+    if name == 'mysql':
+        return MySQLBackend(db_config)
+    raise ValueError(f"不支援的資料庫後端: {name}")
@@ -1,101 +1,273 @@
-import mysql.connector
-from mysql.connector import Error
-from config import DB_CONFIG
+from config import (DB_BACKEND, DB_CONFIG, DB_POOL_CONFIG, SQLITE_PATH, SQLITE_BUSY_TIMEOUT,
+                    NOTES_FULLTEXT_SEARCH, NOTES_FULLTEXT_MIN_LENGTH, STOCK_CACHE_ENABLED, STOCK_CACHE_TTL,
+                    STOCK_IMPORT_CHUNK_SIZE, NOTES_PAGE_MAX_SIZE, NOTES_CHANGES_SETTLE_SECONDS,
+                    NOTES_CHANGES_RETENTION_DAYS, NOTES_CHANGES_CURSOR_TTL, NOTES_EXPORT_BATCH_SIZE)
+from db_backends import create_backend
+from db_pool import ConnectionPool, PoolTimeoutError
+import metrics
+from notes_cache import notes_cache
+from singleflight import SingleFlight
+from stock_cache import stock_directory
+from ttl_cache import TTLCache, MISSING
 from datetime import datetime
+import operator
+import os
+import random
+import threading
 import time
 import csv
-from typing import Iterable, Tuple, Dict
+import logging
+from typing import Callable, Dict, Iterable, Optional
 
-def get_db_connection():
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# 目前使用的資料庫後端與其錯誤類別（由 use_backend() 設定）
+_backend = None
+Error = Exception
+
+_stock_directory_lock = threading.Lock()
+
+# MySQL 錯誤碼：找不到符合欄位的 FULLTEXT 索引
+ER_FT_MATCHING_KEY_NOT_FOUND = 1191
+# MySQL 錯誤碼：偵測到死結（整個交易已被回滾）
+ER_LOCK_DEADLOCK = 1213
+# 寫入交易因死結被回滾時重新執行的次數
+DEADLOCK_RETRIES = 3
+
+# 同時進行的相同查詢只執行一次（多人同時輸入相同的關鍵字、開啟同一筆筆記）
+# 鍵包含筆記快取世代：寫入（筆記或股票）之後開始的查詢不會共用寫入前就已開始的查詢結果
+stock_searches = SingleFlight('search_stocks_sql', version=notes_cache.generation.value)
+stock_lookups = SingleFlight('get_stock_by_code', version=notes_cache.generation.value)
+note_lookups = SingleFlight('get_note_by_id', version=notes_cache.generation.value)
+
+def _open_connection():
     """
-    建立與MySQL數據庫的連接
-    返回: 數據庫連接對象
+    建立一條實體數據庫連線（供連線池使用）
+    返回: 數據庫連接對象，失敗時拋出 Error
     """
     max_retries = 5
     retry_delay = 2
     
     for attempt in range(max_retries):
         try:
-            connection = mysql.connector.connect(**DB_CONFIG)
+            connection = _backend.connect()
             if connection.is_connected():
-                print(f"數據庫連接成功 (嘗試 {attempt + 1})")
+                metrics.DB_CONNECTIONS_OPENED.inc()
+                logger.debug("數據庫連接成功 (嘗試 %d)", attempt + 1)
                 return connection
         except Error as e:
-            print(f"數據庫連接錯誤 (嘗試 {attempt + 1}): {e}")
+            metrics.DB_CONNECTION_ERRORS.inc()
+            logger.warning("數據庫連接錯誤 (嘗試 %d): %s", attempt + 1, e)
             if attempt < max_retries - 1:
-                print(f"等待 {retry_delay} 秒後重試...")
+                logger.info("等待 %d 秒後重試...", retry_delay)
                 time.sleep(retry_delay)
                 retry_delay *= 2  # 指數退避
             else:
-                print("達到最大重試次數，無法連接到數據庫")
-                return None
+                logger.error("達到最大重試次數，無法連接到數據庫")
+                raise
+    
+    raise Error("無法建立數據庫連接")
+
+def get_pool():
+    """
+    取得行程內共用的連線池（fork 後的子行程會建立自己的連線池）
+    返回: ConnectionPool
+    """
+    global _pool
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = ConnectionPool(_open_connection, **DB_POOL_CONFIG)
+        return _pool
+
+def close_pool():
+    """關閉連線池中的閒置連線，並在下次使用時重新建立連線池"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None and pool.pid == os.getpid():
+        pool.close_all()
+
+def get_pool_stats():
+    """
+    獲取連線池統計資料
+    返回: 統計字典（尚未建立連線池時返回 None）
+    """
+    pool = _pool
+    if pool is None or pool.pid != os.getpid():
+        return None
+    return pool.stats()
+
+def _collect_pool_metrics():
+    """輸出 /metrics 前把連線池狀態寫入指標"""
+    stats = get_pool_stats()
+    if stats is None:
+        return
+    for state in ('open', 'in_use', 'idle'):
+        metrics.DB_POOL.set(stats[state], state=state)
+
+metrics.register_collector(_collect_pool_metrics)
+
+def get_db_connection():
+    """
+    從連線池借用數據庫連接，使用完畢後呼叫 close() 即歸還連線池
+    返回: 數據庫連接對象
+    """
+    try:
+        return get_pool().acquire()
+    except PoolTimeoutError as e:
+        logger.error("數據庫連接錯誤: %s", e)
+        return None
+    except Error as e:
+        logger.error("數據庫連接錯誤: %s", e)
+        return None
+
+def use_backend(backend):
+    """
+    切換資料庫後端（例如測試時改用暫存的 SQLite 檔案），並在下次使用時重建連線池
+    參數: backend - db_backends 中的後端物件
+    """
+    global _backend, Error
+    close_pool()
+    _backend = backend
+    Error = backend.Error
+    notes_cache.clear()
+
+def get_backend():
+    """返回目前使用的資料庫後端"""
+    return _backend
+
+use_backend(create_backend(DB_BACKEND, DB_CONFIG, SQLITE_PATH, SQLITE_BUSY_TIMEOUT))
+
+@metrics.timed_db()
+def load_stock_directory():
+    """
+    從 stocks 表完整載入行程內股票目錄
+    返回: 布爾值，表示是否載入成功
+    """
+    connection = get_db_connection()
+    if not connection:
+        return False
+    
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT stock_code, stock_name, industry FROM stocks")
+        stock_directory.load(cursor.fetchall())
+        logger.info("已載入股票目錄: %d 筆", len(stock_directory))
+        return True
+        
+    except Error as e:
+        logger.error("載入股票目錄時發生錯誤: %s", e)
+        return False
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def _get_stock_directory():
+    """
+    取得可用的股票目錄；超過 STOCK_CACHE_TTL 秒時重新載入（以涵蓋其他行程寫入的股票）
+    返回: StockDirectory，停用或無法載入時返回 None
+    """
+    if not STOCK_CACHE_ENABLED:
+        return None
+    
+    age = stock_directory.age()
+    if age is None or age > STOCK_CACHE_TTL:
+        # 只讓一個執行緒重新載入，其他執行緒繼續使用現有資料
+        if _stock_directory_lock.acquire(blocking=not stock_directory.loaded):
+            try:
+                age = stock_directory.age()
+                if age is None or age > STOCK_CACHE_TTL:
+                    load_stock_directory()
+            finally:
+                _stock_directory_lock.release()
     
-    return None
+    return stock_directory if stock_directory.loaded else None
 
+@metrics.timed_db()
 def search_stocks(query, limit=10):
     """
     搜尋股票（按代號或名稱模糊搜尋）
+    優先使用行程內股票目錄，無法使用時才查詢資料庫
     參數:
         query: 搜尋關鍵字
         limit: 返回結果數量限制
     返回: 股票列表
     """
+    directory = _get_stock_directory()
+    if directory is not None:
+        return directory.search(query, limit)
+    return _search_stocks_sql(query, limit)
+
+def _search_stocks_query(query, limit=10):
+    """
+    組合 stocks 表模糊搜尋查詢（同步與非同步路徑共用）
+    返回: (SQL, 參數元組)
+    """
+    # 更智能的模糊搜尋
+    search_query = """
+        SELECT stock_code, stock_name, industry
+        FROM stocks 
+        WHERE stock_code LIKE %s 
+           OR stock_name LIKE %s 
+           OR stock_name LIKE %s
+        ORDER BY 
+            CASE 
+                WHEN stock_code = %s THEN 1
+                WHEN stock_name = %s THEN 2
+                WHEN stock_code LIKE %s THEN 3
+                WHEN stock_name LIKE %s THEN 4
+                WHEN stock_name LIKE %s THEN 5
+                ELSE 6
+            END,
+            stock_code
+        LIMIT %s
+    """
+    
+    # 多種搜尋模式
+    exact_pattern = query
+    starts_with = f"{query}%"
+    contains_pattern = f"%{query}%"
+    
+    return search_query, (
+        starts_with,           # stock_code LIKE 'query%'
+        starts_with,           # stock_name LIKE 'query%'
+        contains_pattern,      # stock_name LIKE '%query%'
+        exact_pattern,         # stock_code = 'query'
+        exact_pattern,         # stock_name = 'query'
+        starts_with,           # stock_code LIKE 'query%'
+        starts_with,           # stock_name LIKE 'query%'
+        contains_pattern,      # stock_name LIKE '%query%'
+        limit
+    )
+
+@stock_searches.coalesce
+def _search_stocks_sql(query, limit=10):
+    """以 SQL 在 stocks 表模糊搜尋（股票目錄無法使用時的備援）"""
     connection = get_db_connection()
     if not connection:
         return []
     
     try:
-        cursor = connection.cursor(dictionary=True)
-        
-        # 更智能的模糊搜尋
-        search_query = """
-            SELECT stock_code, stock_name, industry
-            FROM stocks 
-            WHERE stock_code LIKE %s 
-               OR stock_name LIKE %s 
-               OR stock_name LIKE %s
-            ORDER BY 
-                CASE 
-                    WHEN stock_code = %s THEN 1
-                    WHEN stock_name = %s THEN 2
-                    WHEN stock_code LIKE %s THEN 3
-                    WHEN stock_name LIKE %s THEN 4
-                    WHEN stock_name LIKE %s THEN 5
-                    ELSE 6
-                END,
-                stock_code
-            LIMIT %s
-        """
-        
-        # 多種搜尋模式
-        exact_pattern = query
-        starts_with = f"{query}%"
-        contains_pattern = f"%{query}%"
-        ends_with = f"%{query}"
-        
-        cursor.execute(search_query, (
-            starts_with,           # stock_code LIKE 'query%'
-            starts_with,           # stock_name LIKE 'query%'
-            contains_pattern,      # stock_name LIKE '%query%'
-            exact_pattern,         # stock_code = 'query'
-            exact_pattern,         # stock_name = 'query'
-            starts_with,           # stock_code LIKE 'query%'
-            starts_with,           # stock_name LIKE 'query%'
-            contains_pattern,      # stock_name LIKE '%query%'
-            limit
-        ))
-        
-        stocks = cursor.fetchall()
-        return stocks
+        return _fetch_rows(connection, *_search_stocks_query(query, limit))
         
     except Error as e:
-        print(f"搜尋股票時發生錯誤: {e}")
+        logger.error("搜尋股票時發生錯誤: %s", e)
         return []
     finally:
         if connection.is_connected():
-            cursor.close()
             connection.close()
 
+STOCK_BY_CODE_SQL = "SELECT * FROM stocks WHERE stock_code = %s"
+
+@metrics.timed_db(rows=lambda stock: 1 if stock else 0)
+@stock_lookups.coalesce
 def get_stock_by_code(stock_code):
     """
     根據股票代號獲取股票信息
@@ -107,86 +279,178 @@ def get_stock_by_code(stock_code):
         return None
     
     try:
-        cursor = connection.cursor(dictionary=True)
-        
-        query = "SELECT * FROM stocks WHERE stock_code = %s"
-        cursor.execute(query, (stock_code,))
-        stock = cursor.fetchone()
-        
-        return stock
+        stocks = _fetch_rows(connection, STOCK_BY_CODE_SQL, (stock_code,))
+        return stocks[0] if stocks else None
         
     except Error as e:
-        print(f"獲取股票信息時發生錯誤: {e}")
+        logger.error("獲取股票信息時發生錯誤: %s", e)
         return None
     finally:
         if connection.is_connected():
-            cursor.close()
             connection.close()
 
+@metrics.timed_db()
 def add_note(stock_code, stock_name, note_type, content, ref=None, ref_time=None):
     """
-    添加新的股票筆記
+    添加新的股票筆記（股票新增/更名、筆記寫入與統計摘要在同一個交易中完成）
+    股票以一條條件式寫入處理，不先 SELECT：名稱相同時不會修改資料列，股票不存在時（例如已被其他行程刪除）重新新增
+    未提供名稱時以股票目錄中的名稱為準，目錄中沒有該股票時才查詢資料庫
     參數:
         stock_code: 股票代碼
-        stock_name: 股票名稱
+        stock_name: 股票名稱（空白或與代碼相同時視為未提供：新股票使用預設名稱，不覆蓋既有名稱）
         note_type: 筆記類型 (TAG 或 STORY)
         content: 筆記內容
         ref: 資料來源（可選）
         ref_time: 來源時間（可選）
-    返回: 布爾值，表示操作是否成功
+    返回: 新增的筆記字典（格式同 get_note_by_id，但不含由資料庫設定的 updated_at），失敗時返回 None
     """
+    if not stock_name or stock_name.strip() == '' or stock_name == stock_code:
+        stock_name = None
+
     connection = get_db_connection()
     if not connection:
-        return False
-    
+        return None
+
+    # 股票目錄只是行程內的快取（其他 worker 可能已刪除或更名該股票），不能據此略過股票的寫入
+    known = stock_directory.get(stock_code)
+
+    def write():
+        if stock_name:
+            cursor.execute(_backend.upsert_stock_name_sql, (stock_code, stock_name))
+            if cursor.rowcount > 0:
+                # 新增或更名（名稱相同時不影響任何資料列）；新股票還沒有筆記，更新不到任何資料列
+                _touch_stock_notes(cursor, [stock_code])
+        else:
+            default_name = known['stock_name'] if known is not None else f"股票{stock_code}"
+            cursor.execute(_backend.insert_stock_if_missing_sql, (stock_code, default_name))
+
+        # 時間只保留到秒，與資料庫中的值一致；updated_at 由資料庫設定（變更同步以資料庫時鐘為準）
+        current_time = datetime.now().replace(microsecond=0)
+        cursor.execute(
+            """
+            INSERT INTO notes (stock_code, note_type, content, ref, ref_time, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            (stock_code, note_type, content, ref, ref_time, current_time),
+        )
+        note_id = cursor.lastrowid
+        _apply_note_stats(cursor, [(stock_code, note_type, ref, current_time, 1)])
+
+        name = stock_name
+        if not name:
+            if known is not None:
+                name = known['stock_name']
+            else:
+                # 未提供名稱且目錄中沒有該股票：以資料庫中的名稱為準（可能早已存在）
+                cursor.execute("SELECT stock_name FROM stocks WHERE stock_code = %s", (stock_code,))
+                name = cursor.fetchone()[0]
+
+        connection.commit()
+        return note_id, current_time, name
+
     try:
         cursor = connection.cursor()
-        
-        # 處理股票名稱：如果沒有提供或與代碼相同，則使用預設名稱
-        if not stock_name or stock_name.strip() == '' or stock_name == stock_code:
-            stock_name = f"股票{stock_code}"  # 預設名稱格式
-        
-        # 首先檢查股票是否已存在
-        check_stock_query = "SELECT stock_code, stock_name FROM stocks WHERE stock_code = %s"
-        cursor.execute(check_stock_query, (stock_code,))
-        existing_stock = cursor.fetchone()
-        
-        if existing_stock:
-            existing_name = existing_stock[1]
-            # 如果股票存在且名稱不同，更新股票名稱
-            if existing_name != stock_name:
-                update_stock_query = """
-                    UPDATE stocks SET stock_name = %s, last_updated = CURRENT_TIMESTAMP
-                    WHERE stock_code = %s
-                """
-                cursor.execute(update_stock_query, (stock_name, stock_code))
-                print(f"已更新股票名稱: {stock_code} - {existing_name} -> {stock_name}")
+        # 股票、筆記與統計摘要在同一個交易中提交或回滾
+        note_id, current_time, stock_name = _run_write_transaction(connection, write)
+        notes_cache.invalidate()
+        if known is None or known['stock_name'] != stock_name:
+            stock_directory.upsert(stock_code, stock_name)
+        logger.info("已成功添加筆記: %s - %s - %s - %s", stock_code, stock_name, note_type, current_time)
+        return {
+            'id': note_id,
+            'stock_code': stock_code,
+            'stock_name': stock_name,
+            'note_type': note_type,
+            'content': content,
+            'ref': ref,
+            'ref_time': ref_time.strftime('%Y-%m-%d %H:%M:%S') if ref_time else None,
+            'created_at': current_time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+    except Error as e:
+        logger.error("添加筆記時發生錯誤: %s", e)
+        if connection.is_connected():
+            connection.rollback()
+        return None
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+@metrics.timed_db(rows=lambda inserted: inserted or 0)
+def add_notes_bulk(notes):
+    """
+    批次新增筆記（單一交易）
+    引用的股票先一次查出，不存在的批次新增、名稱不同的批次更新，筆記再以 executemany 寫入
+    參數:
+        notes: 已驗證的筆記字典列表，keys: stock_code, stock_name(可為 None), note_type, content,
+               ref, ref_time, created_at(可為 None，預設為目前時間)
+    返回: 寫入的筆記數，失敗時返回 None（整批回滾）
+    """
+    if not notes:
+        return 0
+    connection = get_db_connection()
+    if not connection:
+        return None
+
+    # 同一股票以最後一筆提供的名稱為準；未提供名稱時不覆蓋既有名稱
+    # 依股票代碼排序，同時寫入的交易以相同順序鎖定股票資料列
+    names = {}
+    for note in notes:
+        if note.get('stock_name'):
+            names[note['stock_code']] = note['stock_name']
         else:
-            # 如果股票不存在，新增到stocks表
-            insert_stock_query = """
-                INSERT INTO stocks (stock_code, stock_name, industry) 
-                VALUES (%s, %s, %s)
+            names.setdefault(note['stock_code'], None)
+    names = dict(sorted(names.items()))
+
+    def write():
+        existing = _fetch_existing_stocks(cursor, list(names))
+        new_stocks = [(code, name or f"股票{code}", None) for code, name in names.items() if code not in existing]
+        renamed = [(name, code) for code, name in names.items()
+                   if code in existing and name and existing[code][0] != name]
+        if new_stocks:
+            cursor.executemany("INSERT INTO stocks (stock_code, stock_name, industry) VALUES (%s, %s, %s)", new_stocks)
+        if renamed:
+            cursor.executemany(
+                f"UPDATE stocks SET stock_name = %s, last_updated = {_backend.now_sql} WHERE stock_code = %s",
+                renamed,
+            )
+            _touch_stock_notes(cursor, [code for _, code in renamed])
+
+        # 與 add_note 相同只保留到秒（MySQL 會把 0.5 秒以上進位到下一秒，可能晚於之後逐筆新增的筆記）
+        current_time = datetime.now().replace(microsecond=0)
+        cursor.executemany(
             """
-            cursor.execute(insert_stock_query, (stock_code, stock_name, None))
-            print(f"已添加新股票: {stock_code} - {stock_name}")
-        
-        # 添加筆記到notes表（包含當前時間和來源資訊）
-        insert_note_query = """
-            INSERT INTO notes (stock_code, note_type, content, ref, ref_time, created_at) 
+            INSERT INTO notes (stock_code, note_type, content, ref, ref_time, created_at)
             VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        current_time = datetime.now()
-        cursor.execute(insert_note_query, (stock_code, note_type, content, ref, ref_time, current_time))
-        
+            """,
+            [(note['stock_code'], note['note_type'], note['content'], note.get('ref'), note.get('ref_time'),
+              note.get('created_at') or current_time) for note in notes],
+        )
+        _apply_note_stats(cursor, [(note['stock_code'], note['note_type'], note.get('ref'),
+                                    note.get('created_at') or current_time, 1) for note in notes])
         connection.commit()
-        print(f"已成功添加筆記: {stock_code} - {stock_name} - {note_type} - {current_time}")
-        return True
-        
+        return new_stocks, renamed
+
+    try:
+        cursor = connection.cursor()
+        new_stocks, renamed = _run_write_transaction(connection, write)
+        notes_cache.invalidate()
+
+        if stock_directory.loaded:
+            for code, name, industry in new_stocks:
+                stock_directory.upsert(code, name, industry)
+            for name, code in renamed:
+                stock_directory.upsert(code, name)
+        logger.debug("已批次新增 %d 條筆記（新增 %d 檔股票、更新 %d 檔股票名稱）",
+                    len(notes), len(new_stocks), len(renamed))
+        return len(notes)
+
     except Error as e:
-        print(f"添加筆記時發生錯誤: {e}")
+        logger.error("批次新增筆記時發生錯誤: %s", e)
         if connection.is_connected():
             connection.rollback()
-        return False
+        return None
     finally:
         if connection.is_connected():
             cursor.close()
@@ -194,172 +458,463 @@ def add_note(stock_code, stock_name, note_type, content, ref=None, ref_time=None
 
 def get_ref_options(limit=10):
     """
-    獲取常用的來源選項
+    獲取常用的來源選項（由 ref_stats 摘要表讀取）
     參數:
         limit: 返回結果數量限制
     返回: 來源選項列表
     """
+    return [row['ref'] for row in get_ref_stats(limit)]
+
+# 筆記列表允許的排序欄位及其對應的 SQL 欄位
+NOTES_SORT_COLUMNS = {
+    'created_at': 'n.created_at',
+    'stock_code': 'n.stock_code',
+    'stock_name': 's.stock_name',
+    'note_type': 'n.note_type',
+    'relevance': 'relevance',  # 僅在全文搜尋模式下可用
+}
+
+# note_type 依 TAG、STORY 的順序（而非字串）排序，分頁比較時需使用相同的順序
+NOTE_TYPE_ORDER = {'TAG': 1, 'STORY': 2}
+
+# 若資料庫尚未建立全文索引，第一次查詢失敗後改用 LIKE 搜尋
+_fulltext_available = NOTES_FULLTEXT_SEARCH
+
+def _fulltext_query(search_term):
+    """
+    將搜尋關鍵字轉為 BOOLEAN MODE 的片語查詢
+    返回: 查詢字串；關鍵字過短（ngram 無法比對）或未啟用全文索引時返回 None
+    """
+    if not _fulltext_available:
+        return None
+    # 片語內只有雙引號具特殊意義
+    term = search_term.replace('"', ' ').strip()
+    if len(term) < max(NOTES_FULLTEXT_MIN_LENGTH, _backend.fulltext_min_length or 0):
+        return None
+    return f'"{term}"'
+
+def _normalize_sort(sort_by, sort_order, fulltext=False):
+    """驗證排序參數，無效時回到預設值"""
+    if sort_by not in NOTES_SORT_COLUMNS or (sort_by == 'relevance' and not fulltext):
+        sort_by = 'created_at'
+    if sort_order not in ['ASC', 'DESC']:
+        sort_order = 'DESC'
+    return sort_by, sort_order
+
+def parse_notes_cursor(after, sort_by):
+    """
+    解析分頁游標
+    參數:
+        after: 游標字串，格式為 "<排序欄位值>,<筆記ID>"
+        sort_by: 排序欄位（決定游標值的型別）
+    返回: (排序欄位值, 筆記ID)，游標無效時拋出 ValueError
+    """
+    # 排序欄位值可能含有逗號（如股票名稱），筆記ID 固定在最後一段
+    value, sep, note_id = after.rpartition(',')
+    if not sep:
+        raise ValueError(f"無效的分頁游標: {after}")
+    note_id = int(note_id)
+    if sort_by == 'note_type':
+        if value not in NOTE_TYPE_ORDER:
+            raise ValueError(f"無效的分頁游標: {after}")
+        value = NOTE_TYPE_ORDER[value]
+    elif sort_by == 'relevance':
+        value = float(value)
+    return value, note_id
+
+def make_notes_cursor(note, sort_by):
+    """由一筆（已格式化的）筆記產生分頁游標"""
+    return f"{note[sort_by]},{note['id']}"
+
+def _build_notes_query(search_term='', sort_by='created_at', sort_order='DESC', after=None, limit=None,
+                       fulltext_query=None):
+    """
+    組合筆記列表查詢
+    參數:
+        search_term: 搜尋關鍵字
+        sort_by, sort_order: 已驗證的排序參數
+        after: parse_notes_cursor() 的結果，None 表示第一頁
+        limit: 返回筆數上限，None 表示不限制
+        fulltext_query: _fulltext_query() 的結果，None 表示使用 LIKE 搜尋
+    返回: (SQL, 參數列表)
+    """
+    select_columns = """
+            n.id,
+            n.stock_code,
+            s.stock_name,
+            n.note_type,
+            n.content,
+            n.ref,
+            n.ref_time,
+            n.created_at
+    """
+    select_params = []
+    from_clause = """
+        FROM notes n
+        JOIN stocks s ON n.stock_code = s.stock_code
+    """
+    from_params = []
+    conditions = []
+    params = []
+
+    relevance_key, relevance_key_params = None, []
+    if search_term and fulltext_query:
+        # 全文搜尋：內容/來源走全文索引，股票代碼/名稱走 stocks 表（SQL 片段由後端提供）
+        (relevance_select, relevance_params, from_clause, from_params,
+         relevance_key, relevance_key_params) = _backend.fulltext_source(fulltext_query, f"%{search_term}%")
+        select_columns += f", {relevance_select} AS relevance"
+        select_params.extend(relevance_params)
+    elif search_term:
+        # 關鍵字過短或未建立全文索引時使用 LIKE 搜尋
+        conditions.append("""
+            (n.stock_code LIKE %s 
+               OR s.stock_name LIKE %s 
+               OR n.content LIKE %s
+               OR n.ref LIKE %s)
+        """)
+        search_pattern = f"%{search_term}%"
+        params.extend([search_pattern, search_pattern, search_pattern, search_pattern])
+
+    # 排序（以筆記ID作為次要排序，確保順序穩定，才能用游標分頁）
+    sort_column = _backend.note_type_sort if sort_by == 'note_type' else NOTES_SORT_COLUMNS[sort_by]
+    compare = '<' if sort_order == 'DESC' else '>'
+
+    # 游標分頁條件：(排序欄位, id) 位於上一頁最後一筆之後
+    if after is not None:
+        cursor_value, cursor_id = after
+        key_params = []
+        if sort_by == 'note_type':
+            key_column = _backend.note_type_key
+        elif sort_by == 'relevance':
+            key_column = relevance_key
+            key_params = relevance_key_params
+        else:
+            key_column = sort_column
+        # 以 "排序欄位 <= 值" 為外層條件，資料庫可直接從索引定位到游標位置（範圍掃描），不必從頭略過前面各頁
+        conditions.append(
+            f"({key_column} {compare}= %s AND ({key_column} {compare} %s OR n.id {compare} %s))"
+        )
+        params.extend(key_params + [cursor_value] + key_params + [cursor_value, cursor_id])
+
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order_clause = f"{sort_column} {sort_order}, n.id {sort_order}"
+
+    full_query = f"SELECT {select_columns} {from_clause} {where_clause} ORDER BY {order_clause}"
+    if limit is not None:
+        full_query += " LIMIT %s"
+        params.append(limit)
+
+    return full_query, select_params + from_params + params
+
+def _fetch_rows(connection, query, params, time_fields=()):
+    """
+    執行查詢並返回字典列表
+    參數:
+        time_fields: 需格式化為 'YYYY-mm-dd HH:MM:SS' 字串的時間欄位（在建立字典的同一次迴圈中處理）
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, params)
+        return _rows_to_dicts(cursor.description, cursor.fetchall(), time_fields)
+    finally:
+        cursor.close()
+
+def _rows_to_dicts(description, rows, time_fields=()):
+    """
+    將 tuple 資料列轉為字典列表（欄位名稱只取一次，不使用逐筆建立字典的 dictionary 游標）
+    time_fields 中的時間欄位依欄位位置直接格式化，不需再逐筆、逐欄位查字典
+    """
+    columns = [column[0] for column in description]
+    time_indexes = [index for index, column in enumerate(columns) if column in time_fields]
+    if not time_indexes:
+        return [dict(zip(columns, row)) for row in rows]
+
+    result = []
+    for row in rows:
+        row = list(row)
+        for index in time_indexes:
+            value = row[index]
+            if value:
+                row[index] = value.isoformat(' ', 'seconds')
+        result.append(dict(zip(columns, row)))
+    return result
+
+# 筆記列表的時間欄位
+NOTE_TIME_FIELDS = ('created_at', 'ref_time')
+
+def format_note_times(note, fields=NOTE_TIME_FIELDS):
+    """將筆記的時間欄位格式化為 'YYYY-mm-dd HH:MM:SS' 字串（就地修改並返回同一個字典）"""
+    for field in fields:
+        if note[field]:
+            # isoformat 比 strftime 快數倍，到秒為止的輸出格式相同
+            note[field] = note[field].isoformat(' ', 'seconds')
+    return note
+
+def disable_fulltext():
+    """找不到全文索引（尚未執行 002 遷移）時呼叫：之後的搜尋改用 LIKE"""
+    global _fulltext_available
+    logger.warning("找不到筆記全文索引，改用 LIKE 搜尋（請執行 python migrate.py migrate）")
+    _fulltext_available = False
+
+def _query_notes(search_term, sort_by, sort_order, after=None, limit=None, fulltext_query=None):
+    """
+    執行筆記列表查詢並格式化時間欄位
+    相同參數的結果由 notes_cache 快取，寫入後自動失效（返回的列表與其他呼叫端共用，不可修改）
+    """
+    return notes_cache.get_or_load(
+        (search_term, sort_by, sort_order, after, limit, fulltext_query),
+        lambda: _load_notes(search_term, sort_by, sort_order, after, limit, fulltext_query),
+    )
+
+def _load_notes(search_term, sort_by, sort_order, after=None, limit=None, fulltext_query=None):
+    """查詢資料庫，返回 (筆記列表, 是否可快取)；查詢失敗時返回空列表且不可快取"""
     connection = get_db_connection()
     if not connection:
-        return []
+        return [], False
     
     try:
-        cursor = connection.cursor()
-        
-        query = """
-            SELECT ref, COUNT(*) as count
-            FROM notes 
-            WHERE ref IS NOT NULL AND ref != ''
-            GROUP BY ref
-            ORDER BY count DESC, ref ASC
-            LIMIT %s
-        """
-        
-        cursor.execute(query, (limit,))
-        results = cursor.fetchall()
-        
-        return [row[0] for row in results]
+        try:
+            full_query, params = _build_notes_query(search_term, sort_by, sort_order, after, limit, fulltext_query)
+            notes = _fetch_rows(connection, full_query, params, NOTE_TIME_FIELDS)
+            return notes, True
+        except Error as e:
+            if not (fulltext_query and getattr(e, 'errno', None) == ER_FT_MATCHING_KEY_NOT_FOUND):
+                raise
+            # 尚未執行 002 遷移：停用全文搜尋並改用 LIKE 重試
+            disable_fulltext()
+            if sort_by == 'relevance':
+                return [], False
+        # 直接在同一條連線上查詢，不經過 _query_notes（避免在快取的載入函式中再進入一次快取與 single-flight）；
+        # 結果對應的是 LIKE 查詢，不以全文搜尋的鍵快取
+        full_query, params = _build_notes_query(search_term, sort_by, sort_order, after, limit)
+        return _fetch_rows(connection, full_query, params, NOTE_TIME_FIELDS), False
         
     except Error as e:
-        print(f"獲取來源選項時發生錯誤: {e}")
-        return []
+        logger.error("獲取筆記時發生錯誤: %s", e)
+        return [], False
     finally:
         if connection.is_connected():
-            cursor.close()
             connection.close()
 
+@metrics.timed_db()
 def get_all_notes(search_term='', sort_by='created_at', sort_order='DESC'):
     """
     獲取所有筆記，支援搜尋和排序
     參數:
         search_term: 搜尋關鍵字（股票代碼、名稱或內容）
-        sort_by: 排序欄位 (stock_code, stock_name, note_type, created_at)
+        sort_by: 排序欄位 (stock_code, stock_name, note_type, created_at；
+                 全文搜尋時可用 relevance 依相關度排序)
+        sort_order: 排序方向 (ASC, DESC)
+    返回: 筆記列表，每個筆記是一個字典（筆記字典可能來自快取，請勿修改）
+    """
+    fulltext_query = _fulltext_query(search_term) if search_term else None
+    sort_by, sort_order = _normalize_sort(sort_by, sort_order, fulltext_query is not None)
+    return list(_query_notes(search_term, sort_by, sort_order, fulltext_query=fulltext_query))
+
+def iter_notes(search_term='', sort_by='created_at', sort_order='DESC', batch_size=None):
+    """
+    串流讀取所有筆記（供匯出使用），條件與排序同 get_all_notes，但不經過快取也不一次載入全部資料
+    MySQL 使用不緩衝的游標（buffered=False），每次 fetchmany(batch_size) 筆，記憶體用量與筆記數量無關
+    參數:
+        search_term: 搜尋關鍵字（股票代碼、名稱或內容）
+        sort_by: 排序欄位
         sort_order: 排序方向 (ASC, DESC)
-    返回: 筆記列表，每個筆記是一個字典
+        batch_size: 每次讀取的筆數（預設 NOTES_EXPORT_BATCH_SIZE）
+    返回: 產生器，每次產生一批筆記字典（列表）
+    例外: 無法取得連線時拋出 ConnectionError；查詢或讀取失敗時記錄錯誤並拋出 Error（之前產生的批次不受影響）
+    注意: 讀取期間會佔用一個連線；中途停止（例如客戶端斷線）時該連線仍有未讀取的結果，會直接作廢
     """
+    batch_size = max(1, batch_size or NOTES_EXPORT_BATCH_SIZE)
+    fulltext_query = _fulltext_query(search_term) if search_term else None
+    sort_by, sort_order = _normalize_sort(sort_by, sort_order, fulltext_query is not None)
+
     connection = get_db_connection()
     if not connection:
-        return []
-    
+        raise ConnectionError("無法取得數據庫連接")
+
+    cursor = None
+    finished = False
+    try:
+        cursor = connection.cursor(buffered=False)
+        full_query, params = _build_notes_query(search_term, sort_by, sort_order, fulltext_query=fulltext_query)
+        try:
+            cursor.execute(full_query, params)
+        except Error as e:
+            if not (fulltext_query and getattr(e, 'errno', None) == ER_FT_MATCHING_KEY_NOT_FOUND):
+                raise
+            # 尚未執行 002 遷移：停用全文搜尋並改用 LIKE 重試
+            disable_fulltext()
+            if sort_by == 'relevance':
+                sort_by = 'created_at'
+            full_query, params = _build_notes_query(search_term, sort_by, sort_order)
+            cursor.execute(full_query, params)
+
+        exported = 0
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            notes = _rows_to_dicts(cursor.description, rows, NOTE_TIME_FIELDS)
+            for note in notes:
+                note.pop('relevance', None)
+            exported += len(notes)
+            yield notes
+        finished = True
+        logger.info("已匯出 %d 筆筆記", exported)
+
+    except Error as e:
+        logger.error("匯出筆記時發生錯誤: %s", e)
+        raise
+    finally:
+        if connection.is_connected():
+            if finished:
+                cursor.close()
+                connection.close()
+            else:
+                # 不緩衝的結果集尚未讀完，連線無法再執行其他查詢
+                connection.invalidate()
+
+@metrics.timed_db(rows=lambda page: len(page['notes']))
+def get_notes_page(search_term='', sort_by='created_at', sort_order='DESC', after=None, limit=50):
+    """
+    以游標（keyset）分頁獲取筆記
+    參數:
+        search_term: 搜尋關鍵字（股票代碼、名稱或內容）
+        sort_by: 排序欄位 (stock_code, stock_name, note_type, created_at；
+                 全文搜尋時可用 relevance 依相關度排序)
+        sort_order: 排序方向 (ASC, DESC)
+        after: 上一頁返回的 next_cursor，None 表示第一頁；格式無效時拋出 ValueError
+        limit: 每頁筆數
+    返回: 字典 {notes, next_cursor, has_more, sort_by, sort_order}
+    """
+    args = notes_page_query_args(search_term, sort_by, sort_order, after, limit)
+    return make_notes_page(_query_notes(*args), limit, args[1], args[2])
+
+def notes_page_query_args(search_term, sort_by, sort_order, after, limit):
+    """
+    驗證分頁參數（不查詢資料庫，同步與非同步路徑共用）
+    返回: _query_notes 的參數 (search_term, sort_by, sort_order, 已解析的游標, 筆數, fulltext_query)；
+          游標無效時拋出 ValueError
+    """
+    fulltext_query = _fulltext_query(search_term) if search_term else None
+    sort_by, sort_order = _normalize_sort(sort_by, sort_order, fulltext_query is not None)
+    parsed_after = parse_notes_cursor(after, sort_by) if after else None
+    # 多取一筆用來判斷是否還有下一頁
+    return search_term, sort_by, sort_order, parsed_after, limit + 1, fulltext_query
+
+def notes_to_columns(notes):
+    """
+    將筆記列表轉為欄位/資料列格式 {columns, rows}（/api/notes?format=columns）
+    每筆只輸出值，不重複欄位名稱，回應較小、序列化較快
+    """
+    if not notes:
+        return {'columns': [], 'rows': []}
+    columns = list(notes[0])
+    values = operator.itemgetter(*columns)
+    return {'columns': columns, 'rows': [values(note) for note in notes]}
+
+def make_notes_page(notes, limit, sort_by, sort_order):
+    """由多取一筆的查詢結果組成 get_notes_page 的返回值"""
+    has_more = len(notes) > limit
+    notes = notes[:limit]
+
+    return {
+        'notes': notes,
+        'next_cursor': make_notes_cursor(notes[-1], sort_by) if has_more else None,
+        'has_more': has_more,
+        'sort_by': sort_by,
+        'sort_order': sort_order,
+    }
+
+def notes_version_query():
+    """
+    讀取筆記列表資料版本的 SQL：最後修改時間（股票更名也會更新筆記的 updated_at）、最後刪除時間與判斷是否已穩定的時間點
+    兩個 MAX 都由索引（notes.updated_at、note_deletions.deleted_at）直接取得，不掃描資料表
+    """
+    return (f"SELECT (SELECT MAX(updated_at) FROM notes) AS last_update, "
+            f"(SELECT MAX(deleted_at) FROM note_deletions) AS last_delete, "
+            f"{_backend.seconds_ago_sql(NOTES_CHANGES_SETTLE_SECONDS)} AS settled")
+
+def make_notes_version(row):
+    """
+    由 notes_version_query() 的結果組成資料版本字串
+    時間戳記只到秒，且在語句執行時決定：最後的變更在 NOTES_CHANGES_SETTLE_SECONDS 秒內時，
+    同一秒內可能還有其他變更或較晚提交的交易，此時返回每次都不同的版本（不讓客戶端以 304 沿用，也不共用快取）
+    """
+    last_update, last_delete = _as_datetime(row['last_update']), _as_datetime(row['last_delete'])
+    settled = _as_datetime(row['settled'])
+    version = f"{last_update}/{last_delete}"
+    if any(value is not None and value > settled for value in (last_update, last_delete)):
+        version += '/' + os.urandom(8).hex()
+    return version
+
+@metrics.timed_db()
+def get_notes_version():
+    """
+    筆記列表的資料版本（供 /api/notes 的 ETag 與快取使用）
+    由資料庫狀態計算：所有主機與行程對相同的資料得到相同的版本，包含不經過本應用程式的寫入
+    返回: 版本字串，無法查詢時返回 None
+    """
+    connection = get_db_connection()
+    if not connection:
+        return None
+
     try:
         cursor = connection.cursor(dictionary=True)
-        
-        # 基礎查詢
-        base_query = """
-            SELECT 
-                n.id,
-                n.stock_code,
-                s.stock_name,
-                n.note_type,
-                n.content,
-                n.ref,
-                n.ref_time,
-                n.created_at
-            FROM notes n
-            JOIN stocks s ON n.stock_code = s.stock_code
-        """
-        
-        # 搜尋條件
-        where_clause = ""
-        params = []
-        
-        if search_term:
-            where_clause = """
-                WHERE n.stock_code LIKE %s 
-                   OR s.stock_name LIKE %s 
-                   OR n.content LIKE %s
-                   OR n.ref LIKE %s
-            """
-            search_pattern = f"%{search_term}%"
-            params = [search_pattern, search_pattern, search_pattern, search_pattern]
-        
-        # 排序
-        valid_sort_fields = ['stock_code', 'stock_name', 'note_type', 'created_at']
-        if sort_by not in valid_sort_fields:
-            sort_by = 'created_at'
-        
-        if sort_order not in ['ASC', 'DESC']:
-            sort_order = 'DESC'
-        
-        # 根據排序欄位調整查詢
-        if sort_by == 'stock_name':
-            order_clause = f"s.stock_name {sort_order}"
-        elif sort_by == 'created_at':
-            order_clause = f"n.created_at {sort_order}"
-        else:
-            order_clause = f"n.{sort_by} {sort_order}"
-        
-        # 組合完整查詢
-        full_query = f"{base_query} {where_clause} ORDER BY {order_clause}"
-        
-        cursor.execute(full_query, params)
-        notes = cursor.fetchall()
-        
-        # 格式化時間顯示
-        for note in notes:
-            if note['created_at']:
-                note['created_at'] = note['created_at'].strftime('%Y-%m-%d %H:%M:%S')
-            if note['ref_time']:
-                note['ref_time'] = note['ref_time'].strftime('%Y-%m-%d %H:%M:%S')
-        
-        return notes
-        
+        cursor.execute(notes_version_query())
+        return make_notes_version(cursor.fetchone())
     except Error as e:
-        print(f"獲取筆記時發生錯誤: {e}")
-        return []
+        logger.error("獲取筆記資料版本時發生錯誤: %s", e)
+        return None
     finally:
         if connection.is_connected():
             cursor.close()
             connection.close()
 
+NOTE_BY_ID_SQL = """
+    SELECT 
+        n.id,
+        n.stock_code,
+        s.stock_name,
+        n.note_type,
+        n.content,
+        n.ref,
+        n.ref_time,
+        n.created_at,
+        n.updated_at
+    FROM notes n
+    JOIN stocks s ON n.stock_code = s.stock_code
+    WHERE n.id = %s
+"""
+# updated_at 保留為 datetime，供 HTTP Last-Modified 直接使用；輸出 JSON 前以 format_note_times 格式化
+NOTE_BY_ID_TIME_FIELDS = ('created_at', 'ref_time')
+
+@metrics.timed_db(rows=lambda note: 1 if note else 0)
+@note_lookups.coalesce
 def get_note_by_id(note_id):
     """
     根據ID獲取單一筆記
     參數:
         note_id: 筆記ID
-    返回: 筆記字典或None
+    返回: 筆記字典（含 updated_at datetime，供 HTTP Last-Modified 使用）或None；
+          同時查詢同一筆記的呼叫端共用同一個字典，請勿修改
     """
     connection = get_db_connection()
     if not connection:
         return None
     
     try:
-        cursor = connection.cursor(dictionary=True)
-        
-        query = """
-            SELECT 
-                n.id,
-                n.stock_code,
-                s.stock_name,
-                n.note_type,
-                n.content,
-                n.ref,
-                n.ref_time,
-                n.created_at
-            FROM notes n
-            JOIN stocks s ON n.stock_code = s.stock_code
-            WHERE n.id = %s
-        """
-        
-        cursor.execute(query, (note_id,))
-        note = cursor.fetchone()
-        
-        if note:
-            if note['created_at']:
-                note['created_at'] = note['created_at'].strftime('%Y-%m-%d %H:%M:%S')
-            if note['ref_time']:
-                note['ref_time'] = note['ref_time'].strftime('%Y-%m-%d %H:%M:%S')
-        
-        return note
+        notes = _fetch_rows(connection, NOTE_BY_ID_SQL, (note_id,), NOTE_BY_ID_TIME_FIELDS)
+        return notes[0] if notes else None
         
     except Error as e:
-        print(f"獲取筆記時發生錯誤: {e}")
+        logger.error("獲取筆記時發生錯誤: %s", e)
         return None
     finally:
         if connection.is_connected():
-            cursor.close()
             connection.close()
 
+@metrics.timed_db()
 def update_note(note_id, note_type, content, ref=None, ref_time=None):
     """
     更新筆記
@@ -380,28 +935,42 @@ def update_note(note_id, note_type, content, ref=None, ref_time=None):
         
         # 驗證筆記類型
         if note_type not in ['TAG', 'STORY']:
-            print(f"無效的筆記類型: {note_type}")
+            logger.warning("無效的筆記類型: %s", note_type)
             return False
         
-        # 更新筆記（包含來源資訊）
-        update_query = """
-            UPDATE notes 
-            SET note_type = %s, content = %s, ref = %s, ref_time = %s, updated_at = CURRENT_TIMESTAMP
-            WHERE id = %s
-        """
-        
-        cursor.execute(update_query, (note_type, content, ref, ref_time, note_id))
-        connection.commit()
-        
-        if cursor.rowcount > 0:
-            print(f"筆記 {note_id} 更新成功")
+        def write():
+            # 先讀取原本的類型與來源（類型或來源改變時需同步調整統計摘要）
+            cursor.execute(NOTE_STATS_ROW_SQL + _backend.lock_rows_sql, (note_id,))
+            old = cursor.fetchone()
+            if old is None:
+                connection.rollback()
+                return False
+
+            # 更新筆記（包含來源資訊）
+            update_query = f"""
+                UPDATE notes 
+                SET note_type = %s, content = %s, ref = %s, ref_time = %s, updated_at = {_backend.now_sql}
+                WHERE id = %s
+            """
+
+            cursor.execute(update_query, (note_type, content, ref, ref_time, note_id))
+            stock_code, old_type, old_ref, created_at = old
+            if (old_type, old_ref or None) != (note_type, ref or None):
+                _apply_note_stats(cursor, [(stock_code, old_type, old_ref, created_at, -1),
+                                           (stock_code, note_type, ref, created_at, 1)])
+            connection.commit()
             return True
-        else:
-            print(f"筆記 {note_id} 不存在或更新失敗")
+
+        if not _run_write_transaction(connection, write):
+            logger.warning("筆記 %s 不存在或更新失敗", note_id)
             return False
         
+        notes_cache.invalidate()
+        logger.info("筆記 %s 更新成功", note_id)
+        return True
+        
     except Error as e:
-        print(f"更新筆記時發生錯誤: {e}")
+        logger.error("更新筆記時發生錯誤: %s", e)
         if connection.is_connected():
             connection.rollback()
         return False
@@ -410,9 +979,10 @@ def update_note(note_id, note_type, content, ref=None, ref_time=None):
             cursor.close()
             connection.close()
 
+@metrics.timed_db()
 def delete_note(note_id):
     """
-    刪除筆記
+    刪除筆記，並在同一交易中寫入刪除紀錄（供 get_note_changes 返回）與扣除統計摘要
     參數:
         note_id: 筆記ID
     返回: 布爾值，表示是否成功
@@ -421,27 +991,149 @@ def delete_note(note_id):
     if not connection:
         return False
     
+    def write():
+        # 先讀取股票、類型與來源，刪除後才能扣除對應的統計
+        cursor.execute(NOTE_STATS_ROW_SQL + _backend.lock_rows_sql, (note_id,))
+        old = cursor.fetchone()
+        if old is None:
+            connection.rollback()
+            return False
+
+        cursor.execute("DELETE FROM notes WHERE id = %s", (note_id,))
+        cursor.execute("INSERT INTO note_deletions (note_id) VALUES (%s)", (note_id,))
+        stock_code, note_type, ref, created_at = old
+        _apply_note_stats(cursor, [(stock_code, note_type, ref, created_at, -1)])
+        connection.commit()
+        return True
+
     try:
         cursor = connection.cursor()
-        
-        # 先檢查筆記是否存在
-        check_query = "SELECT id FROM notes WHERE id = %s"
-        cursor.execute(check_query, (note_id,))
-        
-        if not cursor.fetchone():
-            print(f"筆記 {note_id} 不存在")
+        if not _run_write_transaction(connection, write):
+            logger.warning("筆記 %s 不存在", note_id)
             return False
+        notes_cache.invalidate()
         
-        # 刪除筆記
-        delete_query = "DELETE FROM notes WHERE id = %s"
-        cursor.execute(delete_query, (note_id,))
-        connection.commit()
-        
-        print(f"筆記 {note_id} 刪除成功")
+        logger.info("筆記 %s 刪除成功", note_id)
         return True
         
     except Error as e:
-        print(f"刪除筆記時發生錯誤: {e}")
+        logger.error("刪除筆記時發生錯誤: %s", e)
+        if connection.is_connected():
+            connection.rollback()
+        return False
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def _run_write_transaction(connection, write):
+    """
+    開始交易並執行 write()（由 write 提交或回滾）
+    寫入筆記時會在同一交易中增減統計摘要，同時寫入相同股票或來源的交易可能互相鎖定而死結；
+    MySQL 偵測到死結時會回滾其中一個交易，此時重新執行整個 write()，最多 DEADLOCK_RETRIES 次
+    返回: write() 的返回值
+    """
+    for attempt in range(DEADLOCK_RETRIES + 1):
+        connection.start_transaction()
+        try:
+            return write()
+        except Error as e:
+            if getattr(e, 'errno', None) != ER_LOCK_DEADLOCK or attempt == DEADLOCK_RETRIES:
+                raise
+            connection.rollback()
+            logger.warning("寫入交易發生死結，重新執行（第 %d 次）: %s", attempt + 1, e)
+            # 稍微錯開重試時間，避免與另一個交易再次同時鎖定
+            time.sleep(random.uniform(0, 0.05 * (attempt + 1)))
+
+# 更新/刪除筆記前讀取統計摘要需要的欄位
+NOTE_STATS_ROW_SQL = "SELECT stock_code, note_type, ref, created_at FROM notes WHERE id = %s"
+
+def _apply_note_stats(cursor, changes):
+    """
+    在寫入筆記的同一交易中增減統計摘要（stock_note_stats、stock_ref_stats、ref_stats）
+    參數:
+        cursor: 交易中的游標
+        changes: [(股票代碼, 筆記類型, 來源, 建立時間, 1 或 -1), ...]
+    """
+    type_deltas = {}
+    stock_ref_deltas = {}
+    ref_deltas = {}
+    for stock_code, note_type, ref, created_at, delta in changes:
+        count, last_note_at, removed = type_deltas.get((stock_code, note_type), (0, None, False))
+        if delta > 0 and (last_note_at is None or created_at > last_note_at):
+            last_note_at = created_at
+        type_deltas[(stock_code, note_type)] = (count + delta, last_note_at, removed or delta < 0)
+        if ref:
+            stock_ref_deltas[(stock_code, ref)] = stock_ref_deltas.get((stock_code, ref), 0) + delta
+            ref_deltas[ref] = ref_deltas.get(ref, 0) + delta
+
+    # 依主鍵順序更新，同時寫入的交易以相同順序鎖定資料列，避免死結
+    for (stock_code, note_type), (count, last_note_at, removed) in sorted(type_deltas.items()):
+        cursor.execute(_backend.upsert_note_stats_sql, (stock_code, note_type, count, last_note_at))
+        if removed:
+            # 移除的可能是最後一筆：重新取得最後筆記時間（只讀取該股票的筆記），筆數歸零時刪除
+            cursor.execute(
+                "UPDATE stock_note_stats SET last_note_at = "
+                "(SELECT MAX(created_at) FROM notes WHERE stock_code = %s AND note_type = %s) "
+                "WHERE stock_code = %s AND note_type = %s",
+                (stock_code, note_type, stock_code, note_type),
+            )
+            cursor.execute(
+                "DELETE FROM stock_note_stats WHERE stock_code = %s AND note_type = %s AND note_count <= 0",
+                (stock_code, note_type),
+            )
+    for (stock_code, ref), delta in sorted(stock_ref_deltas.items()):
+        if delta:
+            cursor.execute(_backend.upsert_stock_ref_stats_sql, (stock_code, ref, delta))
+        if delta < 0:
+            cursor.execute("DELETE FROM stock_ref_stats WHERE stock_code = %s AND ref = %s AND note_count <= 0",
+                           (stock_code, ref))
+    for ref, delta in sorted(ref_deltas.items()):
+        if delta:
+            cursor.execute(_backend.upsert_ref_stats_sql, (ref, delta))
+        if delta < 0:
+            cursor.execute("DELETE FROM ref_stats WHERE ref = %s AND note_count <= 0", (ref,))
+
+# 由 notes 重新計算統計摘要（與 migrations/005 的回填相同）
+NOTE_STATS_REBUILD_SQL = (
+    "DELETE FROM stock_note_stats",
+    "DELETE FROM stock_ref_stats",
+    "DELETE FROM ref_stats",
+    """
+    INSERT INTO stock_note_stats (stock_code, note_type, note_count, last_note_at)
+    SELECT stock_code, note_type, COUNT(*), MAX(created_at) FROM notes GROUP BY stock_code, note_type
+    """,
+    """
+    INSERT INTO stock_ref_stats (stock_code, ref, note_count)
+    SELECT stock_code, ref, COUNT(*) FROM notes WHERE ref IS NOT NULL AND ref != '' GROUP BY stock_code, ref
+    """,
+    """
+    INSERT INTO ref_stats (ref, note_count)
+    SELECT ref, COUNT(*) FROM notes WHERE ref IS NOT NULL AND ref != '' GROUP BY ref
+    """,
+)
+
+@metrics.timed_db()
+def rebuild_note_stats():
+    """
+    由 notes 重新計算統計摘要（單一交易，需掃描整個 notes 表）
+    修正不經過應用程式的寫入（直接修改 notes 資料表）造成的差異；刪除股票時由觸發程序同步（遷移 006），
+    屬於維護工作，以 scripts/rebuild_note_stats.py 手動執行，不在啟動時執行
+    返回: 布爾值，表示是否成功
+    """
+    connection = get_db_connection()
+    if not connection:
+        return False
+
+    try:
+        cursor = connection.cursor()
+        connection.start_transaction()
+        for statement in NOTE_STATS_REBUILD_SQL:
+            cursor.execute(statement)
+        connection.commit()
+        return True
+    except Error as e:
+        logger.error("重新計算筆記統計時發生錯誤: %s", e)
         if connection.is_connected():
             connection.rollback()
         return False
@@ -450,6 +1142,262 @@ def delete_note(note_id):
             cursor.close()
             connection.close()
 
+STOCK_NOTE_STATS_SQL = """
+    SELECT note_type, note_count, last_note_at FROM stock_note_stats
+    WHERE stock_code = %s AND note_count > 0
+"""
+
+STOCK_TOP_REFS_SQL = """
+    SELECT ref, note_count FROM stock_ref_stats
+    WHERE stock_code = %s AND note_count > 0
+    ORDER BY note_count DESC, ref ASC
+    LIMIT %s
+"""
+
+@metrics.timed_db(rows=lambda summary: 1 if summary else 0)
+def get_stock_summary(stock_code, top_refs=5):
+    """
+    單一股票的筆記統計（只讀取摘要表，不掃描 notes）
+    參數:
+        stock_code: 股票代碼
+        top_refs: 返回的常用來源數量
+    返回: 字典 {stock_code, stock_name, note_count, note_types: {TAG, STORY}, last_note_at, top_refs: [{ref, count}]}，
+          股票不存在或查詢失敗時返回 None
+    """
+    connection = get_db_connection()
+    if not connection:
+        return None
+
+    try:
+        stocks = _fetch_rows(connection, STOCK_BY_CODE_SQL, (stock_code,))
+        if not stocks:
+            return None
+        type_rows = _fetch_rows(connection, STOCK_NOTE_STATS_SQL, (stock_code,), ('last_note_at',))
+        ref_rows = _fetch_rows(connection, STOCK_TOP_REFS_SQL, (stock_code, top_refs))
+
+        note_types = {note_type: 0 for note_type in NOTE_TYPE_ORDER}
+        for row in type_rows:
+            note_types[row['note_type']] = row['note_count']
+        # 格式化後的時間字串可直接比較先後
+        last_times = [row['last_note_at'] for row in type_rows if row['last_note_at']]
+        return {
+            'stock_code': stocks[0]['stock_code'],
+            'stock_name': stocks[0]['stock_name'],
+            'note_count': sum(note_types.values()),
+            'note_types': note_types,
+            'last_note_at': max(last_times) if last_times else None,
+            'top_refs': [{'ref': row['ref'], 'count': row['note_count']} for row in ref_rows],
+        }
+
+    except Error as e:
+        logger.error("獲取股票筆記統計時發生錯誤: %s", e)
+        return None
+    finally:
+        if connection.is_connected():
+            connection.close()
+
+TOP_REFS_SQL = """
+    SELECT ref, note_count FROM ref_stats
+    WHERE note_count > 0
+    ORDER BY note_count DESC, ref ASC
+    LIMIT %s
+"""
+
+@metrics.timed_db()
+def get_ref_stats(limit=10):
+    """
+    獲取最常用的來源及其筆數（讀取 ref_stats 摘要表，不掃描 notes）
+    參數:
+        limit: 返回結果數量限制
+    返回: [{ref, count}, ...]，依筆數由多到少排序
+    """
+    connection = get_db_connection()
+    if not connection:
+        return []
+
+    try:
+        rows = _fetch_rows(connection, TOP_REFS_SQL, (limit,))
+        return [{'ref': row['ref'], 'count': row['note_count']} for row in rows]
+    except Error as e:
+        logger.error("獲取來源統計時發生錯誤: %s", e)
+        return []
+    finally:
+        if connection.is_connected():
+            connection.close()
+
+def _as_datetime(value):
+    # SQLite 的運算式結果沒有宣告型別，返回字串
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+    return value
+
+def parse_changes_cursor(since):
+    """
+    解析變更游標
+    參數:
+        since: 游標字串，格式為 "<updated_at>,<筆記ID>"
+    返回: (datetime, 筆記ID)，游標無效時拋出 ValueError
+    """
+    value, sep, note_id = since.rpartition(',')
+    if not sep:
+        raise ValueError(f"無效的變更游標: {since}")
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S'), int(note_id)
+
+def make_changes_cursor(timestamp, note_id):
+    return f"{timestamp.strftime('%Y-%m-%d %H:%M:%S')},{note_id}"
+
+# 頁面渲染時的同步起點游標（所有請求共用）
+_changes_cursor_cache = TTLCache(maxsize=1, ttl=NOTES_CHANGES_CURSOR_TTL)
+
+def current_changes_cursor():
+    """
+    目前的變更游標，供頁面渲染時作為前端增量同步的起點，行程內快取 NOTES_CHANGES_CURSOR_TTL 秒
+    快取的游標只會比實際時間早：之後的同步會多返回這段時間內的變更（前端重複套用無妨），不會遺漏
+    返回: 游標字串，資料庫無法連線時返回 None
+    """
+    cursor = _changes_cursor_cache.get('cursor')
+    if cursor is MISSING:
+        cursor = get_note_changes()['next_cursor']
+        if cursor is not None:
+            _changes_cursor_cache.set('cursor', cursor)
+    return cursor
+
+@metrics.timed_db(rows=lambda changes: len(changes['notes']) + len(changes['deleted']))
+def get_note_changes(since=None, limit=NOTES_PAGE_MAX_SIZE):
+    """
+    增量同步：返回游標之後新增/修改的筆記與已刪除的筆記ID，依 (updated_at, id) 順序
+    只返回 NOTES_CHANGES_SETTLE_SECONDS 秒以前的變更：時間戳記在語句執行時決定，
+    較晚提交的交易可能帶有較早的時間，留一段緩衝才不會被游標跳過
+    參數:
+        since: 上次返回的 next_cursor；None 時不返回變更，只返回目前的游標
+        limit: 最多返回的變更數（筆記與刪除合計）
+    返回: 字典 {notes, deleted, next_cursor, has_more, reset}
+        reset 為 True 表示游標早於刪除紀錄的保留期限，呼叫端應重新載入完整列表
+        游標格式無效時拋出 ValueError
+    """
+    after = parse_changes_cursor(since) if since else None
+    empty = {'notes': [], 'deleted': [], 'next_cursor': since, 'has_more': False, 'reset': False}
+
+    connection = get_db_connection()
+    if not connection:
+        return empty
+
+    try:
+        cursor = connection.cursor(dictionary=True)
+
+        cursor.execute(
+            f"SELECT {_backend.seconds_ago_sql(NOTES_CHANGES_SETTLE_SECONDS)} AS settled, "
+            f"{_backend.seconds_ago_sql(NOTES_CHANGES_RETENTION_DAYS * 86400)} AS horizon"
+        )
+        bounds = cursor.fetchone()
+        settled = _as_datetime(bounds['settled'])
+        if after is None or after[0] < _as_datetime(bounds['horizon']):
+            return dict(empty, next_cursor=make_changes_cursor(settled, 0), reset=after is not None)
+
+        updated_at, note_id = after
+        cursor.execute(
+            """
+            SELECT n.id, n.stock_code, s.stock_name, n.note_type, n.content, n.ref, n.ref_time,
+                   n.created_at, n.updated_at
+            FROM notes n
+            JOIN stocks s ON n.stock_code = s.stock_code
+            WHERE (n.updated_at > %s OR (n.updated_at = %s AND n.id > %s)) AND n.updated_at <= %s
+            ORDER BY n.updated_at, n.id
+            LIMIT %s
+            """,
+            (updated_at, updated_at, note_id, settled, limit + 1),
+        )
+        changes = [(note['updated_at'], note['id'], note) for note in cursor.fetchall()]
+
+        cursor.execute(
+            """
+            SELECT note_id, deleted_at FROM note_deletions
+            WHERE (deleted_at > %s OR (deleted_at = %s AND note_id > %s)) AND deleted_at <= %s
+            ORDER BY deleted_at, note_id
+            LIMIT %s
+            """,
+            (updated_at, updated_at, note_id, settled, limit + 1),
+        )
+        changes.extend((row['deleted_at'], row['note_id'], None) for row in cursor.fetchall())
+
+        # 合併兩種變更，依 (時間, id) 排序後截取
+        changes.sort(key=lambda change: (change[0], change[1]))
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        notes = []
+        deleted = []
+        for _, change_id, note in changes:
+            if note is None:
+                deleted.append(change_id)
+                continue
+            notes.append(format_note_times(note, ('created_at', 'updated_at', 'ref_time')))
+
+        if changes:
+            next_cursor = make_changes_cursor(changes[-1][0], changes[-1][1])
+        else:
+            # 沒有變更時推進到緩衝時間點，之後的變更 id 必定大於 0
+            next_cursor = make_changes_cursor(max(settled, updated_at), 0 if settled > updated_at else note_id)
+        return {'notes': notes, 'deleted': deleted, 'next_cursor': next_cursor, 'has_more': has_more, 'reset': False}
+
+    except Error as e:
+        logger.error("獲取筆記變更時發生錯誤: %s", e)
+        return empty
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def purge_note_deletions():
+    """
+    清除超過 NOTES_CHANGES_RETENTION_DAYS 天的刪除紀錄
+    返回: 清除的筆數，失敗時返回 None
+    """
+    connection = get_db_connection()
+    if not connection:
+        return None
+
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            f"DELETE FROM note_deletions WHERE deleted_at < {_backend.seconds_ago_sql(NOTES_CHANGES_RETENTION_DAYS * 86400)}"
+        )
+        connection.commit()
+        return cursor.rowcount
+    except Error as e:
+        logger.error("清除刪除紀錄時發生錯誤: %s", e)
+        return None
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def update_statistics():
+    """
+    更新查詢最佳化器的統計資料（後端的 analyze_sql；MySQL/InnoDB 會自動更新，不需執行）
+    SQLite 沒有統計資料時，依股票名稱排序可能不會使用 idx_stocks_stock_name
+    返回: 布爾值，表示是否已更新
+    """
+    if not _backend.analyze_sql:
+        return False
+
+    connection = get_db_connection()
+    if not connection:
+        return False
+
+    try:
+        cursor = connection.cursor()
+        cursor.execute(_backend.analyze_sql)
+        connection.commit()
+        return True
+    except Error as e:
+        logger.error("更新統計資料時發生錯誤: %s", e)
+        return False
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
 def test_connection():
     """
     測試數據庫連接
@@ -477,7 +1425,7 @@ def init_common_stocks():
         count = cursor.fetchone()[0]
         
         if count > 0:
-            print(f"資料表已有 {count} 筆股票資料，跳過初始化")
+            logger.info("資料表已有 %d 筆股票資料，跳過初始化", count)
             return True
         
         # 常用台股資料（只保留一筆避免資料庫空白）
@@ -494,11 +1442,14 @@ def init_common_stocks():
             cursor.execute(insert_query, stock)
         
         connection.commit()
-        print(f"已初始化 {len(common_stocks)} 筆常用台股資料")
+        notes_cache.invalidate()
+        for stock in common_stocks:
+            stock_directory.upsert(*stock)
+        logger.info("已初始化 %d 筆常用台股資料", len(common_stocks))
         return True
         
     except Error as e:
-        print(f"初始化股票資料時發生錯誤: {e}")
+        logger.error("初始化股票資料時發生錯誤: %s", e)
         if connection.is_connected():
             connection.rollback()
         return False
@@ -507,76 +1458,236 @@ def init_common_stocks():
             cursor.close()
             connection.close()
 
-def import_stocks_from_iterable(rows: Iterable[Dict[str, str]]) -> Tuple[int, int, int]:
+class StockImportResult(tuple):
+    """
+    股票匯入統計
+    與舊版回傳值相同，解包時為 (inserted, updated, skipped) 三個值；未變更的筆數另以 unchanged 屬性提供
+    """
+
+    def __new__(cls, inserted=0, updated=0, unchanged=0, skipped=0):
+        result = super().__new__(cls, (inserted, updated, skipped))
+        result.unchanged = unchanged
+        return result
+
+    inserted = property(operator.itemgetter(0))
+    updated = property(operator.itemgetter(1))
+    skipped = property(operator.itemgetter(2))
+
+    def __eq__(self, other):
+        if isinstance(other, StockImportResult):
+            return tuple(self) == tuple(other) and self.unchanged == other.unchanged
+        return tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = tuple.__hash__
+
+    def __repr__(self):
+        return (f"StockImportResult(inserted={self.inserted}, updated={self.updated}, "
+                f"unchanged={self.unchanged}, skipped={self.skipped})")
+
+
+def _normalize_stock_row(row):
+    code = (row.get('stock_code') or row.get('code') or '').strip()
+    name = (row.get('stock_name') or row.get('name') or '').strip()
+    industry = (row.get('industry') or '').strip() or None
+    return code, name, industry
+
+
+def _fetch_existing_stocks(cursor, codes, batch_size=500):
+    """查詢已存在的股票（IN 子句分批，避免超過 SQLite 參數上限）"""
+    existing = {}
+    for i in range(0, len(codes), batch_size):
+        batch = codes[i:i + batch_size]
+        placeholders = ', '.join(['%s'] * len(batch))
+        cursor.execute(
+            f"SELECT stock_code, stock_name, industry FROM stocks WHERE stock_code IN ({placeholders})",
+            batch,
+        )
+        for code, name, industry in cursor.fetchall():
+            existing[code] = (name, industry)
+    return existing
+
+
+def _touch_stock_notes(cursor, codes, batch_size=500):
     """
-    由可迭代資料批次匯入/更新股票至 stocks 表。
-    rows: 可迭代，元素包含 keys: stock_code, stock_name, industry(可選)
-    回傳: (inserted, updated, skipped)
+    更新股票名稱後，把這些股票的筆記 updated_at 設為目前時間（不提交）
+    筆記列表的股票名稱來自 stocks 表，更新時間才能讓增量同步與 ETag 反映名稱變更
     """
+    codes = list(codes)
+    for i in range(0, len(codes), batch_size):
+        batch = codes[i:i + batch_size]
+        placeholders = ', '.join(['%s'] * len(batch))
+        cursor.execute(
+            f"UPDATE notes SET updated_at = {_backend.now_sql} WHERE stock_code IN ({placeholders})",
+            batch,
+        )
+
+
+def _import_stock_chunk(cursor, chunk):
+    """
+    匯入一個區塊的股票（不提交）
+    先查出區塊內已存在的股票，逐筆分類為新增/更新/未變更，未變更的不寫入
+    參數:
+        chunk: {stock_code: (stock_name, industry)}
+    返回: (inserted, updated, unchanged, 實際寫入的資料列)
+    """
+    existing = _fetch_existing_stocks(cursor, list(chunk))
+    inserted = updated = unchanged = 0
+    writes = []
+    for code, (name, industry) in chunk.items():
+        current = existing.get(code)
+        if current is None:
+            inserted += 1
+        elif current[0] == name and (industry is None or current[1] == industry):
+            # industry 為空時保留原值（與 upsert 的 COALESCE 一致）
+            unchanged += 1
+            continue
+        else:
+            updated += 1
+        writes.append((code, name, industry))
+    if writes:
+        cursor.executemany(_backend.upsert_stock_sql, writes)
+        renamed = [code for code, name, _ in writes if code in existing and existing[code][0] != name]
+        if renamed:
+            _touch_stock_notes(cursor, renamed)
+    return inserted, updated, unchanged, writes
+
+
+@metrics.timed_db(rows=lambda result: result.inserted + result.updated)
+def import_stocks_from_iterable(rows: Iterable[Dict[str, str]], chunk_size: Optional[int] = None,
+                                progress: Optional[Callable[[int, StockImportResult], None]] = None) -> StockImportResult:
+    """
+    由可迭代資料串流匯入/更新股票至 stocks 表，每 chunk_size 筆提交一次，記憶體用量與資料量無關
+    同一區塊內重複的股票代碼以最後一筆為準
+    參數:
+        rows: 可迭代（可為產生器），元素包含 keys: stock_code, stock_name, industry(可選)
+        chunk_size: 每次提交的筆數（預設 STOCK_IMPORT_CHUNK_SIZE）
+        progress: 每提交一個區塊後呼叫 progress(已讀取筆數, 累計統計)
+    返回: StockImportResult(inserted, updated, unchanged, skipped)
+        發生錯誤時停止匯入，返回已提交區塊的統計
+    """
+    chunk_size = max(1, chunk_size or STOCK_IMPORT_CHUNK_SIZE)
+    inserted = updated = unchanged = skipped = 0
+    processed = 0
+
     connection = get_db_connection()
     if not connection:
-        return (0, 0, 0)
+        return StockImportResult(0, 0, 0, 0)
 
-    inserted = 0
-    updated = 0
-    skipped = 0
+    def flush(chunk):
+        nonlocal inserted, updated, unchanged
+        connection.start_transaction()
+        chunk_inserted, chunk_updated, chunk_unchanged, writes = _import_stock_chunk(cursor, chunk)
+        connection.commit()
+        if writes:
+            # 筆記列表含股票名稱，名稱變更後需重新查詢
+            notes_cache.invalidate()
+        # 目錄尚未載入時（例如命令列匯入）不逐筆累積，下次載入會從資料庫重建
+        if stock_directory.loaded:
+            for code, name, industry in writes:
+                stock_directory.upsert(code, name, industry)
+        inserted += chunk_inserted
+        updated += chunk_updated
+        unchanged += chunk_unchanged
+        if progress:
+            progress(processed, StockImportResult(inserted, updated, unchanged, skipped))
 
     try:
         cursor = connection.cursor()
-        upsert_sql = (
-            "INSERT INTO stocks (stock_code, stock_name, industry) "
-            "VALUES (%s, %s, %s) "
-            "ON DUPLICATE KEY UPDATE "
-            "stock_name = VALUES(stock_name), "
-            "industry = COALESCE(VALUES(industry), industry), "
-            "last_updated = CURRENT_TIMESTAMP"
-        )
-        batch_params = []
+        chunk = {}
         for row in rows:
-            code = (row.get('stock_code') or row.get('code') or '').strip()
-            name = (row.get('stock_name') or row.get('name') or '').strip()
-            industry = (row.get('industry') or None)
+            processed += 1
+            code, name, industry = _normalize_stock_row(row)
             if not code or not name:
                 skipped += 1
                 continue
-            batch_params.append((code, name, industry))
-        if not batch_params:
-            return (0, 0, skipped)
-        cursor.executemany(upsert_sql, batch_params)
-        affected = cursor.rowcount or 0
-        # 在 MySQL 的 ON DUPLICATE KEY UPDATE 情境，rowcount 對 updated 行會回傳 2
-        # 粗略估算 inserted/updated（非精確但足夠統計）
-        # 假設 updated 以 2 計數，插入以 1 計數
-        # 我們無法逐筆得知，這裡以總筆數估算：
+            chunk[code] = (name, industry)
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = {}
+        if chunk:
+            flush(chunk)
+    except (Error, csv.Error, ValueError) as e:
+        # 資料庫錯誤或來源資料無法解析（例如 CSV 編碼錯誤）
+        logger.error("批次匯入股票時發生錯誤（已提交 %d 筆新增、%d 筆更新）: %s", inserted, updated, e)
+        if connection.is_connected():
+            connection.rollback()
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+    return StockImportResult(inserted, updated, unchanged, skipped)
+
+
+@metrics.timed_db(rows=lambda result: result.inserted)
+def insert_missing_stocks(rows: Iterable[Dict[str, str]]) -> StockImportResult:
+    """
+    只新增 stocks 表中不存在的股票（Yahoo 搜尋結果寫回使用）
+    已存在的股票不會被覆寫：名稱與產業別可能是使用者輸入或 CSV 匯入整理過的；需要更新既有股票時請用 import_stocks_from_iterable
+    參數:
+        rows: 可迭代，元素包含 keys: stock_code, stock_name
+    返回: StockImportResult(inserted, 0, 已存在的筆數, skipped)，發生錯誤時 inserted 為 0
+    """
+    chunk = {}
+    skipped = 0
+    for row in rows:
+        code, name, _ = _normalize_stock_row(row)
+        if not code or not name:
+            skipped += 1
+            continue
+        chunk.setdefault(code, name)
+    if not chunk:
+        return StockImportResult(0, 0, 0, skipped)
+
+    connection = get_db_connection()
+    if not connection:
+        return StockImportResult(0, 0, 0, skipped)
+
+    try:
+        cursor = connection.cursor()
+        connection.start_transaction()
+        existing = _fetch_existing_stocks(cursor, list(chunk))
+        missing = [(code, name) for code, name in chunk.items() if code not in existing]
+        if missing:
+            # 查詢後才由其他行程新增的股票同樣不覆寫
+            cursor.executemany(_backend.insert_stock_if_missing_sql, missing)
         connection.commit()
-        # 保守做法：全部視作成功，回傳 inserted+updated = 輸入批次數量
-        # 若要精確，需逐筆查詢是否存在，成本較高
-        total = len(batch_params)
-        return (total, 0, skipped)
     except Error as e:
-        print(f"批次匯入股票時發生錯誤: {e}")
+        logger.error("新增股票時發生錯誤: %s", e)
         if connection.is_connected():
             connection.rollback()
-        return (0, 0, skipped)
+        return StockImportResult(0, 0, 0, skipped)
     finally:
         if connection.is_connected():
             cursor.close()
             connection.close()
 
+    if stock_directory.loaded:
+        # 已存在的股票以資料庫中的值更新目錄（目錄可能是其他行程寫入前載入的）
+        for code, (name, industry) in existing.items():
+            stock_directory.upsert(code, name, industry)
+        for code, name in missing:
+            stock_directory.upsert(code, name)
+    return StockImportResult(len(missing), 0, len(existing), skipped)
+
 
-def import_stocks_from_csv(csv_path: str) -> Tuple[int, int, int]:
+def import_stocks_from_csv(csv_path: str, chunk_size: Optional[int] = None,
+                           progress: Optional[Callable[[int, StockImportResult], None]] = None) -> StockImportResult:
     """
-    從 CSV 匯入/更新股票。CSV 需含標頭: stock_code,stock_name[,industry]
-    回傳: (inserted, updated, skipped)
+    從 CSV 串流匯入/更新股票（逐列讀取，不會一次載入整個檔案）
+    CSV 需含標頭: stock_code,stock_name[,industry]
+    參數:
+        chunk_size, progress: 同 import_stocks_from_iterable
+    返回: StockImportResult(inserted, updated, unchanged, skipped)
     """
     try:
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            rows = [row for row in reader]
-        return import_stocks_from_iterable(rows)
+        # utf-8-sig：交易所下載的 CSV 常帶有 BOM
+        with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+            return import_stocks_from_iterable(csv.DictReader(f), chunk_size, progress)
     except FileNotFoundError:
-        print(f"找不到CSV檔案: {csv_path}")
-        return (0, 0, 0)
+        logger.error("找不到CSV檔案: %s", csv_path)
     except Exception as e:
-        print(f"讀取CSV時發生錯誤: {e}")
-        return (0, 0, 0)
+        logger.error("讀取CSV時發生錯誤: %s", e)
+    return StockImportResult(0, 0, 0, 0)
@@ -0,0 +1,281 @@
+"""
+行程內資料庫連線池
+- 以固定上限管理實體連線，借用時優先重用最近歸還的連線
+- 閒置超過 max_idle 秒的連線會被回收，建立超過 max_lifetime 秒的連線在借出或歸還時關閉（避免被伺服器的 wait_timeout 切斷）
+- 閒置超過 health_check_interval 秒的連線在借出前會先做健康檢查
+- 連線用盡時最多等待 checkout_timeout 秒，逾時拋出 PoolTimeoutError
+- 借出的連線未歸還就被回收（例如呼叫端在例外路徑中遺漏 close()）時，下次借用會關閉該實體連線並釋放名額
+"""
+
+import os
+import threading
+import time
+import weakref
+from collections import deque
+
+
+class PoolTimeoutError(Exception):
+    """借用連線逾時"""
+
+
+class PooledConnection:
+    """
+    借出的連線代理物件
+    行為與原始連線相同，但 close() 會把連線歸還連線池而不是真正關閉；可用於 with 陳述式，離開時歸還
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        # 代理物件未歸還就被回收時，把實體連線交給連線池作廢（不能放回閒置連線：可能仍在交易中或有未讀取的結果）
+        self._finalizer = weakref.finalize(self, pool._leaked.append, raw)
+        self._finalizer.atexit = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise AttributeError(f"連線已歸還連線池，無法存取屬性: {name}")
+        return getattr(self._raw, name)
+
+    def is_connected(self):
+        # 借出前已做過健康檢查，這裡不再對伺服器發送 ping，避免每次呼叫多一次往返
+        return self._raw is not None
+
+    def rollback(self):
+        try:
+            self._raw.rollback()
+        except Exception:
+            # 連線已損壞：直接作廢，避免把壞連線放回連線池
+            self.invalidate()
+
+    def close(self):
+        """歸還連線"""
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._finalizer.detach()
+            self._pool._release(raw)
+
+    def invalidate(self):
+        """作廢連線（例如仍有未讀取的結果集），不放回連線池"""
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._finalizer.detach()
+            self._pool._discard(raw)
+
+
+class ConnectionPool:
+    """
+    通用連線池
+    參數:
+        connect: 建立實體連線的函式
+        size: 連線數上限
+        max_idle: 閒置連線最長保留秒數
+        max_lifetime: 實體連線最長使用秒數（None 表示不限）
+        checkout_timeout: 借用連線最長等待秒數
+        health_check_interval: 閒置超過此秒數的連線借出前需做健康檢查
+    """
+
+    def __init__(self, connect, size=10, max_idle=300, checkout_timeout=5.0, health_check_interval=30,
+                 max_lifetime=None):
+        self._connect = connect
+        self.size = max(1, int(size))
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self.pid = os.getpid()
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (連線, 最後使用時間)，右端為最近歸還
+        self._total = 0       # 已建立（含借出中與建立中）的實體連線數
+        self._in_use = 0
+        self._leaked = deque()  # 未歸還就被回收的代理物件所借用的實體連線（由 finalizer 加入，不需持有鎖）
+        self._created_at = {}  # id(實體連線) -> 建立時間
+
+        self._stats = {
+            'checkouts': 0,
+            'created': 0,
+            'closed': 0,
+            'evicted_idle': 0,
+            'evicted_lifetime': 0,
+            'failed_health_checks': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'leaked': 0,
+        }
+
+    def acquire(self, timeout=None):
+        """
+        借用一條連線
+        返回: PooledConnection
+        """
+        if timeout is None:
+            timeout = self.checkout_timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            raw, last_used, create = self._reserve(deadline)
+
+            if create:
+                try:
+                    raw = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._in_use -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats['created'] += 1
+                    self._created_at[id(raw)] = time.monotonic()
+                return PooledConnection(self, raw)
+
+            if time.monotonic() - last_used > self.health_check_interval and not self._is_healthy(raw):
+                with self._cond:
+                    self._stats['failed_health_checks'] += 1
+                self._discard(raw)
+                continue
+
+            return PooledConnection(self, raw)
+
+    def _reserve(self, deadline):
+        """
+        在鎖內取得一條閒置連線或一個建立新連線的名額
+        返回: (連線或None, 最後使用時間, 是否需要建立新連線)
+        """
+        expired = []
+        try:
+            with self._cond:
+                waited = False
+                while True:
+                    expired.extend(self._pop_leaked())
+                    expired.extend(self._pop_expired())
+                    if self._idle:
+                        raw, last_used = self._idle.pop()
+                        if self._too_old(raw):
+                            self._total -= 1
+                            self._stats['evicted_lifetime'] += 1
+                            expired.append(raw)
+                            continue
+                        self._in_use += 1
+                        self._stats['checkouts'] += 1
+                        return raw, last_used, False
+                    if self._total < self.size:
+                        self._total += 1
+                        self._in_use += 1
+                        self._stats['checkouts'] += 1
+                        return None, 0.0, True
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeoutError(
+                            f"等待資料庫連線逾時（上限 {self.size} 條連線皆在使用中）"
+                        )
+                    if not waited:
+                        self._stats['waits'] += 1
+                        waited = True
+                    self._cond.wait(remaining)
+        finally:
+            # 實際關閉連線放在鎖外，避免網路 I/O 阻塞其他執行緒
+            for raw in expired:
+                self._close_quietly(raw)
+
+    def _pop_leaked(self):
+        """取回未歸還就被回收的連線並釋放名額（需在鎖內呼叫）"""
+        leaked = []
+        while self._leaked:
+            leaked.append(self._leaked.popleft())
+            self._in_use -= 1
+            self._total -= 1
+            self._stats['leaked'] += 1
+        return leaked
+
+    def _pop_expired(self):
+        """移除閒置過久的連線（需在鎖內呼叫）"""
+        expired = []
+        if self.max_idle is None:
+            return expired
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] > self.max_idle:
+            raw, _ = self._idle.popleft()
+            self._total -= 1
+            self._stats['evicted_idle'] += 1
+            expired.append(raw)
+        return expired
+
+    def _too_old(self, raw):
+        """連線是否已超過 max_lifetime（需在鎖內呼叫）"""
+        if self.max_lifetime is None:
+            return False
+        created_at = self._created_at.get(id(raw))
+        return created_at is not None and time.monotonic() - created_at > self.max_lifetime
+
+    def _is_healthy(self, raw):
+        try:
+            return raw.is_connected()
+        except Exception:
+            return False
+
+    def _release(self, raw):
+        try:
+            if getattr(raw, 'in_transaction', False):
+                raw.rollback()
+        except Exception:
+            self._discard(raw)
+            return
+
+        with self._cond:
+            if self._too_old(raw):
+                self._stats['evicted_lifetime'] += 1
+                old = True
+            else:
+                old = False
+                self._in_use -= 1
+                self._idle.append((raw, time.monotonic()))
+                self._cond.notify()
+        if old:
+            self._discard(raw)
+
+    def _discard(self, raw):
+        with self._cond:
+            self._in_use -= 1
+            self._total -= 1
+            self._cond.notify()
+        self._close_quietly(raw)
+
+    def _close_quietly(self, raw):
+        with self._cond:
+            self._created_at.pop(id(raw), None)
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._stats['closed'] += 1
+
+    def close_all(self):
+        """關閉所有閒置連線（借出中的連線歸還時仍會回到連線池）"""
+        with self._cond:
+            idle = [raw for raw, _ in self._idle]
+            self._idle.clear()
+            self._total -= len(idle)
+        for raw in idle:
+            self._close_quietly(raw)
+
+    def stats(self):
+        """返回連線池統計資料"""
+        with self._cond:
+            data = dict(self._stats)
+            data.update({
+                'size': self.size,
+                'open': self._total,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+            })
+        return data
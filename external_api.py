@@ -1,6 +1,21 @@
+import asyncio
+import logging
+import os
+import random
 import requests
 import re # 匯入正規表示式模組
-from typing import List, Dict
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from typing import List, Dict, Tuple, Optional
+from requests.adapters import HTTPAdapter
+from config import (YAHOO_CACHE_SIZE, YAHOO_CACHE_TTL, YAHOO_NEGATIVE_CACHE_TTL,
+                    YAHOO_SEARCH_DEADLINE, YAHOO_MAX_WORKERS, YAHOO_CLIENT_CONFIG)
+from ttl_cache import TTLCache, MISSING
+import metrics
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
 
 YAHOO_SEARCH_URLS = [
 	"https://query2.finance.yahoo.com/v1/finance/search",
@@ -21,71 +36,539 @@ DEFAULT_HEADERS = {
 }
 
 
+class CircuitOpenError(requests.exceptions.RequestException):
+	"""斷路器開啟中，暫停對 Yahoo 發送請求"""
+
+
+class CircuitBreaker:
+	"""
+	斷路器
+	- closed: 正常放行；連續失敗達 failure_threshold 次後轉為 open
+	- open: 拒絕所有請求；經過 reset_timeout 秒後轉為 half_open
+	- half_open: 只放行一個試探請求，成功則回到 closed，失敗則重新 open
+	"""
+
+	def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+		self.failure_threshold = failure_threshold
+		self.reset_timeout = reset_timeout
+		self._lock = threading.Lock()
+		self._state = "closed"
+		self._failures = 0
+		self._opened_at = 0.0
+		self._probe_in_flight = False
+		self._stats = {"opened": 0, "rejected": 0}
+
+	@property
+	def state(self) -> str:
+		return self._state
+
+	def is_open(self) -> bool:
+		"""斷路器是否正在拒絕請求（不佔用 half_open 的試探名額）"""
+		with self._lock:
+			if self._state == "open":
+				return time.monotonic() - self._opened_at < self.reset_timeout
+			return self._state == "half_open" and self._probe_in_flight
+
+	def allow_request(self) -> bool:
+		with self._lock:
+			if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+				self._state = "half_open"
+				self._probe_in_flight = False
+			if self._state == "closed":
+				return True
+			if self._state == "half_open" and not self._probe_in_flight:
+				self._probe_in_flight = True
+				return True
+			self._stats["rejected"] += 1
+			return False
+
+	def record_success(self) -> None:
+		with self._lock:
+			self._state = "closed"
+			self._failures = 0
+			self._probe_in_flight = False
+
+	def record_failure(self) -> None:
+		with self._lock:
+			self._failures += 1
+			if self._state == "half_open" or self._failures >= self.failure_threshold:
+				if self._state != "open":
+					self._stats["opened"] += 1
+					logger.warning("Yahoo 連續失敗 %d 次，斷路器開啟 %s 秒", self._failures, self.reset_timeout)
+				self._state = "open"
+				self._opened_at = time.monotonic()
+				self._probe_in_flight = False
+
+	def stats(self) -> Dict:
+		with self._lock:
+			data = dict(self._stats)
+			data.update({"state": self._state, "consecutive_failures": self._failures})
+		return data
+
+
+class YahooClient:
+	"""
+	Yahoo HTTP 用戶端
+	- 共用 requests.Session，連線保持 keep-alive 並重用
+	- 每個主機最多 pool_maxsize 條連線，超過時等待
+	- 429/5xx 與連線錯誤以隨機抖動的指數退避重試，最多 max_retries 次
+	- 失敗（重試用盡）計入斷路器
+	- aget() 為 ASGI 模式使用的非同步版本（httpx.AsyncClient），與 get() 共用斷路器、統計與退避設定
+	"""
+
+	RETRY_STATUS = {429, 500, 502, 503, 504}
+
+	def __init__(self, timeout: float = 8, pool_maxsize: int = 6, max_retries: int = 1,
+	             backoff_base: float = 0.2, backoff_max: float = 2.0,
+	             breaker_threshold: int = 5, breaker_reset: float = 30):
+		self.timeout = timeout
+		self.pool_maxsize = pool_maxsize
+		self.max_retries = max_retries
+		self.backoff_base = backoff_base
+		self.backoff_max = backoff_max
+		self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+		self._session: Optional[requests.Session] = None
+		self._session_pid: Optional[int] = None
+		self._lock = threading.Lock()
+		self._stats = {"requests": 0, "retries": 0, "failures": 0}
+		self._async_client = None
+		self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+	def _get_session(self) -> requests.Session:
+		"""取得共用的 Session（fork 後的子行程會建立自己的 Session）"""
+		if self._session is None or self._session_pid != os.getpid():
+			with self._lock:
+				if self._session is None or self._session_pid != os.getpid():
+					session = requests.Session()
+					session.headers.update(DEFAULT_HEADERS)
+					adapter = HTTPAdapter(
+						pool_connections=len(YAHOO_SEARCH_URLS),
+						pool_maxsize=self.pool_maxsize,
+						pool_block=True,
+						max_retries=0,
+					)
+					session.mount("https://", adapter)
+					session.mount("http://", adapter)
+					self._session = session
+					self._session_pid = os.getpid()
+		return self._session
+
+	def _get_async_client(self):
+		"""取得目前事件迴圈共用的 httpx.AsyncClient（連線只能在建立它的事件迴圈中使用）"""
+		loop = asyncio.get_running_loop()
+		if self._async_client is None or self._async_loop is not loop:
+			import httpx
+			self._async_client = httpx.AsyncClient(
+				headers=DEFAULT_HEADERS,
+				# 連線已滿時等待可用連線（pool=None），與同步版的 pool_block 相同
+				timeout=httpx.Timeout(self.timeout, pool=None),
+				limits=httpx.Limits(max_connections=self.pool_maxsize * len(YAHOO_SEARCH_URLS),
+				                    max_keepalive_connections=self.pool_maxsize * len(YAHOO_SEARCH_URLS)),
+			)
+			self._async_loop = loop
+		return self._async_client
+
+	async def aclose(self) -> None:
+		"""關閉目前事件迴圈的 httpx.AsyncClient（ASGI lifespan 結束時呼叫）"""
+		client, self._async_client, self._async_loop = self._async_client, None, None
+		if client is not None:
+			await client.aclose()
+
+	def _backoff(self, attempt: int) -> float:
+		"""全抖動（full jitter）指數退避秒數"""
+		return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+	def get(self, url: str, params: Dict) -> requests.Response:
+		"""
+		送出 GET 請求
+		返回: requests.Response（重試用盡時返回最後一次的 429/5xx 回應）
+		斷路器開啟時拋出 CircuitOpenError，連線錯誤重試用盡時拋出原本的例外
+		"""
+		if not self.breaker.allow_request():
+			raise CircuitOpenError("Yahoo 斷路器開啟中，暫停外部查詢")
+
+		session = self._get_session()
+		last_error: Optional[Exception] = None
+		resp: Optional[requests.Response] = None
+
+		for attempt in range(self.max_retries + 1):
+			if attempt:
+				self._count("retries")
+				time.sleep(self._backoff(attempt - 1))
+			self._count("requests")
+			start = time.perf_counter()
+			try:
+				resp = session.get(url, params=params, timeout=self.timeout)
+			except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+				metrics.YAHOO_REQUEST_DURATION.observe(time.perf_counter() - start, outcome="connection_error")
+				last_error = e
+				resp = None
+				continue
+			metrics.YAHOO_REQUEST_DURATION.observe(time.perf_counter() - start, outcome=self._outcome(resp.status_code))
+			if resp.status_code not in self.RETRY_STATUS:
+				self.breaker.record_success()
+				return resp
+
+		self._count("failures")
+		self.breaker.record_failure()
+		if resp is not None:
+			return resp
+		raise last_error
+
+	async def aget(self, url: str, params: Dict):
+		"""
+		get() 的非同步版本，返回 httpx.Response（status_code / json() 與 requests.Response 相同）
+		連線錯誤與逾時轉為 requests.exceptions.ConnectionError，呼叫端可沿用同步版的例外處理
+		"""
+		if not self.breaker.allow_request():
+			raise CircuitOpenError("Yahoo 斷路器開啟中，暫停外部查詢")
+
+		import httpx
+		client = self._get_async_client()
+		last_error: Optional[Exception] = None
+		resp = None
+
+		for attempt in range(self.max_retries + 1):
+			if attempt:
+				self._count("retries")
+				await asyncio.sleep(self._backoff(attempt - 1))
+			self._count("requests")
+			start = time.perf_counter()
+			try:
+				resp = await client.get(url, params=params)
+			except httpx.TransportError as e:
+				metrics.YAHOO_REQUEST_DURATION.observe(time.perf_counter() - start, outcome="connection_error")
+				last_error = e
+				resp = None
+				continue
+			metrics.YAHOO_REQUEST_DURATION.observe(time.perf_counter() - start, outcome=self._outcome(resp.status_code))
+			if resp.status_code not in self.RETRY_STATUS:
+				self.breaker.record_success()
+				return resp
+
+		self._count("failures")
+		self.breaker.record_failure()
+		if resp is not None:
+			return resp
+		raise requests.exceptions.ConnectionError(str(last_error) or type(last_error).__name__) from last_error
+
+	def _outcome(self, status: int) -> str:
+		"""指標用的回應分類"""
+		if status in self.RETRY_STATUS:
+			return "retryable_status"
+		if status >= 400:
+			return "http_error"
+		return "ok"
+
+	def _count(self, name: str) -> None:
+		with self._lock:
+			self._stats[name] += 1
+
+	def stats(self) -> Dict:
+		with self._lock:
+			data = dict(self._stats)
+		data["breaker"] = self.breaker.stats()
+		return data
+
+
+# 行程內共用的 Yahoo 用戶端
+yahoo_client = YahooClient(**YAHOO_CLIENT_CONFIG)
+
+# Yahoo 搜尋結果快取（以正規化後的關鍵字為鍵，空結果使用較短的負快取時間）
+_search_cache = TTLCache(maxsize=YAHOO_CACHE_SIZE, ttl=YAHOO_CACHE_TTL)
+
+# 同時進行的相同搜尋只送出一次 Yahoo 查詢（多人同時輸入相同的關鍵字）
+_yahoo_searches = SingleFlight('yahoo_search')
+
+# 並行搜尋用的執行緒池（延遲建立）
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+
+# 尚未完成的請求
+_PENDING = object()
+
+
+def _http_get(url: str, params: Dict) -> requests.Response:
+	"""送出 Yahoo 搜尋 HTTP 請求（測試時可替換此函式）"""
+	return yahoo_client.get(url, params)
+
+
+async def _http_get_async(url: str, params: Dict):
+	"""送出 Yahoo 搜尋 HTTP 請求的非同步版本（測試時可替換此函式）"""
+	return await yahoo_client.aget(url, params)
+
+
+def _normalize_query(query: str) -> str:
+	"""正規化搜尋關鍵字：去除多餘空白並轉小寫（Yahoo 搜尋不分大小寫）"""
+	return " ".join(query.split()).lower()
+
+
+def get_cache_stats() -> Dict[str, int]:
+	"""返回 Yahoo 搜尋快取的命中/未命中/淘汰統計"""
+	return _search_cache.stats()
+
+
+def get_client_stats() -> Dict:
+	"""返回 Yahoo 用戶端的請求/重試/斷路器統計"""
+	return yahoo_client.stats()
+
+
+def clear_cache() -> None:
+	"""清空 Yahoo 搜尋快取"""
+	_search_cache.clear()
+
+
 def search_yahoo_stocks(query: str, limit: int = 10) -> List[Dict[str, str]]:
 	"""
 	呼叫 Yahoo Finance 搜尋API 取得台股股票建議清單。
-	- 使用 query2 為主、query1 為備援
+	- 使用 query2 為主、query1 為備援，所有請求並行送出
 	- 送出常見 Header 以避免被擋
 	- 多策略查詢並過濾為台股
+	- 結果（含空結果）會快取，重複查詢直接返回
 	"""
 	if not query:
 		return []
 
-	search_queries = [query, f"{query} TW", f"{query} 台股"]
+	cache_key = (_normalize_query(query), limit)
+	cached = _lookup_search(cache_key)
+	if cached is not MISSING:
+		return cached
+	# 同時進行的相同查詢共用一次 Yahoo 查詢（結果共用，返回副本）
+	return list(_yahoo_searches.do(cache_key, lambda: _store_search(cache_key, *_search_yahoo_uncached(query, limit))))
+
+
+async def search_yahoo_stocks_async(query: str, limit: int = 10) -> List[Dict[str, str]]:
+	"""
+	search_yahoo_stocks 的非同步版本（ASGI 模式使用）
+	以事件迴圈並行送出請求，等待 Yahoo 時不佔用執行緒；與同步版共用快取、斷路器與結果合併規則
+	"""
+	if not query:
+		return []
+
+	cache_key = (_normalize_query(query), limit)
+	cached = _lookup_search(cache_key)
+	if cached is not MISSING:
+		return cached
+
+	async def search():
+		return _store_search(cache_key, *await _search_yahoo_uncached_async(query, limit))
+
+	return list(await _yahoo_searches.ado(cache_key, search))
+
+
+def _lookup_search(cache_key: Tuple[str, int]):
+	"""返回快取的搜尋結果（斷路器開啟時返回空列表）；需要實際查詢時返回 MISSING"""
+	cached = _search_cache.get(cache_key)
+	if cached is not MISSING:
+		metrics.YAHOO_SEARCHES.inc(outcome="cache_hit")
+		return list(cached)
+
+	if yahoo_client.breaker.is_open():
+		# Yahoo 持續失敗中：直接返回，不佔用請求執行緒，也不寫入快取
+		metrics.YAHOO_SEARCHES.inc(outcome="breaker_open")
+		return []
+	return MISSING
+
+
+def _store_search(cache_key: Tuple[str, int], results: List[Dict[str, str]], had_response: bool) -> List[Dict[str, str]]:
+	"""依查詢結果寫入快取並記錄指標，返回結果的副本"""
+	if results:
+		metrics.YAHOO_SEARCHES.inc(outcome="found")
+		_search_cache.set(cache_key, results)
+	elif had_response:
+		# Yahoo 有正常回應但沒有台股結果：負快取，避免相同查詢反覆打外部 API
+		metrics.YAHOO_SEARCHES.inc(outcome="empty")
+		_search_cache.set(cache_key, results, ttl=YAHOO_NEGATIVE_CACHE_TTL)
+	else:
+		# 全部請求都失敗時不快取，下次查詢再重試
+		metrics.YAHOO_SEARCHES.inc(outcome="failed")
+	return list(results)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+	"""取得共用的執行緒池（fork 後的子行程會建立自己的執行緒池）"""
+	global _executor, _executor_pid
+	if _executor is None or _executor_pid != os.getpid():
+		with _executor_lock:
+			if _executor is None or _executor_pid != os.getpid():
+				_executor = ThreadPoolExecutor(max_workers=YAHOO_MAX_WORKERS, thread_name_prefix="yahoo-search")
+				_executor_pid = os.getpid()
+	return _executor
+
+
+def _search_params(term: str, limit: int) -> Dict:
+	return {
+		"q": term,
+		"quotesCount": max(20, limit * 2),
+		"newsCount": 0,
+		"lang": "zh-TW",
+		"region": "TW",
+	}
+
+
+def _parse_taiwan_quotes(resp, url: str, term: str) -> Optional[List[Dict[str, str]]]:
+	"""
+	由 Yahoo 搜尋回應過濾出台股
+	返回: 台股結果列表（依 Yahoo 回傳順序）；非 200 回應時返回 None
+	"""
+	status = resp.status_code
+	if status != 200:
+		logger.warning("Yahoo 搜尋非200回應 (url=%s, term=%s, status=%s)", url, term, status)
+		return None
+	
+	data = resp.json() or {}
+	quotes = data.get("quotes", [])
+	
+	results: List[Dict[str, str]] = []
+	for q in quotes:
+		symbol = q.get("symbol") or ""
+		if not symbol:
+			continue
+
+		if is_taiwan_stock(symbol, q):
+			code = symbol.split(".")[0]
+			# *** 修改點：優先使用 longname，因為它通常是完整的中文名稱 ***
+			name = q.get("longname") or q.get("shortname") or code
+			results.append({"code": code, "name": name})
+	return results
+
+
+def _fetch_taiwan_quotes(url: str, term: str, limit: int, cancelled: threading.Event) -> Optional[List[Dict[str, str]]]:
+	"""
+	送出單一 Yahoo 搜尋請求並過濾出台股
+	返回: 台股結果列表（依 Yahoo 回傳順序）；請求失敗或已取消時返回 None
+	"""
+	if cancelled.is_set():
+		return None
+
+	params = _search_params(term, limit)
+	try:
+		return _parse_taiwan_quotes(_http_get(url, params), url, term)
+	except requests.exceptions.RequestException as e:
+		logger.warning("Yahoo 搜尋請求失敗 (url=%s, term=%s): %s", url, term, e)
+		return None
+	except Exception as e:
+		logger.exception("Yahoo 搜尋發生未知錯誤 (url=%s, term=%s): %s", url, term, e)
+		return None
+
+
+async def _fetch_taiwan_quotes_async(url: str, term: str, limit: int) -> Optional[List[Dict[str, str]]]:
+	"""_fetch_taiwan_quotes 的非同步版本；取消時直接中斷請求"""
+	try:
+		return _parse_taiwan_quotes(await _http_get_async(url, _search_params(term, limit)), url, term)
+	except requests.exceptions.RequestException as e:
+		logger.warning("Yahoo 搜尋請求失敗 (url=%s, term=%s): %s", url, term, e)
+		return None
+	except Exception as e:
+		logger.exception("Yahoo 搜尋發生未知錯誤 (url=%s, term=%s): %s", url, term, e)
+		return None
+
+
+def _merge_outcomes(outcomes: List, terms_per_url: int, limit: int) -> Tuple[List[Dict[str, str]], bool]:
+	"""
+	依「主要網址優先、查詢策略依序」的順序合併各請求結果（與逐一查詢時的結果完全相同）
+	參數:
+		outcomes: 依 (網址, 查詢策略) 順序排列的結果；_PENDING 表示尚未完成，None 表示失敗
+	返回: (合併後的結果, 結果是否已確定——尚未完成的請求不會再改變前 limit 筆)
+	"""
 	all_results: List[Dict[str, str]] = []
+	codes = set()
+	final = True
 
-	for url in YAHOO_SEARCH_URLS:
-		for term in search_queries:
-			params = {
-				"q": term,
-				"quotesCount": max(20, limit * 2),
-				"newsCount": 0,
-				"lang": "zh-TW",
-				"region": "TW",
-			}
-			try:
-				resp = requests.get(url, params=params, headers=DEFAULT_HEADERS, timeout=8)
-				status = resp.status_code
-				if status != 200:
-					print(f"Yahoo 搜尋非200回應 (url={url}, term={term}, status={status})")
-					continue
-				
-				data = resp.json() or {}
-				quotes = data.get("quotes", [])
-				
-				for q in quotes:
-					symbol = q.get("symbol") or ""
-					if not symbol:
-						continue
-
-					if is_taiwan_stock(symbol, q):
-						code = symbol.split(".")[0]
-						# *** 修改點：優先使用 longname，因為它通常是完整的中文名稱 ***
-						name = q.get("longname") or q.get("shortname") or code
-						
-						if not any(r["code"] == code for r in all_results):
-							all_results.append({"code": code, "name": name})
-
-			except requests.exceptions.RequestException as e:
-				print(f"Yahoo 搜尋請求失敗 (url={url}, term={term}): {e}")
-				continue
-			except Exception as e:
-				print(f"Yahoo 搜尋發生未知錯誤 (url={url}, term={term}): {e}")
+	for start in range(0, len(outcomes), terms_per_url):
+		for outcome in outcomes[start:start + terms_per_url]:
+			if outcome is _PENDING:
+				# 之前的結果已足夠 limit 筆時，後續請求只會附加在後面，不影響最終結果
+				if len(all_results) < limit:
+					final = False
 				continue
+			for item in outcome or []:
+				if item["code"] not in codes:
+					codes.add(item["code"])
+					all_results.append(item)
 		
+		# 主要網址已有結果時不使用備援網址的結果
 		if all_results:
 			break
 
-	seen = set()
-	unique_results: List[Dict[str, str]] = []
-	for item in all_results:
-		key = (item["code"], item["name"])
-		if key in seen:
-			continue
-		seen.add(key)
-		unique_results.append(item)
+	return all_results[:limit], final
+
+
+def _search_yahoo_uncached(query: str, limit: int) -> Tuple[List[Dict[str, str]], bool]:
+	"""
+	實際呼叫 Yahoo 搜尋API：所有網址 × 查詢策略同時送出，
+	結果已確定或超過 YAHOO_SEARCH_DEADLINE 秒時取消其餘請求
+	返回: (台股結果列表, 是否至少有一次正常回應)
+	"""
+	search_queries = [query, f"{query} TW", f"{query} 台股"]
+	tasks = [(url, term) for url in YAHOO_SEARCH_URLS for term in search_queries]
+	outcomes: List = [_PENDING] * len(tasks)
+	cancelled = threading.Event()
+
+	executor = _get_executor()
+	futures = {
+		executor.submit(_fetch_taiwan_quotes, url, term, limit, cancelled): index
+		for index, (url, term) in enumerate(tasks)
+	}
+
+	try:
+		for future in as_completed(futures, timeout=YAHOO_SEARCH_DEADLINE):
+			outcomes[futures[future]] = future.result()
+			_, final = _merge_outcomes(outcomes, len(search_queries), limit)
+			if final:
+				break
+	except FuturesTimeoutError:
+		logger.warning("Yahoo 搜尋超過 %s 秒，以已完成的結果返回 (query=%s)", YAHOO_SEARCH_DEADLINE, query)
+	finally:
+		# 尚未開始的請求直接取消，執行中的請求結果將被忽略
+		cancelled.set()
+		for future in futures:
+			future.cancel()
+
+	results, _ = _merge_outcomes(outcomes, len(search_queries), limit)
+	had_response = any(outcome is not _PENDING and outcome is not None for outcome in outcomes)
+	return results, had_response
+
+
+async def _search_yahoo_uncached_async(query: str, limit: int) -> Tuple[List[Dict[str, str]], bool]:
+	"""
+	_search_yahoo_uncached 的非同步版本：所有請求以 task 並行送出，
+	結果已確定或超過 YAHOO_SEARCH_DEADLINE 秒時取消其餘請求（連線隨之中斷，不再佔用）
+	返回: (台股結果列表, 是否至少有一次正常回應)
+	"""
+	search_queries = [query, f"{query} TW", f"{query} 台股"]
+	tasks = [(url, term) for url in YAHOO_SEARCH_URLS for term in search_queries]
+	outcomes: List = [_PENDING] * len(tasks)
+
+	loop = asyncio.get_running_loop()
+	deadline = loop.time() + YAHOO_SEARCH_DEADLINE
+	pending = {
+		asyncio.ensure_future(_fetch_taiwan_quotes_async(url, term, limit)): index
+		for index, (url, term) in enumerate(tasks)
+	}
+
+	try:
+		while pending:
+			remaining = deadline - loop.time()
+			done = set()
+			if remaining > 0:
+				done, _ = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+			if not done:
+				logger.warning("Yahoo 搜尋超過 %s 秒，以已完成的結果返回 (query=%s)", YAHOO_SEARCH_DEADLINE, query)
+				break
+			for task in done:
+				outcomes[pending.pop(task)] = task.result()
+			_, final = _merge_outcomes(outcomes, len(search_queries), limit)
+			if final:
+				break
+	finally:
+		for task in pending:
+			task.cancel()
 
-	return unique_results[:limit]
+	results, _ = _merge_outcomes(outcomes, len(search_queries), limit)
+	had_response = any(outcome is not _PENDING and outcome is not None for outcome in outcomes)
+	return results, had_response
 
 
 def is_taiwan_stock(symbol: str, quote_data: dict) -> bool:
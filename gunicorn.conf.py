@@ -0,0 +1,60 @@
+"""
+gunicorn 設定檔
+啟動：gunicorn -c gunicorn.conf.py wsgi:application
+平滑重啟（載入新程式碼、逐一替換 worker）：kill -HUP <master pid>
+
+所有參數皆可用環境變數調整，預設使用 gthread worker：
+每個 worker 行程內有多條執行緒，適合本專案以資料庫與 Yahoo 查詢為主的 I/O 型請求
+"""
+
+import multiprocessing
+import os
+import subprocess
+import sys
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))                    # worker 無回應多久後重啟
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))  # 重啟/關閉時等待處理中請求的秒數
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# 每個 worker 處理一定數量請求後自動替換（加上隨機值避免所有 worker 同時重啟）
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.getenv('GUNICORN_ERROR_LOG', '-')
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+# 不預先載入應用：master 不持有資料庫連線與背景執行緒，HUP 時 worker 會重新載入程式碼
+preload_app = False
+
+_base_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def on_starting(server):
+    """master 啟動時執行一次部署啟動任務（HUP 平滑重啟時不會再次執行）"""
+    if os.getenv('RUN_STARTUP_TASKS', 'true').lower() != 'true':
+        return
+    # 在獨立行程中執行，master 本身不匯入應用程式模組
+    result = subprocess.run([sys.executable, os.path.join(_base_dir, 'startup.py')], cwd=_base_dir)
+    if result.returncode != 0:
+        server.log.warning("啟動任務未完成（數據庫連接失敗），worker 仍會啟動並在請求時重試連線")
+
+
+def post_worker_init(worker):
+    """worker 載入應用後預先載入股票目錄快取，避免第一個搜尋請求承擔載入成本"""
+    import db_manager
+    if db_manager.load_stock_directory():
+        worker.log.info("股票目錄快取載入完成")
+
+
+def worker_exit(server, worker):
+    """worker 結束時寫入佇列中剩餘的 Yahoo 搜尋結果，並關閉閒置的資料庫連線"""
+    import db_manager
+    import stock_promotion
+    stock_promotion.promoter.close()
+    db_manager.close_pool()
@@ -0,0 +1,47 @@
+"""
+日誌設定
+- 等級由 LOG_LEVEL 控制（預設 INFO），每條連線、每次搜尋等逐次訊息使用 DEBUG
+- WARNING 以下的訊息依 LOG_SAMPLE_RATE 取樣輸出，降低高流量時標準輸出的成本
+- WARNING 以上（錯誤）一律輸出
+"""
+
+import logging
+import random
+import sys
+
+from config import LOG_LEVEL, LOG_SAMPLE_RATE
+
+LOG_FORMAT = '%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s'
+
+_configured = False
+
+
+class SamplingFilter(logging.Filter):
+    """
+    依比例取樣 WARNING 以下的訊息
+    參數: rate - 保留比例（0 ~ 1）
+    """
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = max(0.0, min(1.0, float(rate)))
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+def setup_logging():
+    """設定根日誌（重複呼叫不會重複加入 handler）"""
+    global _configured
+    if _configured:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, LOG_LEVEL.upper(), logging.INFO))
+    _configured = True
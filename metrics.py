@@ -0,0 +1,268 @@
+"""
+行程內效能指標（Prometheus 文字格式）
+- Counter：只增不減的計數
+- Gauge：抓取時的即時數值
+- Histogram：延遲等數值的分佈（固定分桶）
+由 /metrics 端點輸出；使用多個 gunicorn worker 時每個 worker 各自統計，
+每次抓取得到的是處理該請求的 worker 的數據（stock_note_process_info 標示其 pid）
+"""
+
+import functools
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# 延遲分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 筆數分桶
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+_registry = []
+_collectors = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.extend(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指標 {self.name} 的標籤必須為 {self.labelnames}，收到 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.type_name}',
+        ]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """只增不減的計數"""
+
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+
+class Gauge(Counter):
+    """可任意設定的即時數值"""
+
+    type_name = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """數值分佈（各分桶計數、總和、次數）"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels):
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return entry[2] if entry else 0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(float(bound)))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+def register_collector(collect):
+    """註冊在輸出指標前執行的函式（例如把連線池統計寫入 Gauge）"""
+    with _registry_lock:
+        _collectors.append(collect)
+
+
+def render():
+    """
+    輸出所有指標
+    返回: Prometheus 文字格式字串
+    """
+    with _registry_lock:
+        collectors = list(_collectors)
+        metrics = list(_registry)
+    for collect in collectors:
+        try:
+            collect()
+        except Exception:
+            pass
+
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# ---------------------------------------------------------------------------
+# 本專案使用的指標
+# ---------------------------------------------------------------------------
+
+HTTP_REQUEST_DURATION = Histogram(
+    'stock_note_http_request_duration_seconds', '各路由請求處理時間（秒）',
+    ('method', 'route', 'status'))
+
+DB_QUERY_DURATION = Histogram(
+    'stock_note_db_query_duration_seconds', 'db_manager 各函式執行時間（秒，含借用連線）',
+    ('function',))
+DB_QUERY_ROWS = Histogram(
+    'stock_note_db_query_rows', 'db_manager 各函式返回筆數',
+    ('function',), buckets=ROW_BUCKETS)
+DB_QUERY_ERRORS = Counter(
+    'stock_note_db_query_errors_total', 'db_manager 各函式拋出例外次數',
+    ('function',))
+DB_CONNECTIONS_OPENED = Counter(
+    'stock_note_db_connections_opened_total', '建立的實體資料庫連線數')
+DB_CONNECTION_ERRORS = Counter(
+    'stock_note_db_connection_errors_total', '建立資料庫連線失敗次數（含重試）')
+DB_POOL = Gauge(
+    'stock_note_db_pool_connections', '連線池連線數', ('state',))
+
+YAHOO_REQUEST_DURATION = Histogram(
+    'stock_note_yahoo_request_duration_seconds', 'Yahoo 搜尋單次 HTTP 請求時間（秒）',
+    ('outcome',))
+YAHOO_SEARCHES = Counter(
+    'stock_note_yahoo_searches_total', 'Yahoo 股票搜尋次數（依結果分類）',
+    ('outcome',))
+
+PROCESS_INFO = Gauge('stock_note_process_info', '行程資訊', ('pid',))
+
+
+def _collect_process_info():
+    PROCESS_INFO.clear()
+    PROCESS_INFO.set(1, pid=os.getpid())
+
+
+register_collector(_collect_process_info)
+
+
+def timed_db(rows=None):
+    """
+    記錄 db_manager 函式執行時間與返回筆數的裝飾器（也可用於 async 函式）
+    參數:
+        rows: 從返回值計算筆數的函式；預設列表取長度，其他返回值不記錄筆數
+    """
+    def observe_rows(name, result):
+        if rows is not None:
+            count = rows(result)
+        elif isinstance(result, list):
+            count = len(result)
+        else:
+            count = None
+        if count is not None:
+            DB_QUERY_ROWS.observe(count, function=name)
+
+    def decorator(func):
+        name = func.__name__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception:
+                    DB_QUERY_ERRORS.inc(function=name)
+                    raise
+                finally:
+                    DB_QUERY_DURATION.observe(time.perf_counter() - start, function=name)
+                observe_rows(name, result)
+                return result
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                DB_QUERY_ERRORS.inc(function=name)
+                raise
+            finally:
+                DB_QUERY_DURATION.observe(time.perf_counter() - start, function=name)
+            observe_rows(name, result)
+            return result
+
+        return wrapper
+    return decorator
@@ -72,6 +72,28 @@ def get_executed_migrations():
             cursor.close()
             connection.close()
 
+# 遷移一律在 DB_CONFIG 指定的資料庫（MYSQL_DATABASE）中執行，檔案中的建立/切換資料庫語句不執行
+DATABASE_STATEMENT = re.compile(r'^(CREATE\s+(DATABASE|SCHEMA)|USE)\b', re.IGNORECASE)
+
+def split_statements(sql_content):
+    """
+    將遷移文件分割為 SQL 語句（以分號分隔），並移除整行註解
+    （註解與語句會被分在同一段，不能以開頭是否為 -- 判斷整段略過）
+    CREATE DATABASE / USE 語句會被略過，避免在 MYSQL_DATABASE 以外的資料庫建立資料表
+    返回: SQL 語句列表
+    """
+    statements = []
+    for stmt in sql_content.split(';'):
+        lines = [line for line in stmt.split('\n') if not line.strip().startswith('--')]
+        stmt = '\n'.join(lines).strip()
+        if not stmt:
+            continue
+        if DATABASE_STATEMENT.match(stmt):
+            print(f"⚠️  跳過（使用 MYSQL_DATABASE 指定的資料庫）: {stmt[:50]}")
+            continue
+        statements.append(stmt)
+    return statements
+
 def execute_migration(migration_file):
     """執行單個遷移文件"""
     connection = get_db_connection()
@@ -85,12 +107,11 @@ def execute_migration(migration_file):
         with open(migration_file, 'r', encoding='utf-8') as f:
             sql_content = f.read()
         
-        # 分割 SQL 語句（以分號分隔）
-        sql_statements = [stmt.strip() for stmt in sql_content.split(';') if stmt.strip()]
+        sql_statements = split_statements(sql_content)
         
         # 執行每個 SQL 語句
         for statement in sql_statements:
-            if statement and not statement.startswith('--'):
+            if statement:
                 try:
                     cursor.execute(statement)
                     # 讀取所有結果以避免 "Unread result found" 錯誤
@@ -191,8 +212,23 @@ def show_status():
         status = "✅ 已執行" if migration_name in executed_migrations else "⏳ 待執行"
         print(f"  {migration_name}: {status}")
 
+def run_sqlite_schema():
+    """SQLite 後端：套用 migrations/sqlite/schema.sql（應用程式連線時也會自動套用）"""
+    from db_backends import SQLiteBackend
+    from config import SQLITE_PATH
+    
+    connection = SQLiteBackend(SQLITE_PATH).connect()
+    connection.close()
+    print(f"✅ SQLite 資料庫結構已套用: {SQLITE_PATH}")
+    return True
+
 if __name__ == "__main__":
     import sys
+    from config import DB_BACKEND
+    
+    if DB_BACKEND == 'sqlite':
+        run_sqlite_schema()
+        sys.exit(0)
     
     if len(sys.argv) > 1:
         command = sys.argv[1]
@@ -0,0 +1,34 @@
+-- 遷移腳本 002: 新增筆記全文索引
+-- 日期: 2026-10-18
+-- 描述: 為 notes 表的 content 和 ref 欄位建立 ngram FULLTEXT 索引，支援中文全文搜尋
+
+-- 建立全文索引（如果不存在）
+-- ngram 分詞長度由 MySQL 伺服器參數 ngram_token_size 決定（預設 2），
+-- 應用程式的 NOTES_FULLTEXT_MIN_LENGTH 需與其一致
+SET @index_exists = (
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.STATISTICS
+    WHERE TABLE_SCHEMA = DATABASE()
+    AND TABLE_NAME = 'notes'
+    AND INDEX_NAME = 'ft_notes_content_ref'
+);
+
+SET @sql = IF(
+    @index_exists = 0,
+    'ALTER TABLE notes ADD FULLTEXT INDEX ft_notes_content_ref (content, ref) WITH PARSER ngram',
+    'SELECT ''ft_notes_content_ref 索引已存在'' AS message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 驗證索引是否成功建立
+SELECT 
+    INDEX_NAME,
+    INDEX_TYPE,
+    COLUMN_NAME
+FROM INFORMATION_SCHEMA.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE()
+    AND TABLE_NAME = 'notes'
+    AND INDEX_NAME = 'ft_notes_content_ref';
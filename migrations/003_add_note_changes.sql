@@ -0,0 +1,30 @@
+-- 遷移腳本 003: 筆記變更紀錄
+-- 日期: 2026-10-18
+-- 描述: 新增 note_deletions 刪除紀錄表與 notes(updated_at, id) 索引，供 /api/notes/changes 增量同步
+
+-- 刪除紀錄（tombstone）：delete_note 在同一交易中寫入，過期紀錄由啟動工作清除
+CREATE TABLE IF NOT EXISTS note_deletions (
+    `note_id` INT NOT NULL,
+    `deleted_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (`note_id`),
+    INDEX `idx_note_deletions_deleted_at` (`deleted_at`, `note_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 依 (updated_at, id) 順序讀取變更（如果不存在）
+SET @index_exists = (
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.STATISTICS
+    WHERE TABLE_SCHEMA = DATABASE()
+    AND TABLE_NAME = 'notes'
+    AND INDEX_NAME = 'idx_notes_updated_at'
+);
+
+SET @sql = IF(
+    @index_exists = 0,
+    'CREATE INDEX idx_notes_updated_at ON notes(updated_at, id)',
+    'SELECT ''idx_notes_updated_at 索引已存在'' AS message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
@@ -0,0 +1,43 @@
+-- 遷移腳本 004: 筆記列表排序索引
+-- 日期: 2026-10-18
+-- 描述: 新增 notes(note_type) 與 stocks(stock_name) 索引，讓筆記列表的每種排序都能依索引順序讀取
+-- InnoDB 的次要索引最後隱含主鍵，(created_at)、(stock_code) 索引即為 (created_at, id)、(stock_code, id)，
+-- 與列表的 ORDER BY 排序欄位, id 一致，不需另建重複的複合索引（可用 scripts/check_query_plans.py 檢查）
+
+-- 依筆記類型排序：ENUM 依定義順序排序，索引即為 (note_type, id)（如果不存在）
+SET @index_exists = (
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.STATISTICS
+    WHERE TABLE_SCHEMA = DATABASE()
+    AND TABLE_NAME = 'notes'
+    AND INDEX_NAME = 'idx_notes_note_type'
+);
+
+SET @sql = IF(
+    @index_exists = 0,
+    'CREATE INDEX idx_notes_note_type ON notes(note_type)',
+    'SELECT ''idx_notes_note_type 索引已存在'' AS message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 依股票名稱排序：依名稱順序讀取股票，再以 idx_notes_stock_code 取得各股票的筆記（如果不存在）
+SET @index_exists = (
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.STATISTICS
+    WHERE TABLE_SCHEMA = DATABASE()
+    AND TABLE_NAME = 'stocks'
+    AND INDEX_NAME = 'idx_stocks_stock_name'
+);
+
+SET @sql = IF(
+    @index_exists = 0,
+    'CREATE INDEX idx_stocks_stock_name ON stocks(stock_name)',
+    'SELECT ''idx_stocks_stock_name 索引已存在'' AS message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
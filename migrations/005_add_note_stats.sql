@@ -0,0 +1,51 @@
+-- 遷移腳本 005: 筆記統計摘要表
+-- 日期: 2026-10-18
+-- 描述: 新增 stock_note_stats、stock_ref_stats、ref_stats 摘要表並以現有筆記回填，股票摘要與常用來源不需再掃描 notes
+-- 新增/修改/刪除筆記時由 db_manager 在同一交易中增減計數，啟動工作（startup.py）會重新計算一次以修正直接修改資料庫造成的差異
+
+-- 每檔股票各筆記類型的筆數與最後一筆筆記時間
+CREATE TABLE IF NOT EXISTS stock_note_stats (
+    `stock_code` VARCHAR(10) NOT NULL,
+    `note_type` ENUM('TAG', 'STORY') NOT NULL,
+    `note_count` INT NOT NULL DEFAULT 0,
+    `last_note_at` TIMESTAMP NULL,
+    PRIMARY KEY (`stock_code`, `note_type`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 每檔股票各來源的筆數（依筆數讀取常用來源）
+CREATE TABLE IF NOT EXISTS stock_ref_stats (
+    `stock_code` VARCHAR(10) NOT NULL,
+    `ref` VARCHAR(255) NOT NULL,
+    `note_count` INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (`stock_code`, `ref`),
+    INDEX `idx_stock_ref_stats_count` (`stock_code`, `note_count`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 所有筆記各來源的筆數（新增筆記表單的來源選項、/api/refs）
+CREATE TABLE IF NOT EXISTS ref_stats (
+    `ref` VARCHAR(255) NOT NULL,
+    `note_count` INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (`ref`),
+    INDEX `idx_ref_stats_count` (`note_count`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 以現有筆記回填（可重複執行）
+INSERT INTO stock_note_stats (stock_code, note_type, note_count, last_note_at)
+SELECT stock_code, note_type, COUNT(*), MAX(created_at)
+FROM notes
+GROUP BY stock_code, note_type
+ON DUPLICATE KEY UPDATE note_count = VALUES(note_count), last_note_at = VALUES(last_note_at);
+
+INSERT INTO stock_ref_stats (stock_code, ref, note_count)
+SELECT stock_code, ref, COUNT(*)
+FROM notes
+WHERE ref IS NOT NULL AND ref != ''
+GROUP BY stock_code, ref
+ON DUPLICATE KEY UPDATE note_count = VALUES(note_count);
+
+INSERT INTO ref_stats (ref, note_count)
+SELECT ref, COUNT(*)
+FROM notes
+WHERE ref IS NOT NULL AND ref != ''
+GROUP BY ref
+ON DUPLICATE KEY UPDATE note_count = VALUES(note_count);
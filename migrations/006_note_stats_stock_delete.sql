@@ -0,0 +1,68 @@
+-- 遷移腳本 006: 刪除股票時同步筆記統計摘要
+-- 日期: 2026-10-18
+-- 描述: 刪除股票時 notes 由外鍵 ON DELETE CASCADE 連帶刪除，串聯刪除不經過 db_manager（也不會觸發 notes 的觸發程序），
+--       005 的統計摘要會留下已刪除股票的計數。stock_note_stats、stock_ref_stats 改以外鍵隨股票一併刪除，
+--       不分股票的 ref_stats 由 stocks 的 BEFORE DELETE 觸發程序扣除該股票在 stock_ref_stats 中的各來源筆數
+-- 注意: 啟用 binlog 時建立觸發程序需要 SUPER 權限或 log_bin_trust_function_creators=1
+
+-- 先扣除已刪除股票留下的統計（加上外鍵前不能有找不到股票的資料列），可重複執行
+UPDATE ref_stats r
+JOIN (
+    SELECT ref, SUM(note_count) AS note_count
+    FROM stock_ref_stats
+    WHERE stock_code NOT IN (SELECT stock_code FROM stocks)
+    GROUP BY ref
+) orphan ON orphan.ref = r.ref
+SET r.note_count = r.note_count - orphan.note_count;
+
+DELETE FROM ref_stats WHERE note_count <= 0;
+DELETE FROM stock_ref_stats WHERE stock_code NOT IN (SELECT stock_code FROM stocks);
+DELETE FROM stock_note_stats WHERE stock_code NOT IN (SELECT stock_code FROM stocks);
+
+-- stock_note_stats 隨股票刪除（如果不存在）
+SET @fk_exists = (
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS
+    WHERE TABLE_SCHEMA = DATABASE()
+    AND TABLE_NAME = 'stock_note_stats'
+    AND CONSTRAINT_NAME = 'fk_stock_note_stats_stock'
+);
+
+SET @sql = IF(
+    @fk_exists = 0,
+    'ALTER TABLE stock_note_stats ADD CONSTRAINT fk_stock_note_stats_stock FOREIGN KEY (stock_code) REFERENCES stocks(stock_code) ON DELETE CASCADE',
+    'SELECT ''fk_stock_note_stats_stock 外鍵已存在'' AS message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- stock_ref_stats 隨股票刪除（如果不存在）
+SET @fk_exists = (
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS
+    WHERE TABLE_SCHEMA = DATABASE()
+    AND TABLE_NAME = 'stock_ref_stats'
+    AND CONSTRAINT_NAME = 'fk_stock_ref_stats_stock'
+);
+
+SET @sql = IF(
+    @fk_exists = 0,
+    'ALTER TABLE stock_ref_stats ADD CONSTRAINT fk_stock_ref_stats_stock FOREIGN KEY (stock_code) REFERENCES stocks(stock_code) ON DELETE CASCADE',
+    'SELECT ''fk_stock_ref_stats_stock 外鍵已存在'' AS message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 刪除股票前扣除其各來源筆數（stock_ref_stats 的資料列在刪除股票時才串聯刪除，觸發程序中仍可讀取）
+-- 觸發程序只有一個語句，不需要 BEGIN ... END 與 DELIMITER（migrate.py 以分號分割語句）
+DROP TRIGGER IF EXISTS stocks_delete_ref_stats;
+
+CREATE TRIGGER stocks_delete_ref_stats BEFORE DELETE ON stocks FOR EACH ROW
+UPDATE ref_stats r
+JOIN stock_ref_stats s ON s.ref = r.ref
+SET r.note_count = r.note_count - s.note_count
+WHERE s.stock_code = OLD.stock_code;
@@ -0,0 +1,99 @@
+-- SQLite 資料庫結構（DB_BACKEND=sqlite）
+-- 對應 migrations/000 ~ 006 的 MySQL 結構，每次啟動時自動套用，所有語句皆可重複執行
+-- 新增 MySQL 遷移腳本時，請同步在此加入對應的 SQLite 語句
+
+-- 股票表
+CREATE TABLE IF NOT EXISTS stocks (
+    stock_code VARCHAR(10) NOT NULL PRIMARY KEY,
+    stock_name VARCHAR(50) NOT NULL,
+    industry VARCHAR(50) NULL,
+    last_updated TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+-- 筆記表（AUTOINCREMENT：與 MySQL 相同，刪除的 id 不會被重複使用）
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    stock_code VARCHAR(10) NOT NULL REFERENCES stocks(stock_code) ON DELETE CASCADE,
+    note_type VARCHAR(5) NOT NULL CHECK (note_type IN ('TAG', 'STORY')),
+    content TEXT NOT NULL,
+    ref VARCHAR(255) NULL,
+    ref_time TIMESTAMP NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime')),
+    updated_at TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_notes_stock_code ON notes(stock_code);
+CREATE INDEX IF NOT EXISTS idx_notes_created_at ON notes(created_at);
+CREATE INDEX IF NOT EXISTS idx_notes_updated_at ON notes(updated_at);
+CREATE INDEX IF NOT EXISTS idx_notes_ref ON notes(ref);
+CREATE INDEX IF NOT EXISTS idx_notes_ref_time ON notes(ref_time);
+
+-- 筆記列表各排序方式的索引（004）：索引項目最後隱含 rowid（即 id），可直接依 (排序欄位, id) 順序讀取
+-- 筆記類型的排序運算式需與 SQLiteBackend.note_type_sort 完全相同才會使用此索引
+CREATE INDEX IF NOT EXISTS idx_notes_note_type ON notes(CASE note_type WHEN 'TAG' THEN 1 ELSE 2 END);
+CREATE INDEX IF NOT EXISTS idx_stocks_stock_name ON stocks(stock_name);
+
+-- 刪除紀錄（tombstone），供 /api/notes/changes 增量同步
+CREATE TABLE IF NOT EXISTS note_deletions (
+    note_id INTEGER NOT NULL PRIMARY KEY,
+    deleted_at TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_note_deletions_deleted_at ON note_deletions(deleted_at, note_id);
+
+-- 全文搜尋（對應 MySQL 的 ngram FULLTEXT 索引；trigram 斷詞支援中文子字串比對）
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+    content, ref,
+    content='notes', content_rowid='id',
+    tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+    INSERT INTO notes_fts(rowid, content, ref) VALUES (new.id, new.content, new.ref);
+END;
+
+CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+    INSERT INTO notes_fts(notes_fts, rowid, content, ref) VALUES ('delete', old.id, old.content, old.ref);
+END;
+
+CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF content, ref ON notes BEGIN
+    INSERT INTO notes_fts(notes_fts, rowid, content, ref) VALUES ('delete', old.id, old.content, old.ref);
+    INSERT INTO notes_fts(rowid, content, ref) VALUES (new.id, new.content, new.ref);
+END;
+
+-- 筆記統計摘要表（005）：由 db_manager 在寫入筆記的同一交易中增減計數，可用 scripts/rebuild_note_stats.py 重新計算
+CREATE TABLE IF NOT EXISTS stock_note_stats (
+    stock_code VARCHAR(10) NOT NULL,
+    note_type VARCHAR(5) NOT NULL,
+    note_count INTEGER NOT NULL DEFAULT 0,
+    last_note_at TIMESTAMP NULL,
+    PRIMARY KEY (stock_code, note_type)
+);
+
+CREATE TABLE IF NOT EXISTS stock_ref_stats (
+    stock_code VARCHAR(10) NOT NULL,
+    ref VARCHAR(255) NOT NULL,
+    note_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (stock_code, ref)
+);
+
+CREATE INDEX IF NOT EXISTS idx_stock_ref_stats_count ON stock_ref_stats(stock_code, note_count);
+
+CREATE TABLE IF NOT EXISTS ref_stats (
+    ref VARCHAR(255) NOT NULL PRIMARY KEY,
+    note_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_ref_stats_count ON ref_stats(note_count);
+
+-- 刪除股票時筆記由外鍵串聯刪除，不經過 db_manager：由觸發程序扣除並移除該股票的統計（006）
+-- （MySQL 以外鍵串聯刪除 stock_note_stats、stock_ref_stats；SQLite 無法對既有資料表加上外鍵，改在觸發程序中刪除）
+CREATE TRIGGER IF NOT EXISTS stocks_delete_note_stats BEFORE DELETE ON stocks BEGIN
+    UPDATE ref_stats SET note_count = note_count - (
+        SELECT s.note_count FROM stock_ref_stats s WHERE s.stock_code = old.stock_code AND s.ref = ref_stats.ref
+    )
+    WHERE ref IN (SELECT ref FROM stock_ref_stats WHERE stock_code = old.stock_code);
+    DELETE FROM ref_stats WHERE note_count <= 0;
+    DELETE FROM stock_ref_stats WHERE stock_code = old.stock_code;
+    DELETE FROM stock_note_stats WHERE stock_code = old.stock_code;
+END;
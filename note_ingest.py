@@ -0,0 +1,179 @@
+"""
+筆記批次匯入
+逐筆驗證後依 chunk_size 分批交給 db_manager.add_notes_bulk（每批一個交易），
+返回每筆資料的結果，供 POST /api/notes/bulk 與 scripts/import_notes.py 共用
+"""
+
+import json
+import logging
+import time
+from datetime import datetime
+
+import db_manager
+from config import NOTES_BULK_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+NOTE_TYPES = ('TAG', 'STORY')
+
+# 與資料表欄位長度一致
+MAX_STOCK_CODE_LENGTH = 10
+MAX_STOCK_NAME_LENGTH = 50
+MAX_REF_LENGTH = 255
+
+# 可接受的時間格式（另外也接受 ISO 8601）
+TIME_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M', '%Y-%m-%d')
+
+
+class InvalidRow(ValueError):
+    """無法解析的輸入列（例如 NDJSON 中不是 JSON 物件的行）"""
+
+
+def _parse_time(value, field):
+    if value in (None, ''):
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"{field} 必須是字串")
+    value = value.strip()
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{field} 時間格式無效: {value}")
+    # 資料庫欄位不含時區，轉為本地時間；與資料庫相同只保留到秒
+    if parsed.tzinfo:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed.replace(microsecond=0)
+
+
+def _text(row, field):
+    value = row.get(field)
+    if value is None:
+        return ''
+    if not isinstance(value, (str, int)):
+        raise ValueError(f"{field} 必須是字串")
+    return str(value).strip()
+
+
+def validate_note(row):
+    """
+    驗證並正規化單筆筆記
+    參數:
+        row: 字典，keys: stock_code, stock_name(可選), note_type, content, ref(可選), ref_time(可選), created_at(可選)
+    返回: add_notes_bulk 使用的筆記字典
+    例外: ValueError（訊息說明第一個不合法的欄位）
+    """
+    if not isinstance(row, dict):
+        raise ValueError("每筆資料必須是 JSON 物件")
+
+    stock_code = _text(row, 'stock_code')
+    stock_name = _text(row, 'stock_name')
+    note_type = _text(row, 'note_type').upper()
+    content = _text(row, 'content')
+    ref = _text(row, 'ref')
+
+    if not stock_code:
+        raise ValueError("缺少 stock_code")
+    if len(stock_code) > MAX_STOCK_CODE_LENGTH:
+        raise ValueError(f"stock_code 超過 {MAX_STOCK_CODE_LENGTH} 個字元")
+    if len(stock_name) > MAX_STOCK_NAME_LENGTH:
+        raise ValueError(f"stock_name 超過 {MAX_STOCK_NAME_LENGTH} 個字元")
+    if note_type not in NOTE_TYPES:
+        raise ValueError("note_type 必須是 TAG 或 STORY")
+    if not content:
+        raise ValueError("缺少 content")
+    if len(ref) > MAX_REF_LENGTH:
+        raise ValueError(f"ref 超過 {MAX_REF_LENGTH} 個字元")
+
+    return {
+        'stock_code': stock_code,
+        # 與 /add 相同：名稱與代碼相同時視為未提供
+        'stock_name': stock_name if stock_name and stock_name != stock_code else None,
+        'note_type': note_type,
+        'content': content,
+        'ref': ref or None,
+        'ref_time': _parse_time(row.get('ref_time'), 'ref_time'),
+        'created_at': _parse_time(row.get('created_at'), 'created_at'),
+    }
+
+
+def iter_ndjson(lines):
+    """
+    逐行解析 NDJSON（空行略過）
+    返回: 產生器，元素為字典；無法解析的行為 InvalidRow 物件（由 ingest_notes 記錄為 invalid）
+    """
+    for line_number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield InvalidRow(f"第 {line_number} 行不是有效的 JSON: {e}")
+
+
+def ingest_notes(rows, chunk_size=None, progress=None):
+    """
+    批次匯入筆記
+    參數:
+        rows: 可迭代（可為產生器），元素為筆記字典
+        chunk_size: 每個交易寫入的筆數（預設 NOTES_BULK_CHUNK_SIZE）
+        progress: 每寫入一批後呼叫 progress(已處理筆數, 統計字典)
+    返回: {
+        'received': 收到的筆數, 'inserted': 寫入筆數, 'invalid': 驗證失敗筆數, 'failed': 寫入失敗筆數,
+        'seconds': 耗時, 'rows_per_second': 每秒處理筆數,
+        'results': [{'index': 輸入位置（從 0 起）, 'status': inserted / invalid / failed, 'error': 錯誤訊息}, ...]
+    }
+    """
+    chunk_size = max(1, chunk_size or NOTES_BULK_CHUNK_SIZE)
+    start = time.perf_counter()
+    summary = {'received': 0, 'inserted': 0, 'invalid': 0, 'failed': 0}
+    results = []
+    chunk = []
+    chunk_indexes = []
+
+    def flush():
+        inserted = db_manager.add_notes_bulk(chunk)
+        if inserted is None:
+            summary['failed'] += len(chunk)
+            for index in chunk_indexes:
+                results[index] = {'index': index, 'status': 'failed', 'error': '寫入資料庫失敗（該批已回滾）'}
+        else:
+            summary['inserted'] += inserted
+        if progress:
+            progress(summary['received'], dict(summary))
+        chunk.clear()
+        chunk_indexes.clear()
+
+    for index, row in enumerate(rows):
+        summary['received'] += 1
+        try:
+            if isinstance(row, InvalidRow):
+                raise row
+            note = validate_note(row)
+        except ValueError as e:
+            summary['invalid'] += 1
+            results.append({'index': index, 'status': 'invalid', 'error': str(e)})
+            continue
+        results.append({'index': index, 'status': 'inserted'})
+        chunk.append(note)
+        chunk_indexes.append(index)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+    seconds = time.perf_counter() - start
+    summary['seconds'] = round(seconds, 3)
+    summary['rows_per_second'] = round(summary['received'] / seconds, 1) if seconds > 0 else None
+    summary['results'] = results
+    logger.info("批次匯入筆記: 收到 %d 筆，寫入 %d 筆，無效 %d 筆，失敗 %d 筆（%.1f 筆/秒）",
+                summary['received'], summary['inserted'], summary['invalid'], summary['failed'],
+                summary['rows_per_second'] or 0)
+    return summary
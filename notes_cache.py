@@ -0,0 +1,215 @@
+"""
+筆記列表查詢結果快取
+- 以查詢參數（搜尋、排序、游標、筆數）為鍵快取格式化後的筆記列表
+- 每次寫入筆記/股票後遞增「世代」（generation），快取鍵包含世代，舊結果不會再被讀到
+- 世代計數器預設存放在本機共用檔案（mmap），同一台主機上的 gunicorn worker 與命令列工具
+  共用同一個計數器，任一行程寫入後其他行程的快取也會失效；無法使用共用檔案時退回行程內計數器
+- 不經過 db_manager 的寫入（例如手動執行 SQL）不會遞增世代，由 ttl 保證最終一致
+- /api/notes 另以資料庫計算的資料版本（db_manager.get_notes_version）產生 ETag 並記錄在快取鍵中（observe），
+  其他主機或直接修改資料庫的寫入也會讓 ETag 與快取結果失效，不依賴共用的世代檔案
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+
+import metrics
+from config import (NOTES_CACHE_ENABLED, NOTES_CACHE_SIZE, NOTES_CACHE_TTL, NOTES_CACHE_MAX_ROWS,
+                    NOTES_CACHE_GENERATION_FILE)
+from ttl_cache import TTLCache, MISSING
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+NOTES_CACHE_LOOKUPS = metrics.Counter(
+    'stock_note_notes_cache_lookups_total', '筆記列表快取查詢次數（hit / miss / uncacheable）',
+    ('outcome',))
+
+
+class LocalGeneration:
+    """行程內的世代計數器"""
+
+    shared = False
+
+    def __init__(self):
+        # 以隨機值起算：各行程的世代不會相同，HTTP ETag 不會在 worker 之間誤判為未變更
+        self._value = int.from_bytes(os.urandom(6), 'little')
+        self._lock = threading.Lock()
+
+    def value(self):
+        return self._value
+
+    def bump(self):
+        with self._lock:
+            self._value += 1
+            return self._value
+
+
+class SharedGeneration:
+    """
+    以 mmap 共用檔案儲存的世代計數器
+    讀取只是一次記憶體存取；遞增時以 lockf（行程間）與執行緒鎖（行程內）互斥
+    """
+
+    shared = True
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(self._fd).st_size < 8:
+                    # 以隨機值起算：檔案被刪除重建時，世代不會回到其他行程已快取過的值
+                    start = int.from_bytes(os.urandom(6), 'little')
+                    os.pwrite(self._fd, struct.pack('<Q', start), 0)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+            self._map = mmap.mmap(self._fd, 8)
+        except Exception:
+            os.close(self._fd)
+            raise
+
+    def value(self):
+        return struct.unpack_from('<Q', self._map, 0)[0]
+
+    def bump(self):
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                value = self.value() + 1
+                struct.pack_into('<Q', self._map, 0, value)
+                return value
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+
+def create_generation(path):
+    """
+    建立世代計數器
+    參數:
+        path: 共用檔案路徑，空字串表示只在行程內計數
+    """
+    if path and fcntl is not None:
+        try:
+            return SharedGeneration(path)
+        except OSError as e:
+            logger.warning("無法使用共用的筆記快取世代檔案 %s，改用行程內計數（多個 worker 時快取可能過期）: %s",
+                           path, e)
+    return LocalGeneration()
+
+
+class NotesResultCache:
+    """
+    參數:
+        generation: 世代計數器（LocalGeneration 或 SharedGeneration）
+        maxsize: 最多快取的查詢數
+        ttl: 快取存活秒數（涵蓋不經過 db_manager 的寫入）
+        max_rows: 超過此筆數的結果不快取，避免完整列表佔用大量記憶體
+        enabled: 是否啟用
+    """
+
+    def __init__(self, generation, maxsize=256, ttl=300, max_rows=5000, enabled=True):
+        self.generation = generation
+        self.max_rows = max_rows
+        self.enabled = enabled
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._data_version = None
+        self._seen_version = None
+
+    def get_or_load(self, key, load):
+        """
+        取得快取的查詢結果，沒有時呼叫 load() 查詢
+        參數:
+            key: 查詢參數（需可雜湊）
+            load: 返回 (結果列表, 是否可快取) 的函式；查詢失敗時應返回不可快取
+        返回: 結果列表（與其他呼叫端共用，不可修改）
+        """
+        if not self.enabled:
+            return load()[0]
+
+        full_key, value = self._lookup(key)
+        if value is MISSING:
+            value = self._store(full_key, *load())
+        return value
+
+    async def aget_or_load(self, key, load):
+        """同 get_or_load，load 為返回 (結果列表, 是否可快取) 的 async 函式（ASGI 模式使用）"""
+        if not self.enabled:
+            return (await load())[0]
+
+        full_key, value = self._lookup(key)
+        if value is MISSING:
+            value = self._store(full_key, *await load())
+        return value
+
+    def _lookup(self, key):
+        """返回 (含世代的快取鍵, 快取結果或 MISSING)"""
+        # 先讀世代再查詢：查詢期間若有寫入，結果會存在已過時的世代下，不會被讀到
+        version = (self.generation.value(), self._data_version)
+        if version != self._seen_version:
+            # 世代或資料版本已變更，舊結果不會再被使用，直接釋放
+            self._cache.clear()
+            self._seen_version = version
+
+        full_key = version + tuple(key)
+        value = self._cache.get(full_key)
+        if value is not MISSING:
+            NOTES_CACHE_LOOKUPS.inc(outcome='hit')
+        return full_key, value
+
+    def _store(self, full_key, value, cacheable):
+        if cacheable and len(value) <= self.max_rows:
+            NOTES_CACHE_LOOKUPS.inc(outcome='miss')
+            self._cache.set(full_key, value)
+        else:
+            NOTES_CACHE_LOOKUPS.inc(outcome='uncacheable')
+        return value
+
+    def observe(self, data_version):
+        """
+        記錄剛從資料庫讀取的資料版本（在查詢筆記之前呼叫），之後的查詢結果存在此版本下
+        其他主機的寫入不會遞增本機的世代，但會改變資料版本：避免以新版本的 ETag 返回寫入前快取的結果
+        """
+        self._data_version = data_version
+
+    @staticmethod
+    def etag(data_version, *params):
+        """
+        以資料版本（db_manager.get_notes_version）與查詢參數產生筆記列表的 ETag（Flask 與 ASGI 路由共用）
+        資料版本由資料庫計算，所有主機與行程對相同的資料產生相同的 ETag
+        """
+        return hashlib.sha1(repr((data_version,) + params).encode('utf-8')).hexdigest()[:20]
+
+    def invalidate(self):
+        """寫入提交後呼叫：遞增世代，所有行程的快取結果失效"""
+        self.generation.bump()
+
+    def clear(self):
+        """清除本行程的快取（例如切換資料庫後端）"""
+        self._cache.clear()
+
+    def stats(self):
+        data = self._cache.stats()
+        data['enabled'] = self.enabled
+        data['generation'] = self.generation.value()
+        data['shared'] = self.generation.shared
+        return data
+
+
+# 行程內共用的筆記列表快取
+notes_cache = NotesResultCache(
+    create_generation(NOTES_CACHE_GENERATION_FILE),
+    maxsize=NOTES_CACHE_SIZE,
+    ttl=NOTES_CACHE_TTL,
+    max_rows=NOTES_CACHE_MAX_ROWS,
+    enabled=NOTES_CACHE_ENABLED,
+)
@@ -0,0 +1,133 @@
+"""
+筆記列表查詢計畫檢查
+對每種排序方式（與方向）的第一頁與後續頁查詢執行 EXPLAIN（SQLite 為 EXPLAIN QUERY PLAN），
+包含不搜尋、LIKE 搜尋（關鍵字短於全文搜尋下限）與全文搜尋（MySQL FULLTEXT / SQLite FTS5）三種查詢，
+任一查詢退化時以非零狀態結束，可放在 CI 或遷移後執行:
+	- 不搜尋與 LIKE 搜尋：完整掃描並另外排序（未使用排序索引；LIKE '%...%' 本來就需逐筆比對，只能依排序索引讀取並提早結束）
+	- 全文搜尋：從頭讀取 notes 表（未使用全文索引）；符合的筆記先取出再排序，排序本身不視為退化
+未啟用全文搜尋（例如 MySQL 尚未執行遷移 002）時略過全文搜尋查詢
+
+用法:
+	PYTHONPATH=. python scripts/check_query_plans.py
+	PYTHONPATH=. python scripts/check_query_plans.py --verbose   # 列出每個查詢的計畫
+
+資料量很少時 MySQL 可能認為全表掃描較快，請在有代表性資料量的資料庫執行（例如 bench/dataset.py 產生的資料）
+"""
+
+import argparse
+import sys
+from datetime import datetime
+import db_manager
+from config import NOTES_PAGE_SIZE
+from log_config import setup_logging
+
+# 後續頁查詢使用的游標值（只影響查詢條件的形式，不影響計畫是否使用索引）
+SAMPLE_CURSOR_VALUES = {
+	'created_at': datetime(2024, 1, 1),
+	'stock_code': '2330',
+	'stock_name': '台積電',
+	'note_type': db_manager.NOTE_TYPE_ORDER['TAG'],
+	'relevance': 1.0,
+}
+
+# 搜尋關鍵字：LIKE 搜尋使用單一字元（短於全文搜尋下限），全文搜尋使用 bench/dataset.py 資料中的標籤
+LIKE_SEARCH_TERM = '台'
+FULLTEXT_SEARCH_TERM = '法說會'
+
+# 已知無法只靠索引排序的查詢（後端, 排序欄位）：ORDER BY s.stock_name, n.id 含兩個資料表的欄位，
+# MySQL 依股票名稱索引讀取後仍需排序；SQLite 只需排序同名股票的筆記（RIGHT PART OF ORDER BY）
+KNOWN_FILESORTS = {('mysql', 'stock_name')}
+
+# 說明中各搜尋模式的名稱
+SEARCH_LABELS = {None: '', 'like': 'LIKE 搜尋 ', 'fulltext': '全文搜尋 '}
+
+
+def search_variants():
+	"""
+	要檢查的搜尋模式
+	返回: [(搜尋模式, 搜尋關鍵字, _fulltext_query() 的結果), ...]；搜尋模式為 None、like 或 fulltext
+	"""
+	variants = [(None, '', None), ('like', LIKE_SEARCH_TERM, None)]
+	fulltext_query = db_manager._fulltext_query(FULLTEXT_SEARCH_TERM)
+	if fulltext_query:
+		variants.append(('fulltext', FULLTEXT_SEARCH_TERM, fulltext_query))
+	return variants
+
+
+def is_regressed(search_mode, plan):
+	"""依搜尋模式判斷查詢計畫是否退化（見模組說明）"""
+	if search_mode == 'fulltext':
+		return any(table in ('notes', 'n') for table in plan.scanned)
+	return plan.full_scan and plan.filesort
+
+
+def check_plans(page_size=NOTES_PAGE_SIZE):
+	"""
+	檢查每種排序的列表查詢
+	參數:
+		page_size: 每頁筆數（與 get_notes_page 相同，查詢時多取一筆判斷是否還有下一頁）
+	返回: [(排序欄位, 搜尋模式, 說明, QueryPlan), ...]；無法連線時拋出 RuntimeError
+	"""
+	connection = db_manager.get_db_connection()
+	if not connection:
+		raise RuntimeError("無法連接資料庫")
+
+	backend = db_manager.get_backend()
+	results = []
+	try:
+		cursor = connection.cursor()
+		for search_mode, search_term, fulltext_query in search_variants():
+			for sort_by, cursor_value in SAMPLE_CURSOR_VALUES.items():
+				if sort_by == 'relevance' and not fulltext_query:
+					continue
+				for sort_order in ('DESC', 'ASC'):
+					for page, after in (('第一頁', None), ('後續頁', (cursor_value, 1))):
+						query, params = db_manager._build_notes_query(
+							search_term, sort_by, sort_order, after, page_size + 1, fulltext_query=fulltext_query)
+						plan = backend.explain(cursor, query, params)
+						label = f"{SEARCH_LABELS[search_mode]}{sort_by} {sort_order} {page}"
+						results.append((sort_by, search_mode, label, plan))
+		cursor.close()
+	finally:
+		connection.close()
+	return results
+
+
+def main():
+	parser = argparse.ArgumentParser(description="檢查筆記列表查詢是否使用排序索引")
+	parser.add_argument("--page-size", type=int, default=NOTES_PAGE_SIZE, help=f"每頁筆數 (預設: {NOTES_PAGE_SIZE})")
+	parser.add_argument("--verbose", action="store_true", help="列出每個查詢的計畫")
+	args = parser.parse_args()
+	setup_logging()
+
+	print(f"資料庫: {db_manager.get_backend().describe()}")
+	try:
+		results = check_plans(args.page_size)
+	except RuntimeError as e:
+		print(f"❌ {e}")
+		return 1
+
+	backend_name = db_manager.get_backend().name
+	if not any(search_mode == 'fulltext' for _, search_mode, _, _ in results):
+		print("⚠️ 未啟用全文搜尋，略過全文搜尋查詢")
+	failed = 0
+	for sort_by, search_mode, label, plan in results:
+		regressed = is_regressed(search_mode, plan)
+		if regressed and search_mode != 'fulltext' and (backend_name, sort_by) in KNOWN_FILESORTS:
+			print(f"⚠️ {label}（已知需要排序）")
+		else:
+			failed += regressed
+			print(f"{'❌' if regressed else '✅'} {label}")
+		if regressed or args.verbose:
+			for step in plan.steps:
+				print(f"    {step}")
+
+	if failed:
+		print(f"{failed} 個查詢未使用索引，請確認已執行 python migrate.py migrate（排序索引為遷移 004，全文索引為遷移 002）")
+		return 1
+	print("所有列表查詢皆使用排序索引，全文搜尋皆使用全文索引")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,64 @@
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+from config import NOTES_BULK_CHUNK_SIZE
+from log_config import setup_logging
+from note_ingest import ingest_notes, iter_ndjson
+
+
+def _print_progress(processed, summary):
+	end = '\r' if sys.stderr.isatty() else '\n'
+	print(f"已處理 {processed} 筆: 寫入 {summary['inserted']}、無效 {summary['invalid']}、失敗 {summary['failed']}",
+		  end=end, file=sys.stderr, flush=True)
+
+
+def _read_rows(path, fmt):
+	"""依格式逐筆讀取（NDJSON 與 CSV 不會一次載入整個檔案）"""
+	with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+		if fmt == 'json':
+			data = json.load(f)
+			yield from (data.get('notes', []) if isinstance(data, dict) else data)
+		elif fmt == 'csv':
+			yield from csv.DictReader(f)
+		else:
+			yield from iter_ndjson(f)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="批次匯入筆記 (NDJSON / JSON / CSV)")
+	parser.add_argument("path", help="檔案路徑，欄位: stock_code, stock_name, note_type, content, ref, ref_time, created_at")
+	parser.add_argument("--format", choices=["ndjson", "json", "csv"],
+						help="檔案格式 (預設依副檔名判斷，.json 與 .csv 以外視為 NDJSON)")
+	parser.add_argument("--chunk-size", type=int, default=NOTES_BULK_CHUNK_SIZE,
+						help=f"每個交易寫入的筆數 (預設: {NOTES_BULK_CHUNK_SIZE})")
+	parser.add_argument("--quiet", action="store_true", help="不顯示進度")
+	parser.add_argument("--max-errors", type=int, default=20, help="最多列出幾筆無效/失敗的資料 (預設: 20)")
+	args = parser.parse_args()
+	setup_logging()
+
+	path = Path(args.path)
+	if not path.exists():
+		print(f"找不到檔案: {path}")
+		return 1
+	fmt = args.format or {'.json': 'json', '.csv': 'csv'}.get(path.suffix.lower(), 'ndjson')
+
+	progress = None if args.quiet else _print_progress
+	summary = ingest_notes(_read_rows(path, fmt), args.chunk_size, progress)
+	if progress and sys.stderr.isatty():
+		print(file=sys.stderr)
+
+	errors = [result for result in summary['results'] if result['status'] != 'inserted']
+	for result in errors[:args.max_errors]:
+		print(f"第 {result['index'] + 1} 筆 {result['status']}: {result['error']}")
+	if len(errors) > args.max_errors:
+		print(f"... 另有 {len(errors) - args.max_errors} 筆未列出")
+
+	print(f"匯入完成: received={summary['received']}, inserted={summary['inserted']}, invalid={summary['invalid']}, "
+		  f"failed={summary['failed']}, {summary['seconds']} 秒, {summary['rows_per_second']} 筆/秒")
+	return 0 if summary['failed'] == 0 else 1
+
+
+if __name__ == "__main__":
+	exit(main())
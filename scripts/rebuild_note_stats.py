@@ -0,0 +1,29 @@
+"""
+重新計算筆記統計摘要
+由 notes 重新計算 stock_note_stats、stock_ref_stats、ref_stats（單一交易，需掃描整個 notes 表），
+修正不經過應用程式的寫入（直接修改 notes 資料表、從備份還原部分資料等）造成的差異。
+一般的新增/修改/刪除筆記與刪除股票都會同步更新摘要，不需定期執行；資料量大時請在離峰時段執行
+
+用法:
+	PYTHONPATH=. python scripts/rebuild_note_stats.py
+"""
+
+import sys
+import time
+import db_manager
+from log_config import setup_logging
+
+
+def main():
+	setup_logging()
+	print(f"資料庫: {db_manager.get_backend().describe()}")
+	started = time.perf_counter()
+	if not db_manager.rebuild_note_stats():
+		print("❌ 重新計算筆記統計摘要失敗（詳見日誌）")
+		return 1
+	print(f"✅ 已重新計算筆記統計摘要，耗時 {time.perf_counter() - started:.2f} 秒")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -1,20 +1,38 @@
 import argparse
+import sys
 from pathlib import Path
+from config import STOCK_IMPORT_CHUNK_SIZE
 from db_manager import import_stocks_from_csv
+from log_config import setup_logging
+
+
+def _print_progress(processed, result):
+	# 輸出到 stderr，終端機上以同一行更新
+	end = '\r' if sys.stderr.isatty() else '\n'
+	print(f"已讀取 {processed} 筆: 新增 {result.inserted}、更新 {result.updated}、"
+		  f"未變更 {result.unchanged}、略過 {result.skipped}", end=end, file=sys.stderr, flush=True)
 
 
 def main():
 	parser = argparse.ArgumentParser(description="匯入台股清單到資料庫 (CSV)")
 	parser.add_argument("csv", nargs="?", default="data/example_stocks.csv", help="CSV 檔案路徑 (預設: data/example_stocks.csv)")
+	parser.add_argument("--chunk-size", type=int, default=STOCK_IMPORT_CHUNK_SIZE,
+						help=f"每次提交的筆數 (預設: {STOCK_IMPORT_CHUNK_SIZE})")
+	parser.add_argument("--quiet", action="store_true", help="不顯示進度")
 	args = parser.parse_args()
+	setup_logging()
 
 	csv_path = Path(args.csv)
 	if not csv_path.exists():
 		print(f"找不到 CSV 檔案: {csv_path}")
 		return 1
 
-	inserted, updated, skipped = import_stocks_from_csv(str(csv_path))
-	print(f"匯入完成: inserted+updated={inserted}, skipped={skipped}")
+	progress = None if args.quiet else _print_progress
+	result = import_stocks_from_csv(str(csv_path), args.chunk_size, progress)
+	if progress and sys.stderr.isatty():
+		print(file=sys.stderr)
+	print(f"匯入完成: inserted={result.inserted}, updated={result.updated}, "
+		  f"unchanged={result.unchanged}, skipped={result.skipped}")
 	return 0
 
 
@@ -0,0 +1,142 @@
+"""
+相同查詢的請求合併（single-flight）
+多個呼叫端同時以相同的鍵查詢時，只有第一個（leader）實際執行，其他呼叫端等待並共用同一個結果或例外；
+查詢結束後立即移除，之後的呼叫會重新執行（不是快取）
+- do()：多執行緒（Flask / gunicorn gthread worker）
+- ado()：同一個事件迴圈中的 coroutine（ASGI 模式）
+"""
+
+import asyncio
+import functools
+import threading
+
+import metrics
+from config import SINGLEFLIGHT_ENABLED
+
+SINGLEFLIGHT_CALLS = metrics.Counter(
+    'stock_note_singleflight_calls_total', '合併查詢的呼叫次數（executed：實際執行；coalesced：共用進行中的結果）',
+    ('name', 'outcome'))
+
+# 所有已建立的群組（供 /health 輸出統計）
+_groups = {}
+
+
+class _Call:
+    """進行中的查詢"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    參數:
+        name: 群組名稱（指標標籤）
+        version: 返回資料版本的函式（例如筆記快取世代）；版本納入鍵中，
+                 寫入後開始的呼叫不會共用寫入前就已開始的查詢結果
+        enabled: 是否啟用；停用時每次呼叫都直接執行
+    """
+
+    def __init__(self, name, version=None, enabled=SINGLEFLIGHT_ENABLED):
+        self.name = name
+        self.version = version
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = {}
+        _groups[name] = self
+
+    def _full_key(self, key):
+        return (self.version(), key) if self.version is not None else key
+
+    def do(self, key, fn):
+        """
+        執行 fn()，相同鍵的呼叫同時進行時共用同一次執行
+        參數:
+            key: 查詢鍵（需可雜湊）
+            fn: 實際查詢的函式
+        返回: fn() 的結果（與其他呼叫端共用，不可修改）；fn() 拋出例外時所有等待者都會收到同一個例外
+        """
+        if not self.enabled:
+            return fn()
+
+        key = self._full_key(key)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            SINGLEFLIGHT_CALLS.inc(name=self.name, outcome='coalesced')
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        SINGLEFLIGHT_CALLS.inc(name=self.name, outcome='executed')
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key, fn):
+        """
+        do() 的非同步版本
+        參數:
+            key: 查詢鍵（需可雜湊）
+            fn: 返回 coroutine 的函式
+        返回: 查詢結果（與其他呼叫端共用，不可修改）
+        注意: 查詢在獨立的 task 中執行，發起的呼叫端被取消（例如客戶端斷線）時，其他等待者仍會取得結果
+        """
+        if not self.enabled:
+            return await fn()
+
+        loop = asyncio.get_running_loop()
+        # task 只能在建立它的事件迴圈中等待
+        key = (loop, self._full_key(key))
+        task = self._tasks.get(key)
+        if task is None:
+            SINGLEFLIGHT_CALLS.inc(name=self.name, outcome='executed')
+            task = self._tasks[key] = loop.create_task(fn())
+            task.add_done_callback(functools.partial(self._task_done, key))
+        else:
+            SINGLEFLIGHT_CALLS.inc(name=self.name, outcome='coalesced')
+        return await asyncio.shield(task)
+
+    def _task_done(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    def coalesce(self, func):
+        """裝飾器：以函式參數為鍵合併同時進行的相同呼叫（同步函式）"""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = args + tuple(sorted(kwargs.items()))
+            return self.do(key, lambda: func(*args, **kwargs))
+        return wrapper
+
+    def stats(self):
+        executed = SINGLEFLIGHT_CALLS.value(name=self.name, outcome='executed')
+        coalesced = SINGLEFLIGHT_CALLS.value(name=self.name, outcome='coalesced')
+        return {
+            'enabled': self.enabled,
+            'executed': executed,
+            'coalesced': coalesced,
+            'in_flight': len(self._calls) + len(self._tasks),
+        }
+
+
+def stats():
+    """各群組的統計 {群組名稱: {enabled, executed, coalesced, in_flight}}"""
+    return {name: group.stats() for name, group in sorted(_groups.items())}
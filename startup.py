@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+部署啟動任務
+測試資料庫連接、初始化常用股票資料、清除過期的刪除紀錄並更新查詢統計資料，每次部署只需執行一次：
+- 開發模式：python app.py 啟動前呼叫
+- 生產模式：由 gunicorn.conf.py 的 on_starting 在 master 啟動時執行（不會在每個 worker 重複執行）
+也可以單獨執行：python startup.py
+"""
+
+import logging
+import sys
+
+import db_manager
+from log_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def run_startup_tasks():
+    """
+    執行一次性的啟動任務（進度經由 logging 輸出，gunicorn/uvicorn 下與其他日誌使用相同的 handler）
+    返回: 布爾值，表示數據庫連接是否成功
+    """
+    logger.info("啟動股票筆記管理系統...")
+    if not db_manager.test_connection():
+        logger.error("數據庫連接失敗")
+        return False
+
+    logger.info("數據庫連接成功")
+    if db_manager.init_common_stocks():
+        logger.info("股票資料初始化完成")
+    else:
+        logger.error("股票資料初始化失敗")
+    purged = db_manager.purge_note_deletions()
+    if purged:
+        logger.info("已清除 %d 筆過期的筆記刪除紀錄", purged)
+    if db_manager.update_statistics():
+        logger.info("已更新查詢統計資料")
+    return True
+
+
+if __name__ == '__main__':
+    setup_logging()
+    sys.exit(0 if run_startup_tasks() else 1)
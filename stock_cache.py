@@ -0,0 +1,189 @@
+"""
+行程內股票目錄快取
+台股股票清單只有數千筆且很少變動，載入記憶體後可直接在本地完成股票搜尋，
+排序規則與 db_manager.search_stocks 的 SQL CASE 排序一致：
+    1. 代號完全相符
+    2. 名稱完全相符
+    3. 代號開頭相符
+    4. 名稱開頭相符
+    5. 名稱包含關鍵字
+同一排名內依股票代號排序
+"""
+
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+
+
+class StockDirectory:
+    """股票目錄：排序的代號陣列、排序的名稱陣列（前綴搜尋）與字元索引（包含搜尋）"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._stocks = {}       # stock_code -> (stock_name, industry)
+        self._codes = []        # 排序的 (小寫代號, 代號)
+        self._names = []        # 排序的 (小寫名稱, 代號)
+        self._char_index = {}   # 名稱中的字元 -> 代號集合
+        self._code_order = None # 代號 -> 在 _codes 中的位置（同排名內排序用，新增股票後重建）
+        self.loaded_at = None
+
+    def __len__(self):
+        return len(self._stocks)
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    def age(self):
+        """距離上次完整載入的秒數，尚未載入時返回 None"""
+        if self.loaded_at is None:
+            return None
+        return time.monotonic() - self.loaded_at
+
+    def load(self, rows):
+        """
+        以完整股票清單重建索引
+        參數: rows - 可迭代，元素為 (stock_code, stock_name, industry)
+        """
+        stocks = {}
+        for code, name, industry in rows:
+            stocks[code] = (name, industry)
+
+        codes = sorted((code.lower(), code) for code in stocks)
+        names = sorted((name.lower(), code) for code, (name, _) in stocks.items())
+        char_index = {}
+        for code, (name, _) in stocks.items():
+            for char in set(name.lower()):
+                char_index.setdefault(char, set()).add(code)
+
+        with self._lock:
+            self._stocks = stocks
+            self._codes = codes
+            self._names = names
+            self._char_index = char_index
+            self._code_order = None
+            self.loaded_at = time.monotonic()
+
+    def upsert(self, stock_code, stock_name, industry=None):
+        """
+        新增或更新單一股票（industry 為 None 時保留原有產業別，與匯入的 COALESCE 行為一致）
+        """
+        with self._lock:
+            existing = self._stocks.get(stock_code)
+            if existing is not None:
+                old_name, old_industry = existing
+                if industry is None:
+                    industry = old_industry
+                if old_name != stock_name:
+                    self._remove_name(stock_code, old_name)
+                    self._add_name(stock_code, stock_name)
+            else:
+                insort(self._codes, (stock_code.lower(), stock_code))
+                self._code_order = None
+                self._add_name(stock_code, stock_name)
+            self._stocks[stock_code] = (stock_name, industry)
+
+    def _add_name(self, code, name):
+        insort(self._names, (name.lower(), code))
+        for char in set(name.lower()):
+            self._char_index.setdefault(char, set()).add(code)
+
+    def _remove_name(self, code, name):
+        entry = (name.lower(), code)
+        pos = bisect_left(self._names, entry)
+        if pos < len(self._names) and self._names[pos] == entry:
+            del self._names[pos]
+        for char in set(name.lower()):
+            codes = self._char_index.get(char)
+            if codes is not None:
+                codes.discard(code)
+
+    def get(self, stock_code):
+        """
+        根據股票代號獲取股票信息
+        返回: 股票信息字典，不存在時返回 None
+        """
+        with self._lock:
+            stock = self._stocks.get(stock_code)
+        if stock is None:
+            return None
+        return {'stock_code': stock_code, 'stock_name': stock[0], 'industry': stock[1]}
+
+    def search(self, query, limit=10):
+        """
+        搜尋股票（按代號或名稱模糊搜尋）
+        參數:
+            query: 搜尋關鍵字
+            limit: 返回結果數量限制
+        返回: 股票列表，格式與 db_manager.search_stocks 相同
+        """
+        q = query.lower()
+        with self._lock:
+            if self._code_order is None:
+                self._code_order = {code: pos for pos, (_, code) in enumerate(self._codes)}
+            order = self._code_order.__getitem__
+
+            code_prefix = self._prefix_range(self._codes, q)   # 已依代號排序
+            name_prefix = self._prefix_range(self._names, q)
+
+            # 依排名分層收集，前面的層級已足夠時不再處理後面的層級
+            tiers = [
+                lambda: [code for code_lower, code in code_prefix if code_lower == q],                    # 1. 代號完全相符
+                lambda: [code for name_lower, code in name_prefix if name_lower == q],                    # 2. 名稱完全相符
+                None,                                                                                     # 3. 代號開頭相符
+                lambda: [code for _, code in name_prefix],                                                # 4. 名稱開頭相符
+                lambda: self._name_contains(q),                                                           # 5. 名稱包含關鍵字
+            ]
+
+            results = []
+            seen = set()
+            for tier in tiers:
+                need = limit - len(results)
+                if need <= 0:
+                    break
+                if tier is None:
+                    # 代號範圍本身已排序，依序取用即可
+                    for _, code in code_prefix:
+                        if len(results) >= limit:
+                            break
+                        if code not in seen:
+                            seen.add(code)
+                            results.append(code)
+                    continue
+                codes = [code for code in tier() if code not in seen]
+                for code in heapq.nsmallest(need, codes, key=order):
+                    seen.add(code)
+                    results.append(code)
+
+            return [
+                {'stock_code': code, 'stock_name': self._stocks[code][0], 'industry': self._stocks[code][1]}
+                for code in results
+            ]
+
+    @staticmethod
+    def _prefix_range(entries, q):
+        """排序的 (小寫鍵, 代號) 陣列中，鍵以 q 開頭的區段"""
+        lo = bisect_left(entries, (q,))
+        hi = bisect_left(entries, (q + '\U0010ffff',))
+        return entries[lo:hi]
+
+    def _name_contains(self, q):
+        """名稱包含 q 的股票：先以字元索引縮小範圍再逐一確認"""
+        if not q:
+            return list(self._stocks)
+        char_sets = sorted((self._char_index.get(char, set()) for char in set(q)), key=len)
+        matched = set(char_sets[0]).intersection(*char_sets[1:])
+        return [code for code in matched if q in self._stocks[code][0].lower()]
+
+    def stats(self):
+        """返回快取統計資料"""
+        age = self.age()
+        return {
+            'size': len(self._stocks),
+            'age_seconds': round(age, 1) if age is not None else None,
+        }
+
+
+# 行程內共用的股票目錄
+stock_directory = StockDirectory()
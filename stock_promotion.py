@@ -0,0 +1,169 @@
+"""
+Yahoo 搜尋結果寫回本地 stocks 表
+/search-stocks 退回 Yahoo 查到的股票會放入有上限的佇列，
+由背景執行緒批次寫入資料庫（不佔用請求執行緒），之後本地搜尋即可直接命中
+只新增資料庫中不存在的股票，既有股票的名稱與產業別不會被 Yahoo 的結果覆寫
+行程結束前（gunicorn worker_exit、ASGI lifespan、atexit）呼叫 close() 寫入佇列中剩餘的股票
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+import db_manager
+from config import STOCK_PROMOTION_CONFIG
+from stock_cache import stock_directory
+from ttl_cache import TTLCache, MISSING
+
+logger = logging.getLogger(__name__)
+
+
+class StockPromoter:
+    """
+    參數:
+        import_rows: 批次寫入函式，接收 [{stock_code, stock_name}, ...]，返回 StockImportResult
+        queue_size: 佇列上限，已滿時丟棄新的股票
+        batch_size: 每批最多寫入筆數
+        flush_interval: 湊批最長等待秒數
+        dedupe_ttl: 同一代號在此秒數內不重複排入佇列
+    """
+
+    def __init__(self, import_rows, queue_size=1000, batch_size=200, flush_interval=1.0, dedupe_ttl=3600):
+        self._import_rows = import_rows
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._recent = TTLCache(maxsize=queue_size * 10, ttl=dedupe_ttl)
+        self._lock = threading.Lock()
+        self._queue = None
+        self._worker = None
+        self._pid = None
+        self._closed = False
+        self._stats = {
+            'queued': 0,
+            'skipped': 0,
+            'dropped': 0,
+            'written': 0,
+            'failed_batches': 0,
+        }
+
+    def submit(self, stocks):
+        """
+        將 Yahoo 搜尋結果排入寫回佇列（不會阻塞）
+        參數: stocks - [{code, name}, ...]
+        返回: 實際排入佇列的筆數
+        """
+        if self._closed:
+            self._count('dropped', len(stocks))
+            return 0
+
+        work_queue = self._ensure_worker()
+        queued = 0
+        for stock in stocks:
+            code = (stock.get('code') or '').strip()
+            name = (stock.get('name') or '').strip()[:50]
+
+            # 目錄中已有的股票與近期已排入的不再排入（只是減少寫入，目錄過期時由 import_rows 保證不覆寫）
+            if (not code or not name or len(code) > 10
+                    or stock_directory.get(code) is not None
+                    or self._recent.get(code) is not MISSING):
+                self._count('skipped')
+                continue
+
+            try:
+                work_queue.put_nowait({'stock_code': code, 'stock_name': name})
+            except queue.Full:
+                self._count('dropped')
+                continue
+            self._recent.set(code, True)
+            self._count('queued')
+            queued += 1
+        return queued
+
+    def _ensure_worker(self):
+        """延遲啟動背景執行緒（fork 後的子行程會建立自己的佇列與執行緒）"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(maxsize=self.queue_size)
+                    self._worker = threading.Thread(target=self._run, name='stock-promoter', daemon=True)
+                    self._worker.start()
+                    self._pid = os.getpid()
+        return self._queue
+
+    def _run(self):
+        work_queue = self._queue
+        while True:
+            items = [work_queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            # None 是 close() 放入的喚醒標記（排在所有股票之後），取到時立即寫入，不再等待湊批
+            while len(items) < self.batch_size and items[-1] is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(work_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            batch = [item for item in items if item is not None]
+            try:
+                if batch:
+                    result = self._import_rows(batch)
+                    self._count('written', result.inserted + result.updated)
+                    logger.info("已將 %d 筆 Yahoo 搜尋結果寫入股票資料表", result.inserted + result.updated)
+            except Exception as e:
+                self._count('failed_batches')
+                logger.error("寫入 Yahoo 搜尋結果時發生錯誤: %s", e)
+            finally:
+                for _ in items:
+                    work_queue.task_done()
+
+    def flush(self):
+        """等待佇列中的股票全部寫入（供測試與關閉前使用）"""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def close(self, timeout=5.0):
+        """
+        停止接受新的股票，並等待佇列中的股票寫入（最多 timeout 秒）
+        返回: 是否已全部寫入
+        """
+        self._closed = True
+        if self._pid != os.getpid():
+            return True
+
+        work_queue = self._queue
+        try:
+            work_queue.put_nowait(None)
+        except queue.Full:
+            pass  # 佇列已滿時背景執行緒不會在等待湊批
+
+        deadline = time.monotonic() + timeout
+        with work_queue.all_tasks_done:
+            while work_queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning("關閉時仍有 %d 筆 Yahoo 搜尋結果未寫入", work_queue.unfinished_tasks)
+                    return False
+                work_queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def stats(self):
+        """返回寫回佇列統計資料"""
+        with self._lock:
+            data = dict(self._stats)
+        data['pending'] = self._queue.qsize() if self._pid == os.getpid() else 0
+        return data
+
+
+# 行程內共用的寫回佇列
+promoter = StockPromoter(db_manager.insert_missing_stocks, **STOCK_PROMOTION_CONFIG)
+atexit.register(promoter.close)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+pytest 共用 fixture
+- sqlite_db：以暫存的 SQLite 資料庫取代目前的資料庫後端（不需 MySQL 伺服器），測試結束後還原並清空股票目錄
+- stock_db：同 sqlite_db，並預先建立常用股票（股票目錄仍是空的）
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import db_manager
+from db_backends import SQLiteBackend
+from stock_cache import stock_directory
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    """
+    每個測試使用一個新的空白 SQLite 資料庫
+    返回: 暫存目錄路徑（測試可在其中建立其他檔案）
+    """
+    original_backend = db_manager.get_backend()
+    db_manager.use_backend(SQLiteBackend(os.path.join(tmp_path, 'stock_note.db')))
+    stock_directory.load([])
+    try:
+        yield str(tmp_path)
+    finally:
+        db_manager.use_backend(original_backend)
+        stock_directory.load([])
+
+
+@pytest.fixture
+def stock_db(sqlite_db):
+    """已建立常用股票的 sqlite_db（新增股票時會一併寫入股票目錄，之後清空目錄，需要的測試自行載入）"""
+    db_manager.init_common_stocks()
+    stock_directory.load([])
+    return sqlite_db
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ASGI 模式測試腳本
+以暫存的 SQLite 資料庫與假的 Yahoo 搜尋伺服器測試非同步 JSON API：
+回應與 Flask 路由相同、ETag/304、Yahoo 並行查詢與總時限，以及其餘路由仍由 Flask 處理
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import time
+
+import pytest
+from starlette.testclient import TestClient
+
+import db_manager
+import external_api
+from app import app
+from asgi import application
+from test_external_api_fanout import FakeYahooServer
+from test_notes_cache import settle_writes
+
+
+@pytest.fixture(autouse=True)
+def _database(stock_db):
+    db_manager.load_stock_directory()
+
+
+def test_notes_api_matches_flask():
+    for i in range(5):
+        db_manager.add_note('2330', '台積電', 'TAG', f'標籤{i}')
+    settle_writes()
+    flask_client = app.test_client()
+
+    with TestClient(application) as client:
+        response = client.get('/api/notes?limit=2&sort_by=stock_code')
+        assert response.status_code == 200
+        data = response.json()
+        assert data == flask_client.get('/api/notes?limit=2&sort_by=stock_code').get_json()
+        assert data['has_more'] and len(data['notes']) == 2
+        columns = client.get('/api/notes?limit=2&sort_by=stock_code&format=columns').json()
+        assert columns == flask_client.get('/api/notes?limit=2&sort_by=stock_code&format=columns').get_json()
+        assert [dict(zip(columns['columns'], row)) for row in columns['rows']] == data['notes']
+
+        second = client.get('/api/notes', params={'limit': 2, 'sort_by': 'stock_code', 'after': data['next_cursor']})
+        assert [n['content'] for n in second.json()['notes']] == ['標籤2', '標籤1']
+
+        # ETag 與 Flask 路由相同，資料未變更時返回 304
+        etag = response.headers['ETag']
+        assert response.headers['Cache-Control'] == 'no-cache'
+        response = client.get('/api/notes?limit=2&sort_by=stock_code', headers={'If-None-Match': etag})
+        assert response.status_code == 304 and response.content == b''
+        assert flask_client.get('/api/notes?limit=2&sort_by=stock_code',
+                                headers={'If-None-Match': etag}).status_code == 304
+
+        response = client.get('/api/notes?after=abc')
+        assert response.status_code == 400 and response.json()['error'] == '無效的分頁游標'
+
+
+def test_note_and_stock_info():
+    note = db_manager.add_note('2317', '鴻海', 'STORY', 'AI伺服器')
+
+    with TestClient(application) as client:
+        response = client.get(f"/api/notes/{note['id']}")
+        assert response.status_code == 200
+        expected = db_manager.format_note_times(dict(db_manager.get_note_by_id(note['id'])), ('updated_at',))
+        assert response.json()['note'] == expected
+        assert client.get(f"/api/notes/{note['id']}",
+                          headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+        assert client.get(f"/api/notes/{note['id']}",
+                          headers={'If-Modified-Since': response.headers['Last-Modified']}).status_code == 304
+        assert client.get('/api/notes/999999').status_code == 404
+
+        assert client.get('/get-stock-info?code=2317').json() == {'code': '2317', 'name': '鴻海', 'industry': None}
+        assert client.get('/get-stock-info?code=0000').json() == {'error': '找不到該股票'}
+
+
+def test_search_stocks_falls_back_to_yahoo():
+    routes = {('/primary', '晶圓'): (0.2, 200, ['2330', '5347'])}
+    with FakeYahooServer(routes), TestClient(application) as client:
+        assert client.get('/search-stocks?q=台積').json()[0]['code'] == '2330'
+
+        results = client.get('/search-stocks?q=晶圓').json()
+        assert [r['display'] for r in results] == ['2330 - 股票2330', '5347 - 股票5347']
+
+        # 總時限到期時以已完成的結果返回，並取消其餘請求
+        external_api.YAHOO_SEARCH_DEADLINE = 0.3
+        routes[('/primary', '慢')] = (3, 200, ['1111'])
+        started = time.monotonic()
+        assert client.get('/search-stocks?q=慢').json() == []
+        assert time.monotonic() - started < 1.5
+
+
+def test_concurrent_yahoo_searches_do_not_need_threads():
+    routes = {('/primary', f'股{i}'): (0.5, 200, [str(1000 + i)]) for i in range(20)}
+
+    async def search_all():
+        try:
+            return await asyncio.gather(*(external_api.search_yahoo_stocks_async(f'股{i}') for i in range(20)))
+        finally:
+            await external_api.yahoo_client.aclose()
+
+    with FakeYahooServer(routes):
+        external_api.yahoo_client = external_api.YahooClient(pool_maxsize=30)
+        started = time.monotonic()
+        results = asyncio.run(search_all())
+        elapsed = time.monotonic() - started
+
+    assert [r[0]['code'] for r in results] == [str(1000 + i) for i in range(20)]
+    assert elapsed < 1.5, f"20 個 0.5 秒的搜尋應在同一個事件迴圈中並行完成，實際耗時 {elapsed:.2f} 秒"
+
+
+def test_other_routes_are_served_by_flask():
+    db_manager.add_note('2330', '台積電', 'TAG', 'CoWoS')
+
+    with TestClient(application) as client:
+        response = client.get('/')
+        assert response.status_code == 200 and 'CoWoS' in response.text
+        assert client.get('/health').json()['database_backend'] == 'sqlite'
+
+        response = client.post('/api/notes/bulk', json={'notes': [
+            {'stock_code': '2317', 'note_type': 'TAG', 'content': '電動車'},
+        ]})
+        assert response.json()['inserted'] == 1
+        # 透過 Flask 寫入後，非同步路由的快取同樣失效
+        assert client.get('/api/notes').json()['total'] == 2
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-v']))
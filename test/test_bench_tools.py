@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+效能測試工具測試腳本
+測試百分位數、結果摘要、結果比較與資料集的可重現性，不需連線到資料庫
+"""
+
+import sys
+import os
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+sys.path.append(os.path.join(ROOT_DIR, 'bench'))
+
+from measure import percentile, run_load
+from compare import compare
+from dataset import generate_stocks, generate_notes
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) is None
+
+
+def test_run_load_counts_errors_and_calls():
+    calls = []
+
+    def call(value):
+        calls.append(value)
+        if value % 10 == 0:
+            return False
+        if value == 7:
+            raise RuntimeError('boom')
+        return True
+
+    result = run_load(call, [(i,) for i in range(1, 51)], concurrency=4, warmup=5)
+    assert len(calls) == 50
+    assert result['count'] == 45
+    assert result['errors'] == 6  # 7（拋出例外）與 10, 20, 30, 40, 50
+    assert result['p50_ms'] <= result['p95_ms'] <= result['p99_ms'] <= result['max_ms']
+
+
+def test_compare_flags_regressions():
+    base = {'results': {'a': {'p95_ms': 10.0}, 'b': {'p95_ms': 10.0}, 'c': {'p95_ms': 10.0}}}
+    new = {'results': {'a': {'p95_ms': 12.0}, 'b': {'p95_ms': 10.5}, 'd': {'p95_ms': 1.0}}}
+    rows, regressed = compare(base, new, threshold=10)
+    statuses = {row[0]: row[4] for row in rows}
+    assert regressed
+    assert statuses == {'a': 'slower', 'b': 'same', 'c': 'missing', 'd': 'missing'}
+
+    _, regressed = compare(base, base)
+    assert not regressed
+
+
+def test_dataset_is_reproducible():
+    stocks = generate_stocks(300, seed=7)
+    assert stocks == generate_stocks(300, seed=7)
+    assert len({stock['stock_code'] for stock in stocks}) == 300
+    assert len({stock['stock_name'] for stock in stocks}) == 300
+
+    notes = list(generate_notes(stocks, 200, seed=7))
+    assert len(notes) == 200
+    assert [note[:4] for note in notes] == [note[:4] for note in generate_notes(stocks, 200, seed=7)]
+    assert {note[1] for note in notes} == {'TAG', 'STORY'}
+    created = [note[5] for note in notes]
+    assert created == sorted(created)
+
+
+if __name__ == "__main__":
+    tests = [
+        test_percentile_nearest_rank,
+        test_run_load_counts_errors_and_calls,
+        test_compare_flags_regressions,
+        test_dataset_is_reproducible,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+資料庫連線池測試腳本
+以假的連線測試借用逾時、閒置與最長使用時間回收、借出前健康檢查、損壞與未歸還連線的處理，
+以及 fork 後子行程重新建立連線池，不需 MySQL 伺服器
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import time
+
+import db_manager
+import db_pool
+from db_pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    """模擬 mysql-connector 連線：alive 為 False 時健康檢查失敗，broken 為 True 時 rollback 拋出例外"""
+
+    def __init__(self, number):
+        self.number = number
+        self.alive = True
+        self.broken = False
+        self.closed = False
+        self.in_transaction = False
+
+    def is_connected(self):
+        if self.broken:
+            raise OSError('連線已中斷')
+        return self.alive
+
+    def rollback(self):
+        if self.broken:
+            raise OSError('連線已中斷')
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnector:
+    """建立 FakeConnection 並保留所有建立過的連線"""
+
+    def __init__(self):
+        self.connections = []
+
+    def __call__(self):
+        connection = FakeConnection(len(self.connections) + 1)
+        self.connections.append(connection)
+        return connection
+
+
+class FakeClock:
+    """取代 db_pool 使用的 time 模組，手動推進時間"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def _with_clock(test):
+    """以 FakeClock 執行測試，結束後還原 time 模組"""
+    def wrapper():
+        clock = FakeClock()
+        original, db_pool.time = db_pool.time, clock
+        try:
+            test(clock)
+        finally:
+            db_pool.time = original
+    wrapper.__name__ = test.__name__
+    return wrapper
+
+
+def test_checkout_timeout_and_waiting():
+    connector = FakeConnector()
+    pool = ConnectionPool(connector, size=1, checkout_timeout=0.05)
+    first = pool.acquire()
+
+    started = time.monotonic()
+    try:
+        pool.acquire()
+        assert False, "連線用盡時應逾時"
+    except PoolTimeoutError:
+        pass
+    assert time.monotonic() - started >= 0.05
+    assert pool.stats()['timeouts'] == 1
+
+    # 等待中的執行緒在連線歸還後取得同一條連線
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(pool.acquire(timeout=2)))
+    waiter.start()
+    time.sleep(0.05)
+    first.close()
+    waiter.join()
+    assert results[0]._raw is connector.connections[0]
+    assert len(connector.connections) == 1
+
+    stats = pool.stats()
+    assert stats['waits'] == 2
+    assert stats['open'] == 1 and stats['in_use'] == 1 and stats['idle'] == 0
+
+
+@_with_clock
+def test_idle_eviction(clock):
+    connector = FakeConnector()
+    pool = ConnectionPool(connector, size=2, max_idle=10, health_check_interval=1000)
+    pool.acquire().close()
+
+    clock.advance(5)
+    connection = pool.acquire()
+    assert connection._raw is connector.connections[0]
+    connection.close()
+
+    # 閒置超過 max_idle：關閉舊連線並建立新連線
+    clock.advance(11)
+    connection = pool.acquire()
+    assert connection._raw is connector.connections[1]
+    assert connector.connections[0].closed
+    connection.close()
+
+    stats = pool.stats()
+    assert stats['evicted_idle'] == 1
+    assert stats['open'] == 1 and stats['idle'] == 1
+
+
+@_with_clock
+def test_max_lifetime_eviction(clock):
+    connector = FakeConnector()
+    pool = ConnectionPool(connector, size=2, max_idle=None, max_lifetime=100, health_check_interval=1000)
+
+    connection = pool.acquire()
+    clock.advance(50)
+    connection.close()
+
+    # 閒置中超過最長使用時間：借出時改用新連線
+    clock.advance(60)
+    connection = pool.acquire()
+    assert connection._raw is connector.connections[1]
+    assert connector.connections[0].closed
+
+    # 借出中超過最長使用時間：歸還時直接關閉，不放回連線池
+    clock.advance(101)
+    connection.close()
+    assert connector.connections[1].closed
+
+    stats = pool.stats()
+    assert stats['evicted_lifetime'] == 2
+    assert stats['open'] == 0 and stats['in_use'] == 0 and stats['idle'] == 0
+
+    # 未設定 max_lifetime 時不限
+    pool = ConnectionPool(connector, size=1, max_idle=None, health_check_interval=1000)
+    pool.acquire().close()
+    clock.advance(10 ** 6)
+    assert pool.acquire()._raw is connector.connections[2]
+
+
+@_with_clock
+def test_health_check_on_checkout(clock):
+    connector = FakeConnector()
+    pool = ConnectionPool(connector, size=2, max_idle=None, health_check_interval=30)
+    pool.acquire().close()
+
+    # 閒置未超過 health_check_interval：不檢查，直接借出
+    connector.connections[0].alive = False
+    clock.advance(10)
+    connection = pool.acquire()
+    assert connection._raw is connector.connections[0]
+    connection.close()
+
+    # 閒置超過 health_check_interval：檢查失敗的連線作廢，改用新連線
+    clock.advance(31)
+    connection = pool.acquire()
+    assert connection._raw is connector.connections[1]
+    assert connector.connections[0].closed
+    connection.close()
+
+    # 健康檢查本身拋出例外同樣視為失敗
+    connector.connections[1].broken = True
+    clock.advance(31)
+    assert pool.acquire()._raw is connector.connections[2]
+
+    stats = pool.stats()
+    assert stats['failed_health_checks'] == 2
+    assert stats['open'] == 1 and stats['in_use'] == 1
+
+
+def test_broken_connections_are_not_returned():
+    connector = FakeConnector()
+    pool = ConnectionPool(connector, size=2)
+
+    # 歸還時仍在交易中：先回滾，成功的話放回連線池
+    connection = pool.acquire()
+    connection._raw.in_transaction = True
+    connection.close()
+    assert pool.stats()['idle'] == 1 and not connector.connections[0].in_transaction
+
+    # 回滾失敗（連線已損壞）：關閉而不放回連線池
+    connection = pool.acquire()
+    raw = connection._raw
+    raw.in_transaction = True
+    raw.broken = True
+    connection.close()
+    assert raw.closed
+    stats = pool.stats()
+    assert stats['open'] == 0 and stats['in_use'] == 0 and stats['idle'] == 0
+
+    # 明確回滾失敗時作廢連線，之後不能再使用
+    connection = pool.acquire()
+    raw = connection._raw
+    raw.broken = True
+    connection.rollback()
+    assert raw.closed and not connection.is_connected()
+    try:
+        connection.cursor
+        assert False, "作廢的連線不應再能使用"
+    except AttributeError:
+        pass
+    connection.close()  # 重複歸還不影響計數
+    assert pool.stats()['open'] == 0
+
+    # 建立連線失敗時釋放名額
+    def failing_connect():
+        raise OSError('無法連線')
+
+    pool = ConnectionPool(failing_connect, size=1, checkout_timeout=0.05)
+    for _ in range(2):
+        try:
+            pool.acquire()
+            assert False, "建立連線失敗時應拋出例外"
+        except OSError:
+            pass
+    assert pool.stats()['open'] == 0 and pool.stats()['in_use'] == 0
+
+
+def test_unreturned_connections_free_their_slot():
+    connector = FakeConnector()
+    pool = ConnectionPool(connector, size=1, checkout_timeout=0.05)
+
+    # with 陳述式離開時歸還（包含發生例外時）
+    try:
+        with pool.acquire() as connection:
+            assert connection.is_connected()
+            raise ValueError('查詢失敗')
+    except ValueError:
+        pass
+    assert not connection.is_connected()
+    assert pool.stats()['idle'] == 1 and pool.stats()['in_use'] == 0
+
+    # 呼叫端在例外路徑中遺漏 close()：代理物件被回收後名額仍可再借出
+    def leaky_query():
+        connection = pool.acquire()
+        connection._raw.in_transaction = True
+        raise ValueError('查詢失敗')
+
+    try:
+        leaky_query()
+    except ValueError:
+        pass
+    connection = pool.acquire()
+    # 遺漏歸還的實體連線可能仍在交易中，關閉而不重用
+    assert connection._raw is connector.connections[1]
+    assert connector.connections[0].closed
+    connection.close()
+
+    stats = pool.stats()
+    assert stats['leaked'] == 1
+    assert stats['open'] == 1 and stats['in_use'] == 0 and stats['idle'] == 1
+
+
+def test_pool_is_recreated_after_fork():
+    connector = FakeConnector()
+    original_connect = db_manager._open_connection
+    db_manager.close_pool()
+    db_manager._open_connection = connector
+    try:
+        inherited = db_manager.get_pool()
+        db_manager.get_db_connection().close()
+        assert db_manager.get_pool_stats()['idle'] == 1
+
+        # 模擬 fork：連線池屬於父行程，子行程改建自己的連線池
+        inherited.pid = -1
+        assert db_manager.get_pool_stats() is None
+        pool = db_manager.get_pool()
+        assert pool is not inherited and pool.pid == os.getpid()
+        connection = db_manager.get_db_connection()
+        assert connection._pool is pool
+        assert connection._raw is connector.connections[1]
+        connection.close()
+
+        # 不關閉父行程的連線（與父行程共用同一個 socket）
+        inherited_stats = inherited.stats()
+        assert inherited_stats['closed'] == 0 and inherited_stats['idle'] == 1
+        assert not connector.connections[0].closed
+
+        pool.pid = -1
+        db_manager.close_pool()
+        assert pool.stats()['closed'] == 0
+    finally:
+        db_manager._open_connection = original_connect
+        db_manager.close_pool()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_checkout_timeout_and_waiting,
+        test_idle_eviction,
+        test_max_lifetime_eviction,
+        test_health_check_on_checkout,
+        test_broken_connections_are_not_returned,
+        test_unreturned_connections_free_their_slot,
+        test_pool_is_recreated_after_fork,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Yahoo 搜尋快取測試腳本
+以替換 external_api._http_get 的方式模擬 HTTP 層，不需連線到 Yahoo
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import external_api
+
+_original_http_get = external_api._http_get
+
+
+class FakeResponse:
+    """模擬 requests.Response"""
+
+    def __init__(self, status_code=200, payload=None):
+        self.status_code = status_code
+        self._payload = payload or {}
+
+    def json(self):
+        return self._payload
+
+
+class FakeYahoo:
+    """記錄呼叫次數並返回預設回應的 HTTP 層"""
+
+    def __init__(self, quotes=None, status_code=200):
+        self.quotes = quotes or []
+        self.status_code = status_code
+        self.calls = 0
+
+    def __call__(self, url, params):
+        self.calls += 1
+        return FakeResponse(self.status_code, {'quotes': self.quotes})
+
+
+def _install(fake):
+    external_api.clear_cache()
+    external_api._http_get = fake
+    return fake
+
+
+def teardown_function(function):
+    """還原真實的 HTTP 層"""
+    external_api._http_get = _original_http_get
+    external_api.clear_cache()
+
+
+def test_repeat_lookup_is_served_from_cache():
+    fake = _install(FakeYahoo([{'symbol': '2330.TW', 'longname': '台積電'}]))
+
+    first = external_api.search_yahoo_stocks('台積電')
+    calls_after_first = fake.calls
+    second = external_api.search_yahoo_stocks('  台積電 ')
+
+    assert first == [{'code': '2330', 'name': '台積電'}]
+    assert second == first
+    assert fake.calls == calls_after_first, "重複查詢不應再呼叫 HTTP"
+    assert external_api.get_cache_stats()['hits'] == 1
+
+
+def test_empty_result_is_negatively_cached():
+    fake = _install(FakeYahoo([{'symbol': 'AAPL', 'shortname': 'Apple Inc.', 'exchange': 'NMS'}]))
+
+    assert external_api.search_yahoo_stocks('apple') == []
+    calls_after_first = fake.calls
+    assert external_api.search_yahoo_stocks('APPLE') == []
+    assert fake.calls == calls_after_first, "空結果應被負快取"
+
+
+def test_failed_requests_are_not_cached():
+    fake = _install(FakeYahoo(status_code=503))
+
+    assert external_api.search_yahoo_stocks('聯發科') == []
+    calls_after_first = fake.calls
+    assert external_api.search_yahoo_stocks('聯發科') == []
+    assert fake.calls > calls_after_first, "請求全部失敗時不應快取"
+
+
+def test_lru_eviction():
+    fake = _install(FakeYahoo([{'symbol': '2317.TW', 'longname': '鴻海'}]))
+    maxsize = external_api._search_cache.maxsize
+
+    for i in range(maxsize + 1):
+        external_api.search_yahoo_stocks(f"查詢{i}")
+
+    stats = external_api.get_cache_stats()
+    assert stats['size'] == maxsize
+    assert stats['evictions'] == 1
+
+
+if __name__ == "__main__":
+    tests = [
+        test_repeat_lookup_is_served_from_cache,
+        test_empty_result_is_negatively_cached,
+        test_failed_requests_are_not_cached,
+        test_lru_eviction,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+        finally:
+            teardown_function(test)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Yahoo 並行搜尋測試腳本
+在本機啟動假的 Yahoo 搜尋伺服器，依查詢字串注入延遲與回應，
+驗證並行送出、提早取消、總時限以及結果合併順序
+"""
+
+import sys
+import os
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import external_api
+
+_original_urls = external_api.YAHOO_SEARCH_URLS
+_original_deadline = external_api.YAHOO_SEARCH_DEADLINE
+_original_client = external_api.yahoo_client
+
+
+class _ThreadingServer(ThreadingHTTPServer):
+    # 並行搜尋會同時建立大量連線，加大 listen 佇列避免連線被延後重送
+    request_queue_size = 128
+
+
+class FakeYahooServer:
+    """
+    假的 Yahoo 搜尋伺服器
+    routes: {(路徑, 查詢字串): (延遲秒數, HTTP 狀態碼, 股票代號列表)}
+    failures: {(路徑, 查詢字串): 次數}，前幾次請求先回應 503
+    """
+
+    def __init__(self, routes, failures=None):
+        self.routes = routes
+        self.failures = dict(failures or {})
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                term = parse_qs(parsed.query).get('q', [''])[0]
+                server.requests.append((parsed.path, term))
+                delay, status, codes = server.routes.get((parsed.path, term), (0, 200, []))
+                if server.failures.get((parsed.path, term), 0) > 0:
+                    server.failures[(parsed.path, term)] -= 1
+                    status = 503
+                time.sleep(delay)
+                body = json.dumps({
+                    'quotes': [{'symbol': f"{code}.TW", 'longname': f"股票{code}"} for code in codes]
+                }).encode('utf-8')
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = _ThreadingServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.block_on_close = False
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        external_api.clear_cache()
+        external_api.YAHOO_SEARCH_URLS = [f"{self.base_url}/primary", f"{self.base_url}/mirror"]
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        external_api.YAHOO_SEARCH_URLS = _original_urls
+        external_api.YAHOO_SEARCH_DEADLINE = _original_deadline
+        external_api.yahoo_client = _original_client
+        external_api.clear_cache()
+
+
+def _codes(results):
+    return [item['code'] for item in results]
+
+
+def test_requests_are_sent_in_parallel():
+    routes = {
+        ('/primary', '台'): (0.5, 200, ['1101']),
+        ('/primary', '台 TW'): (0.5, 200, ['1102']),
+        ('/primary', '台 台股'): (0.5, 200, ['1103']),
+    }
+    with FakeYahooServer(routes):
+        started = time.monotonic()
+        results = external_api.search_yahoo_stocks('台')
+        elapsed = time.monotonic() - started
+
+    assert _codes(results) == ['1101', '1102', '1103']
+    assert elapsed < 1.2, f"三個 0.5 秒的請求應並行完成，實際耗時 {elapsed:.2f} 秒"
+
+
+def test_results_are_merged_in_query_order():
+    # 第二個查詢策略先完成，合併順序仍須依查詢策略排列並去除重複代號
+    routes = {
+        ('/primary', '鴻'): (0.3, 200, ['2317', '2354']),
+        ('/primary', '鴻 TW'): (0, 200, ['2354', '6414']),
+        ('/primary', '鴻 台股'): (0.1, 200, []),
+    }
+    with FakeYahooServer(routes):
+        results = external_api.search_yahoo_stocks('鴻')
+
+    assert _codes(results) == ['2317', '2354', '6414']
+
+
+def test_enough_results_cancel_remaining_requests():
+    routes = {
+        ('/primary', '積'): (0, 200, ['2330', '3330', '6770']),
+        ('/primary', '積 TW'): (3, 200, ['9999']),
+        ('/primary', '積 台股'): (3, 200, ['9998']),
+        ('/mirror', '積'): (3, 200, ['9997']),
+    }
+    with FakeYahooServer(routes):
+        started = time.monotonic()
+        results = external_api.search_yahoo_stocks('積', limit=3)
+        elapsed = time.monotonic() - started
+
+    assert _codes(results) == ['2330', '3330', '6770']
+    assert elapsed < 1.5, f"已有足夠結果時應立即返回，實際耗時 {elapsed:.2f} 秒"
+
+
+def test_mirror_is_used_when_primary_fails():
+    routes = {
+        ('/primary', '聯'): (0, 500, []),
+        ('/primary', '聯 TW'): (0, 500, []),
+        ('/primary', '聯 台股'): (0, 500, []),
+        ('/mirror', '聯'): (0.2, 200, ['2303']),
+        ('/mirror', '聯 TW'): (0, 200, ['2454']),
+    }
+    with FakeYahooServer(routes):
+        results = external_api.search_yahoo_stocks('聯')
+
+    assert _codes(results) == ['2303', '2454']
+
+
+def test_mirror_results_are_ignored_when_primary_has_results():
+    routes = {
+        ('/primary', '華'): (0.3, 200, ['2412']),
+        ('/mirror', '華'): (0, 200, ['9999']),
+    }
+    with FakeYahooServer(routes):
+        results = external_api.search_yahoo_stocks('華')
+
+    assert _codes(results) == ['2412']
+
+
+def test_overall_deadline():
+    routes = {
+        ('/primary', '慢'): (3, 200, ['1111']),
+        ('/primary', '慢 TW'): (3, 200, ['2222']),
+        ('/primary', '慢 台股'): (3, 200, ['3333']),
+        ('/mirror', '慢'): (3, 200, ['4444']),
+        ('/mirror', '慢 TW'): (3, 200, ['5555']),
+        ('/mirror', '慢 台股'): (3, 200, ['6666']),
+    }
+    with FakeYahooServer(routes):
+        external_api.YAHOO_SEARCH_DEADLINE = 0.5
+        started = time.monotonic()
+        results = external_api.search_yahoo_stocks('慢')
+        elapsed = time.monotonic() - started
+
+    assert results == []
+    assert elapsed < 1.5, f"應在總時限後返回，實際耗時 {elapsed:.2f} 秒"
+
+
+def test_retry_on_server_error():
+    routes = {('/primary', '重試'): (0, 200, ['1234'])}
+    failures = {('/primary', '重試'): 2}
+    with FakeYahooServer(routes, failures) as server:
+        external_api.yahoo_client = external_api.YahooClient(max_retries=2, backoff_base=0.01)
+        results = external_api.search_yahoo_stocks('重試')
+        attempts = [req for req in server.requests if req == ('/primary', '重試')]
+
+    assert _codes(results) == ['1234']
+    assert len(attempts) == 3, "前兩次 503 應各重試一次"
+
+
+def test_circuit_breaker_stops_requests_when_yahoo_is_failing():
+    routes = {(path, term): (0, 503, []) for path in ('/primary', '/mirror')
+              for term in ('壞', '壞 TW', '壞 台股')}
+    with FakeYahooServer(routes) as server:
+        external_api.yahoo_client = external_api.YahooClient(
+            max_retries=0, breaker_threshold=3, breaker_reset=60)
+        assert external_api.search_yahoo_stocks('壞') == []
+        requests_while_closed = len(server.requests)
+        assert external_api.yahoo_client.breaker.state == 'open'
+
+        external_api.clear_cache()
+        started = time.monotonic()
+        assert external_api.search_yahoo_stocks('壞') == []
+        elapsed = time.monotonic() - started
+
+    assert len(server.requests) == requests_while_closed, "斷路器開啟時不應再送出請求"
+    assert elapsed < 0.1
+
+
+if __name__ == "__main__":
+    tests = [
+        test_requests_are_sent_in_parallel,
+        test_results_are_merged_in_query_order,
+        test_enough_results_cancel_remaining_requests,
+        test_mirror_is_used_when_primary_fails,
+        test_mirror_results_are_ignored_when_primary_has_results,
+        test_overall_deadline,
+        test_retry_on_server_error,
+        test_circuit_breaker_stops_requests_when_yahoo_is_failing,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
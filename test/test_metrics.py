@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+效能指標測試腳本
+測試 Prometheus 文字格式輸出、db_manager 計時裝飾器與 /metrics 端點，不需連線到資料庫
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+
+import metrics
+from log_config import SamplingFilter
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram('test_latency_seconds', '測試延遲', ('route',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, route='/a')
+    histogram.observe(0.5, route='/a')
+    histogram.observe(5, route='/a')
+
+    text = '\n'.join(histogram.render())
+    assert '# TYPE test_latency_seconds histogram' in text
+    assert 'test_latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'test_latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_sum{route="/a"} 5.55' in text
+    assert 'test_latency_seconds_count{route="/a"} 3' in text
+
+
+def test_counter_rejects_wrong_labels():
+    counter = metrics.Counter('test_events_total', '測試事件', ('kind',))
+    counter.inc(kind='a')
+    counter.inc(2, kind='a')
+    assert counter.value(kind='a') == 3
+    try:
+        counter.inc(other='a')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('錯誤的標籤應拋出 ValueError')
+
+
+def test_timed_db_records_duration_and_rows():
+    @metrics.timed_db()
+    def fake_query():
+        return [1, 2, 3]
+
+    @metrics.timed_db()
+    def fake_failure():
+        raise RuntimeError('boom')
+
+    before = metrics.DB_QUERY_ROWS.count(function='fake_query')
+    assert fake_query() == [1, 2, 3]
+    assert metrics.DB_QUERY_DURATION.count(function='fake_query') >= 1
+    assert metrics.DB_QUERY_ROWS.count(function='fake_query') == before + 1
+
+    try:
+        fake_failure()
+    except RuntimeError:
+        pass
+    assert metrics.DB_QUERY_ERRORS.value(function='fake_failure') == 1
+
+
+def test_metrics_endpoint_reports_route_latency():
+    import app as app_module
+    client = app_module.app.test_client()
+
+    client.get('/static/style.css')
+    resp = client.get('/metrics')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'text/plain'
+    text = resp.get_data(as_text=True)
+    assert 'stock_note_http_request_duration_seconds_count{method="GET",route="/static/<path:filename>",status="200"}' in text
+    assert f'stock_note_process_info{{pid="{os.getpid()}"}} 1' in text
+
+
+def test_sampling_filter_keeps_warnings():
+    sampler = SamplingFilter(0)
+    info = logging.LogRecord('test', logging.INFO, __file__, 1, '訊息', None, None)
+    warning = logging.LogRecord('test', logging.WARNING, __file__, 1, '警告', None, None)
+    assert not sampler.filter(info)
+    assert sampler.filter(warning)
+    assert SamplingFilter(1).filter(info)
+
+
+if __name__ == "__main__":
+    tests = [
+        test_histogram_renders_cumulative_buckets,
+        test_counter_rejects_wrong_labels,
+        test_timed_db_records_duration_and_rows,
+        test_metrics_endpoint_reports_route_latency,
+        test_sampling_filter_keeps_warnings,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+資料庫遷移腳本測試
+以假的 MySQL 連線執行 migrations/ 中的所有遷移，驗證語句分割、註解移除，
+以及在非預設的 MYSQL_DATABASE 下不會建立或切換到其他資料庫，不需 MySQL 伺服器
+"""
+
+import sys
+import os
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+import glob
+
+import migrate
+
+
+class FakeCursor:
+    def __init__(self, executed):
+        self.executed = executed
+
+    def execute(self, statement, params=None):
+        self.executed.append(statement)
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """記錄連線參數與執行的語句"""
+
+    def __init__(self, config):
+        self.config = config
+        self.executed = []
+
+    def is_connected(self):
+        return True
+
+    def cursor(self, buffered=False):
+        return FakeCursor(self.executed)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_split_statements_strips_comments_and_database_switches():
+    statements = migrate.split_statements("""
+        -- 遷移腳本 999: 測試
+        -- 描述: 測試
+        CREATE DATABASE IF NOT EXISTS stock_note_project;
+        use stock_note_project;
+        -- 第一個語句前有註解
+        CREATE TABLE a (id INT);
+
+        -- 最後一個語句沒有分號
+        CREATE INDEX idx_a ON a (id)
+    """)
+    assert statements == ['CREATE TABLE a (id INT)', 'CREATE INDEX idx_a ON a (id)']
+    # 只略過以 USE 開頭的語句，不影響名稱中包含 use 的資料表
+    assert migrate.split_statements("INSERT INTO users_log VALUES (1);") == ['INSERT INTO users_log VALUES (1)']
+
+
+def test_migrations_run_in_configured_database():
+    connections = []
+    original_connect = migrate.mysql.connector.connect
+    original_database = migrate.DB_CONFIG['database']
+
+    def fake_connect(**config):
+        connections.append(FakeConnection(config))
+        return connections[-1]
+
+    migrate.mysql.connector.connect = fake_connect
+    migrate.DB_CONFIG['database'] = 'custom_notes_db'
+    try:
+        for migration_file in sorted(glob.glob(os.path.join(ROOT_DIR, 'migrations', '*.sql'))):
+            assert migrate.execute_migration(migration_file), migration_file
+    finally:
+        migrate.mysql.connector.connect = original_connect
+        migrate.DB_CONFIG['database'] = original_database
+
+    assert connections and all(c.config['database'] == 'custom_notes_db' for c in connections)
+    executed = [statement for connection in connections for statement in connection.executed]
+    for statement in executed:
+        assert not migrate.DATABASE_STATEMENT.match(statement), statement
+        assert not statement.lstrip().startswith('--'), statement
+
+    # 每個遷移的第一個語句（前面有註解）都有執行
+    assert any(statement.startswith('CREATE TABLE IF NOT EXISTS stocks') for statement in executed)
+    assert any('ADD FULLTEXT INDEX ft_notes_content_ref' in statement for statement in executed)
+    assert any(statement.startswith('CREATE TABLE IF NOT EXISTS note_deletions') for statement in executed)
+    assert any(statement.startswith('CREATE TABLE IF NOT EXISTS stock_note_stats') for statement in executed)
+    assert any(statement.startswith('UPDATE ref_stats r') for statement in executed)
+    # 單一語句的觸發器不含分號，整個 CREATE TRIGGER 是一個語句
+    triggers = [statement for statement in executed if statement.startswith('CREATE TRIGGER')]
+    assert len(triggers) == 1 and triggers[0].endswith('WHERE s.stock_code = OLD.stock_code')
+
+
+if __name__ == "__main__":
+    tests = [
+        test_split_statements_strips_comments_and_database_switches,
+        test_migrations_run_in_configured_database,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+筆記批次匯入測試腳本
+以暫存的 SQLite 資料庫測試逐筆驗證、分批交易、POST /api/notes/bulk 與 GET /api/notes/export（含匯出中途失敗），不需 MySQL 伺服器
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import csv
+import io
+import json
+
+import pytest
+
+import db_manager
+import note_ingest
+from app import app, EXPORT_COLUMNS
+from stock_cache import stock_directory
+
+
+@pytest.fixture(autouse=True)
+def _database(stock_db):
+    db_manager.load_stock_directory()
+
+
+def test_ingest_validates_rows_and_writes_in_chunks():
+    rows = [
+        {'stock_code': '2330', 'note_type': 'tag', 'content': 'CoWoS', 'ref': '經濟日報', 'ref_time': '2024-05-01T09:00'},
+        {'stock_code': '2317', 'stock_name': '鴻海', 'note_type': 'STORY', 'content': 'AI伺服器出貨成長',
+         'created_at': '2023-01-02 03:04:05'},
+        {'stock_code': '2454', 'note_type': 'MEMO', 'content': '天璣'},
+        {'stock_code': '', 'note_type': 'TAG', 'content': '缺代號'},
+        {'stock_code': '2454', 'note_type': 'TAG', 'content': '天璣晶片', 'ref_time': '昨天'},
+        {'stock_code': '3008', 'note_type': 'TAG', 'content': '光學鏡頭'},
+    ]
+    progress = []
+    summary = note_ingest.ingest_notes(rows, chunk_size=2, progress=lambda processed, counts: progress.append(processed))
+
+    assert (summary['received'], summary['inserted'], summary['invalid'], summary['failed']) == (6, 3, 3, 0)
+    assert [result['status'] for result in summary['results']] == \
+        ['inserted', 'inserted', 'invalid', 'invalid', 'invalid', 'inserted']
+    assert 'note_type' in summary['results'][2]['error']
+    assert 'ref_time' in summary['results'][4]['error']
+    assert progress == [2, 6]
+
+    notes = {note['content']: note for note in db_manager.get_all_notes()}
+    assert notes['CoWoS']['note_type'] == 'TAG'
+    assert notes['CoWoS']['ref_time'] == '2024-05-01 09:00:00'
+    assert notes['AI伺服器出貨成長']['created_at'] == '2023-01-02 03:04:05'
+
+    # 未提供名稱時不覆蓋既有名稱，新股票使用預設名稱
+    assert db_manager.get_stock_by_code('2330')['stock_name'] == '台積電'
+    assert db_manager.get_stock_by_code('2317')['stock_name'] == '鴻海'
+    assert db_manager.get_stock_by_code('3008')['stock_name'] == '股票3008'
+    assert stock_directory.get('2317')['stock_name'] == '鴻海'
+
+
+def test_failed_chunk_is_reported_per_row():
+    original = db_manager.add_notes_bulk
+    calls = []
+
+    def flaky(notes):
+        calls.append(len(notes))
+        return None if len(calls) == 1 else original(notes)
+
+    db_manager.add_notes_bulk = flaky
+    try:
+        rows = [{'stock_code': '2330', 'note_type': 'TAG', 'content': f'標籤{i}'} for i in range(3)]
+        summary = note_ingest.ingest_notes(rows, chunk_size=2)
+    finally:
+        db_manager.add_notes_bulk = original
+
+    assert calls == [2, 1]
+    assert (summary['inserted'], summary['failed']) == (1, 2)
+    assert [result['status'] for result in summary['results']] == ['failed', 'failed', 'inserted']
+    assert [note['content'] for note in db_manager.get_all_notes()] == ['標籤2']
+
+
+def test_bulk_api_accepts_json_and_ndjson():
+    client = app.test_client()
+
+    response = client.post('/api/notes/bulk', json={'notes': [
+        {'stock_code': '2330', 'note_type': 'TAG', 'content': '先進封裝'},
+        {'stock_code': '2330', 'note_type': 'STORY'},
+    ]})
+    data = response.get_json()
+    assert response.status_code == 200
+    assert data['success'] and data['inserted'] == 1 and data['invalid'] == 1
+    assert data['results'][1] == {'index': 1, 'status': 'invalid', 'error': '缺少 content'}
+    assert data['rows_per_second'] is not None
+
+    body = '\n'.join([
+        json.dumps({'stock_code': '2603', 'stock_name': '長榮', 'note_type': 'TAG', 'content': '運價'}, ensure_ascii=False),
+        '',
+        '{不是 JSON',
+    ])
+    response = client.post('/api/notes/bulk', data=body.encode('utf-8'), content_type='application/x-ndjson')
+    data = response.get_json()
+    assert (data['received'], data['inserted'], data['invalid']) == (2, 1, 1)
+    assert '第 3 行' in data['results'][1]['error']
+    assert db_manager.get_stock_by_code('2603')['stock_name'] == '長榮'
+
+    assert client.post('/api/notes/bulk', json={'foo': 1}).status_code == 400
+
+
+def test_bulk_api_limits_rows_and_body_size():
+    app_module = sys.modules['app']
+    client = app.test_client()
+    lines = [json.dumps({'stock_code': '2330', 'note_type': 'TAG', 'content': f'標籤{i}'}) + '\n' for i in range(5000)]
+    body = io.BytesIO(''.join(lines).encode('utf-8'))
+
+    original_rows = app_module.NOTES_BULK_MAX_ROWS
+    app_module.NOTES_BULK_MAX_ROWS = 2
+    try:
+        response = client.post('/api/notes/bulk', input_stream=body, content_length=len(body.getvalue()),
+                               content_type='application/x-ndjson')
+        assert response.status_code == 413
+        # 超過筆數上限後不再讀取其餘內容，也不寫入任何筆記
+        assert body.tell() < len(body.getvalue()) / 2
+        assert db_manager.get_all_notes() == []
+    finally:
+        app_module.NOTES_BULK_MAX_ROWS = original_rows
+
+    original_bytes = app.config['MAX_CONTENT_LENGTH']
+    app.config['MAX_CONTENT_LENGTH'] = 100
+    try:
+        response = client.post('/api/notes/bulk', data=''.join(lines[:3]).encode('utf-8'),
+                               content_type='application/x-ndjson')
+        assert response.status_code == 413 and not response.get_json()['success']
+        response = client.post('/api/notes/bulk', json={'notes': [json.loads(line) for line in lines[:3]]})
+        assert response.status_code == 413
+        assert db_manager.get_all_notes() == []
+    finally:
+        app.config['MAX_CONTENT_LENGTH'] = original_bytes
+
+
+def test_export_streams_batches_and_round_trips(stock_db):
+    note_ingest.ingest_notes([
+        {'stock_code': '2330', 'note_type': 'TAG', 'content': f'標籤{i}', 'ref': '經濟日報, 財經版'} for i in range(5)
+    ] + [{'stock_code': '2317', 'note_type': 'STORY', 'content': '鴻海"電動車"'}])
+
+    assert [len(batch) for batch in db_manager.iter_notes(batch_size=2)] == [2, 2, 2]
+
+    # 中途停止時連線仍有未讀取的結果，作廢而不歸還連線池
+    batches = db_manager.iter_notes(batch_size=2)
+    next(batches)
+    batches.close()
+    assert db_manager.get_pool_stats()['in_use'] == 0
+
+    client = app.test_client()
+    response = client.get('/api/notes/export?format=ndjson&search=鴻海')
+    assert response.mimetype == 'application/x-ndjson'
+    assert 'attachment' in response.headers['Content-Disposition']
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['content'] for row in rows] == ['鴻海"電動車"']
+    # 與 /api/notes 相同的序列化（日期時間等欄位的輸出一致）
+    listed = client.get('/api/notes?search=鴻海').get_json()['notes']
+    assert rows == [{column: note[column] for column in rows[0]} for note in listed]
+
+    response = client.get('/api/notes/export?format=csv&sort_by=stock_code&sort_order=ASC')
+    assert response.mimetype == 'text/csv'
+    path = os.path.join(stock_db, 'export.csv')
+    with open(path, 'wb') as f:
+        f.write(response.get_data())
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        exported = list(csv.DictReader(f))
+    assert [row['stock_code'] for row in exported] == ['2317'] + ['2330'] * 5
+    assert exported[1]['ref'] == '經濟日報, 財經版'
+
+    # 匯出的 CSV 可直接再匯入
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        assert note_ingest.ingest_notes(csv.DictReader(f))['inserted'] == 6
+
+    assert client.get('/api/notes/export?format=xml').status_code == 400
+    response = client.get('/api/notes/export?format=csv&search=不存在')
+    assert response.get_data(as_text=True).lstrip('\ufeff').strip() == ','.join(EXPORT_COLUMNS)
+
+
+def test_export_reports_failure_mid_stream():
+    note_ingest.ingest_notes([{'stock_code': '2330', 'note_type': 'TAG', 'content': f'標籤{i}'} for i in range(5)])
+
+    # 第二批讀取時資料庫發生錯誤（回應標頭已送出）
+    original_rows_to_dicts, original_batch_size = db_manager._rows_to_dicts, db_manager.NOTES_EXPORT_BATCH_SIZE
+    calls = []
+
+    def failing_rows_to_dicts(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise db_manager.Error('連線中斷')
+        return original_rows_to_dicts(*args, **kwargs)
+
+    db_manager._rows_to_dicts, db_manager.NOTES_EXPORT_BATCH_SIZE = failing_rows_to_dicts, 2
+    try:
+        client = app.test_client()
+        response = client.get('/api/notes/export?format=ndjson')
+        assert response.status_code == 200
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert len(rows) == 3 and all('content' in row for row in rows[:2])
+        assert rows[-1] == {'error': '匯出未完成: 連線中斷'}
+
+        calls.clear()
+        response = client.get('/api/notes/export?format=csv')
+        exported = list(csv.DictReader(io.StringIO(response.get_data(as_text=True).lstrip('\ufeff'))))
+        assert [row['id'] for row in exported][2:] == ['#error']
+        assert exported[-1]['content'] == '匯出未完成: 連線中斷'
+
+        # 第一批就失敗：尚未送出內容，返回錯誤狀態碼
+        calls[:] = [1]
+        response = client.get('/api/notes/export?format=ndjson')
+        assert response.status_code == 500
+        assert response.get_json()['message'] == '連線中斷'
+    finally:
+        db_manager._rows_to_dicts, db_manager.NOTES_EXPORT_BATCH_SIZE = original_rows_to_dicts, original_batch_size
+
+    # 中斷的匯出不佔用連線
+    assert db_manager.get_pool_stats()['in_use'] == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-v']))
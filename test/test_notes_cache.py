@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+筆記列表快取測試腳本
+測試世代計數器、快取命中、寫入後失效、全文搜尋退回 LIKE 與 /api/notes 的 ETag（由資料庫狀態計算）；資料庫部分以暫存的 SQLite 資料庫執行，不需 MySQL 伺服器
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import db_manager
+from app import app
+from notes_cache import NotesResultCache, LocalGeneration, SharedGeneration, create_generation, notes_cache
+from stock_cache import stock_directory
+
+
+@pytest.fixture(autouse=True)
+def _database(stock_db):
+    original_enabled = notes_cache.enabled
+    notes_cache.enabled = True
+    db_manager.load_stock_directory()
+    yield
+    notes_cache.enabled = original_enabled
+
+
+def _execute(query):
+    """直接修改資料庫（模擬其他主機的寫入：不經過 db_manager，本行程的世代與快取都不知道）"""
+    connection = db_manager.get_db_connection()
+    try:
+        connection.cursor().execute(query)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def settle_writes(seconds=10):
+    """
+    把所有變更時間往前移：剛寫入的資料在 NOTES_CHANGES_SETTLE_SECONDS 內，
+    /api/notes 的 ETag 每次都不同（同一秒內可能還有其他寫入），需要測試 304 時先呼叫
+    """
+    _execute(f"UPDATE notes SET updated_at = datetime(updated_at, '-{seconds} seconds')")
+    _execute(f"UPDATE note_deletions SET deleted_at = datetime(deleted_at, '-{seconds} seconds')")
+
+
+def test_shared_generation_is_visible_across_instances(stock_db):
+    path = os.path.join(stock_db, 'notes.generation')
+    first = SharedGeneration(path)
+    second = SharedGeneration(path)
+    start = first.value()
+    assert second.value() == start
+
+    assert second.bump() == start + 1
+    assert first.value() == start + 1
+
+    assert isinstance(create_generation(''), LocalGeneration)
+    # 無法建立檔案時退回行程內計數
+    assert isinstance(create_generation(os.path.join(stock_db, 'missing', 'x')), LocalGeneration)
+
+
+def test_cache_hits_until_invalidated():
+    cache = NotesResultCache(LocalGeneration(), max_rows=2)
+    calls = []
+
+    def load(rows, cacheable=True):
+        def loader():
+            calls.append(rows)
+            return list(range(rows)), cacheable
+        return loader
+
+    assert cache.get_or_load(('a',), load(1)) == [0]
+    assert cache.get_or_load(('a',), load(1)) == [0]
+    assert calls == [1]
+
+    cache.invalidate()
+    cache.get_or_load(('a',), load(1))
+    assert calls == [1, 1]
+
+    # 查詢失敗與超過 max_rows 的結果不快取
+    cache.get_or_load(('error',), load(0, cacheable=False))
+    cache.get_or_load(('error',), load(0, cacheable=False))
+    cache.get_or_load(('big',), load(3))
+    cache.get_or_load(('big',), load(3))
+    assert calls == [1, 1, 0, 0, 3, 3]
+
+
+def test_writes_invalidate_cached_notes():
+    original = db_manager.get_db_connection
+    connections = []
+
+    def counting():
+        connections.append(1)
+        return original()
+
+    db_manager.get_db_connection = counting
+    try:
+        note = db_manager.add_note('2330', '台積電', 'TAG', 'CoWoS')
+        assert [n['content'] for n in db_manager.get_all_notes()] == ['CoWoS']
+        queries = len(connections)
+        assert [n['content'] for n in db_manager.get_all_notes()] == ['CoWoS']
+        assert db_manager.get_notes_page(limit=10)['notes'][0]['content'] == 'CoWoS'
+        assert len(connections) == queries + 1  # 分頁查詢的參數不同，只多查一次
+
+        assert db_manager.update_note(note['id'], 'TAG', '先進封裝')
+        assert [n['content'] for n in db_manager.get_all_notes()] == ['先進封裝']
+
+        db_manager.add_notes_bulk([{'stock_code': '2317', 'stock_name': '鴻海', 'note_type': 'STORY',
+                                    'content': 'AI伺服器'}])
+        assert len(db_manager.get_all_notes()) == 2
+
+        assert db_manager.delete_note(note['id'])
+        assert [n['content'] for n in db_manager.get_all_notes()] == ['AI伺服器']
+
+        # 股票名稱變更後，列表中的名稱也會更新
+        db_manager.import_stocks_from_iterable([{'stock_code': '2317', 'stock_name': '鴻海精密'}])
+        assert db_manager.get_all_notes()[0]['stock_name'] == '鴻海精密'
+    finally:
+        db_manager.get_db_connection = original
+
+
+def test_fulltext_fallback_stays_inside_one_cache_load():
+    db_manager.add_note('2330', '台積電', 'TAG', '先進封裝產能')
+    original_fetch, original_query = db_manager._fetch_rows, db_manager._query_notes
+    original_available = db_manager._fulltext_available
+    lookups = []
+
+    def missing_fulltext_index(connection, query, params, time_fields=()):
+        # 模擬 MySQL 尚未建立 FULLTEXT 索引（errno 1191）
+        if 'notes_fts' in query:
+            error = db_manager.Error("Can't find FULLTEXT index matching the column list")
+            error.errno = db_manager.ER_FT_MATCHING_KEY_NOT_FOUND
+            raise error
+        return original_fetch(connection, query, params, time_fields)
+
+    def counting_query(*args, **kwargs):
+        lookups.append(args)
+        return original_query(*args, **kwargs)
+
+    db_manager._fetch_rows, db_manager._query_notes = missing_fulltext_index, counting_query
+    db_manager._fulltext_available = True
+    try:
+        assert [n['content'] for n in db_manager.get_all_notes('封裝產能')] == ['先進封裝產能']
+        # 改用 LIKE 重試時不再經過快取的進入點
+        assert len(lookups) == 1
+        assert not db_manager._fulltext_available
+    finally:
+        db_manager._fetch_rows, db_manager._query_notes = original_fetch, original_query
+        db_manager._fulltext_available = original_available
+
+
+def test_notes_api_conditional_get():
+    client = app.test_client()
+    note = db_manager.add_note('2330', '台積電', 'TAG', 'CoWoS')
+
+    # 剛寫入（同一秒內可能還有其他寫入）：每次的 ETag 都不同
+    response = client.get('/api/notes?limit=10')
+    assert response.status_code == 200 and response.headers['Cache-Control'] == 'no-cache'
+    assert client.get('/api/notes?limit=10', headers={'If-None-Match': response.headers['ETag']}).status_code == 200
+
+    settle_writes()
+    response = client.get('/api/notes?limit=10')
+    etag = response.headers['ETag']
+
+    # 資料未變更：只讀取資料版本，不查詢筆記列表直接返回 304
+    original = db_manager.get_notes_page
+    db_manager.get_notes_page = None
+    try:
+        response = client.get('/api/notes?limit=10', headers={'If-None-Match': etag})
+    finally:
+        db_manager.get_notes_page = original
+    assert response.status_code == 304 and response.data == b''
+    assert response.headers['ETag'] == etag
+
+    # 查詢參數不同或資料變更後返回新內容
+    assert client.get('/api/notes?limit=5', headers={'If-None-Match': etag}).status_code == 200
+    db_manager.update_note(note['id'], 'TAG', '先進封裝')
+    response = client.get('/api/notes?limit=10', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    assert response.get_json()['notes'][0]['content'] == '先進封裝'
+
+    # 其他主機的寫入（本機的世代未遞增，快取中仍有舊結果）：ETag 改變且不返回快取的舊結果
+    settle_writes()
+    etag = client.get('/api/notes?limit=10').headers['ETag']
+    _execute("UPDATE notes SET content = '其他主機', updated_at = datetime('now', 'localtime', '-5 seconds')")
+    response = client.get('/api/notes?limit=10', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    assert response.get_json()['notes'][0]['content'] == '其他主機'
+    etag = response.headers['ETag']
+    assert client.get('/api/notes?limit=10', headers={'If-None-Match': etag}).status_code == 304
+
+    # 其他主機刪除筆記
+    _execute(f"DELETE FROM notes WHERE id = {note['id']}")
+    _execute(f"INSERT INTO note_deletions (note_id, deleted_at) "
+             f"VALUES ({note['id']}, datetime('now', 'localtime', '-5 seconds'))")
+    response = client.get('/api/notes?limit=10', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.get_json()['notes'] == []
+    db_manager.add_note('2330', '台積電', 'TAG', 'CoWoS')
+    note = db_manager.get_all_notes()[0]
+
+    response = client.get(f"/api/notes/{note['id']}")
+    assert response.status_code == 200
+    # Last-Modified 直接取自 updated_at（本地時間）
+    updated_at = db_manager.get_note_by_id(note['id'])['updated_at']
+    assert response.last_modified == updated_at.astimezone()
+    assert response.get_json()['note']['updated_at'] == updated_at.strftime('%Y-%m-%d %H:%M:%S')
+    assert client.get(f"/api/notes/{note['id']}",
+                      headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    assert client.get(f"/api/notes/{note['id']}",
+                      headers={'If-Modified-Since': response.headers['Last-Modified']}).status_code == 304
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-v']))
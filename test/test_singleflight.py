@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+相同查詢合併（single-flight）測試腳本
+以多執行緒與 asyncio 同時發出相同查詢，驗證只執行一次、結果與例外共用，
+以及筆記查詢（暫存的 SQLite 資料庫）與 Yahoo 搜尋（本機假伺服器）實際只查詢一次
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import db_manager
+import external_api
+from singleflight import SingleFlight
+from test_external_api_fanout import FakeYahooServer
+
+
+pytestmark = pytest.mark.usefixtures('stock_db')
+
+
+def _run_concurrently(fn, count=8):
+    """以 count 條執行緒同時呼叫 fn()，返回 (各執行緒的結果, 例外)"""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+    errors = [None] * count
+
+    def worker(index):
+        barrier.wait()
+        try:
+            results[index] = fn()
+        except Exception as e:
+            errors[index] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    group = SingleFlight('test_threads')
+    calls = []
+
+    def slow_lookup():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'value': 42}
+
+    results, errors = _run_concurrently(lambda: group.do('key', slow_lookup))
+    assert calls == [1]
+    assert errors == [None] * 8
+    assert all(result is results[0] for result in results)
+    assert group.stats() == {'enabled': True, 'executed': 1, 'coalesced': 7, 'in_flight': 0}
+
+    # 查詢結束後不保留結果，下一次呼叫重新執行
+    group.do('key', slow_lookup)
+    assert calls == [1, 1]
+
+    # 停用時每次都執行
+    group.enabled = False
+    _run_concurrently(lambda: group.do('key', slow_lookup), count=3)
+    assert len(calls) == 5
+
+
+def test_errors_are_shared():
+    group = SingleFlight('test_errors')
+    calls = []
+
+    def failing_lookup():
+        calls.append(1)
+        time.sleep(0.2)
+        raise RuntimeError('資料庫離線')
+
+    results, errors = _run_concurrently(lambda: group.do('key', failing_lookup), count=4)
+    assert calls == [1]
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert group.stats()['in_flight'] == 0
+
+
+def test_async_calls_share_one_task():
+    group = SingleFlight('test_async')
+    calls = []
+
+    async def slow_lookup():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return ['2330']
+
+    async def main():
+        leader = asyncio.ensure_future(group.ado('key', slow_lookup))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(group.ado('key', slow_lookup)) for _ in range(9)]
+        await asyncio.sleep(0.05)
+        # 發起查詢的請求被取消（客戶端斷線）時，其他等待者仍取得結果
+        leader.cancel()
+        return await asyncio.gather(*followers), leader
+
+    results, leader = asyncio.run(main())
+    assert calls == [1]
+    assert leader.cancelled()
+    assert results == [['2330']] * 9
+    assert group.stats() == {'enabled': True, 'executed': 1, 'coalesced': 9, 'in_flight': 0}
+
+
+def test_concurrent_note_lookups_query_database_once():
+    note = db_manager.add_note('2330', '台積電', 'TAG', 'CoWoS')
+    original = db_manager.get_db_connection
+    connections = []
+
+    def slow_connection():
+        connections.append(1)
+        time.sleep(0.2)
+        return original()
+
+    db_manager.get_db_connection = slow_connection
+    try:
+        results, errors = _run_concurrently(lambda: db_manager.get_note_by_id(note['id']))
+        assert len(connections) == 1
+        assert all(result['content'] == 'CoWoS' for result in results)
+
+        _run_concurrently(lambda: db_manager.get_stock_by_code('2330'))
+        assert len(connections) == 2
+
+        # 寫入後開始的查詢不會共用寫入前的結果
+        assert db_manager.update_note(note['id'], 'TAG', '先進封裝')
+        assert db_manager.get_note_by_id(note['id'])['content'] == '先進封裝'
+    finally:
+        db_manager.get_db_connection = original
+
+
+def test_concurrent_yahoo_searches_send_one_fanout():
+    routes = {('/primary', '同'): (0.3, 200, ['2330'])}
+    with FakeYahooServer(routes) as server:
+        results, errors = _run_concurrently(lambda: external_api.search_yahoo_stocks('同'))
+        sent = list(server.requests)
+
+    assert errors == [None] * 8
+    assert all(result == [{'code': '2330', 'name': '股票2330'}] for result in results)
+    # 每個查詢策略 × 網址只送出一次
+    assert sent and len(sent) == len(set(sent)), f"重複送出的請求: {sent}"
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-v']))
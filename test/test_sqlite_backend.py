@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite 後端測試腳本
+以暫存的 SQLite 檔案執行 db_manager 的各項功能，不需 MySQL 伺服器
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import db_manager
+from app import app
+from db_backends import SQLiteConnection
+from stock_cache import stock_directory
+
+
+pytestmark = pytest.mark.usefixtures('sqlite_db')
+
+
+def _seed():
+    assert db_manager.init_common_stocks()
+    db_manager.add_note('2330', '台積電', 'TAG', 'AI伺服器', '經濟日報')
+    db_manager.add_note('2317', '鴻海', 'STORY', '鴻海第三季營收創新高，AI伺服器出貨成長', '工商時報')
+    db_manager.add_note('2454', '聯發科', 'TAG', '天璣晶片', '鉅亨網')
+    db_manager.add_note('2454', '聯發科', 'STORY', '聯發科法說會釋出營收展望', '經濟日報')
+    db_manager.add_note('2303', '聯電', 'TAG', '成熟製程漲價', None)
+    db_manager.load_stock_directory()
+
+
+def test_crud_round_trip():
+    _seed()
+    notes = db_manager.get_all_notes()
+    assert len(notes) == 5
+    note = db_manager.get_note_by_id(notes[0]['id'])
+    assert note['stock_name'] == '聯電'
+    assert len(note['created_at']) == 19  # 格式與 MySQL 相同：YYYY-MM-DD HH:MM:SS
+
+    assert db_manager.update_note(note['id'], 'STORY', '成熟製程報價回升', '財報狗')
+    assert db_manager.get_note_by_id(note['id'])['content'] == '成熟製程報價回升'
+    assert db_manager.delete_note(note['id'])
+    assert db_manager.get_note_by_id(note['id']) is None
+    assert not db_manager.delete_note(note['id'])
+    assert db_manager.get_ref_options() == ['經濟日報', '工商時報', '鉅亨網']
+
+
+def test_add_note_returns_row_in_one_transaction():
+    _seed()
+    note = db_manager.add_note('3008', '大立光', 'STORY', '光學鏡頭出貨回溫', '經濟日報')
+    # add_note 不另外查詢由資料庫設定的 updated_at，其餘欄位與 get_note_by_id 相同
+    assert note.items() <= db_manager.get_note_by_id(note['id']).items()
+    assert stock_directory.get('3008')['stock_name'] == '大立光'
+
+    # 未提供名稱時沿用既有名稱
+    assert db_manager.add_note('3008', '', 'TAG', '鏡頭')['stock_name'] == '大立光'
+    assert db_manager.add_note('3008', '大立光電', 'TAG', '更名')['stock_name'] == '大立光電'
+    assert db_manager.get_stock_by_code('3008')['stock_name'] == '大立光電'
+
+    # 筆記寫入失敗時，同一交易中新增的股票也一併回滾
+    assert db_manager.add_note('6669', '緯穎', 'MEMO', '違反 note_type 檢查') is None
+    assert db_manager.get_stock_by_code('6669') is None
+
+    response = app.test_client().post('/add', headers={'Accept': 'application/json'}, data={
+        'stock_code': '2330', 'stock_name': '台積電', 'note_type': 'TAG', 'content': '先進封裝',
+        'ref_time': '2024-05-01T09:30',
+    })
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data['note'].items() <= db_manager.get_note_by_id(data['note']['id']).items()
+    assert data['note']['ref_time'] == '2024-05-01 09:30:00'
+
+    response = app.test_client().post('/add', headers={'Accept': 'application/json'}, data={'stock_code': '2330'})
+    assert response.status_code == 400 and not response.get_json()['success']
+
+
+def _execute(query, params=()):
+    """在股票目錄與快取之外直接修改資料庫（模擬其他 worker 行程的寫入）"""
+    connection = db_manager.get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(query, params)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def test_add_note_with_stale_stock_directory():
+    _seed()
+    assert stock_directory.get('2330')['stock_name'] == '台積電'
+
+    # 其他行程刪除了股票（筆記串聯刪除），本行程的目錄仍有該股票
+    _execute("DELETE FROM stocks WHERE stock_code = %s", ('2330',))
+    note = db_manager.add_note('2330', '台積電', 'TAG', '刪除後重新新增')
+    assert note is not None
+    assert db_manager.get_stock_by_code('2330')['stock_name'] == '台積電'
+
+    _execute("DELETE FROM stocks WHERE stock_code = %s", ('2330',))
+    assert db_manager.add_note('2330', '', 'TAG', '未提供名稱')['stock_name'] == '台積電'
+    assert db_manager.get_stock_by_code('2330')['stock_name'] == '台積電'
+
+    # 其他行程更改了名稱：輸入的名稱仍會寫入（與沒有目錄時相同）
+    _execute("UPDATE stocks SET stock_name = %s WHERE stock_code = %s", ('台積', '2330'))
+    assert db_manager.add_note('2330', '台積電', 'TAG', '更名後')['stock_name'] == '台積電'
+    assert db_manager.get_stock_by_code('2330')['stock_name'] == '台積電'
+    assert len(db_manager.get_all_notes('2330')) == 2
+
+
+def test_keyset_pages_cover_every_note_once():
+    _seed()
+    expected = {note['id'] for note in db_manager.get_all_notes()}
+    for sort_by in ['created_at', 'stock_code', 'stock_name', 'note_type']:
+        for sort_order in ['ASC', 'DESC']:
+            seen = []
+            after = None
+            while True:
+                page = db_manager.get_notes_page('', sort_by, sort_order, after=after, limit=2)
+                seen.extend(note['id'] for note in page['notes'])
+                if not page['has_more']:
+                    break
+                after = page['next_cursor']
+            assert sorted(seen) == sorted(expected), (sort_by, sort_order)
+            assert seen == [note['id'] for note in db_manager.get_all_notes('', sort_by, sort_order)]
+
+
+def test_note_type_sorts_tag_before_story():
+    _seed()
+    types = [note['note_type'] for note in db_manager.get_all_notes('', 'note_type', 'ASC')]
+    assert types == sorted(types, key=db_manager.NOTE_TYPE_ORDER.get)
+    assert types[0] == 'TAG'
+
+
+def test_fulltext_search_and_relevance():
+    _seed()
+    # 內容與來源走 FTS5，股票代碼/名稱另外比對
+    notes = db_manager.get_all_notes('AI伺服器', 'relevance', 'DESC')
+    assert {note['stock_code'] for note in notes} == {'2330', '2317'}
+    assert all('relevance' in note for note in notes)
+
+    notes = db_manager.get_all_notes('聯發科')
+    assert {note['stock_code'] for note in notes} == {'2454'}
+
+    # 少於 3 個字的關鍵字改用 LIKE
+    notes = db_manager.get_all_notes('漲價')
+    assert [note['stock_code'] for note in notes] == ['2303']
+
+    # 更新/刪除後全文索引同步
+    note_id = notes[0]['id']
+    db_manager.update_note(note_id, 'TAG', '矽光子題材', None)
+    assert [note['id'] for note in db_manager.get_all_notes('矽光子')] == [note_id]
+    db_manager.delete_note(note_id)
+    assert db_manager.get_all_notes('矽光子') == []
+
+
+def test_stock_upsert_and_search():
+    _seed()
+    counts = db_manager.import_stocks_from_iterable([
+        {'stock_code': '2330', 'stock_name': '台積電'},
+        {'stock_code': '1101', 'stock_name': '台泥', 'industry': '水泥'},
+    ])
+    # 2330 名稱相同且未提供產業別，視為未變更
+    assert counts == db_manager.StockImportResult(inserted=1, updated=0, unchanged=1, skipped=0)
+    # industry 為空時保留原有產業別
+    assert db_manager.get_stock_by_code('2330')['industry'] == '半導體'
+    assert db_manager._search_stocks_sql('台')[0]['stock_code'] == '1101'
+    assert [stock['stock_code'] for stock in db_manager.search_stocks('23', limit=3)] == ['2303', '2317', '2330']
+
+
+def test_csv_import_streams_in_chunks(sqlite_db):
+    _seed()
+    path = os.path.join(sqlite_db, 'stocks.csv')
+    with open(path, 'w', encoding='utf-8-sig') as f:
+        f.write("stock_code,stock_name,industry\n")
+        f.write("2330,台積電,半導體\n")     # 未變更
+        f.write("2317,鴻海精密,電子\n")     # 更新名稱
+        f.write(",缺代號,\n")               # 略過
+        for code in range(3000, 3005):      # 新增
+            f.write(f"{code},測試{code},\n")
+        f.write("3000,測試三千,\n")        # 同一檔股票出現兩次，在不同區塊中視為更新
+
+    progress = []
+    result = db_manager.import_stocks_from_csv(path, chunk_size=3,
+                                               progress=lambda processed, counts: progress.append((processed, counts)))
+    assert result == db_manager.StockImportResult(inserted=5, updated=2, unchanged=1, skipped=1)
+    assert [processed for processed, _ in progress] == [4, 7, 9]
+    assert progress[-1][1] == result
+    assert db_manager.get_stock_by_code('2317')['stock_name'] == '鴻海精密'
+    assert db_manager.get_stock_by_code('3000')['stock_name'] == '測試三千'
+    assert stock_directory.get('3004')['stock_name'] == '測試3004'
+
+    # 再匯入一次全部未變更
+    again = db_manager.import_stocks_from_csv(path, chunk_size=100)
+    assert again == db_manager.StockImportResult(inserted=0, updated=0, unchanged=7, skipped=1)
+
+    # 與舊版回傳值相容：解包為 (inserted, updated, skipped)
+    inserted, updated, skipped = result
+    assert (inserted, updated, skipped) == (5, 2, 1) and result.unchanged == 1
+    assert result != db_manager.StockImportResult(inserted=5, updated=2, unchanged=0, skipped=1)
+
+
+def test_note_changes_feed():
+    _seed()
+    # 將既有筆記的更新時間往前移，模擬較早的寫入
+    connection = db_manager.get_db_connection()
+    connection.cursor().execute("UPDATE notes SET updated_at = datetime('now', 'localtime', '-60 seconds')")
+    connection.commit()
+    connection.close()
+
+    since = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S') + ',0'
+    first = db_manager.get_note_changes(since, limit=3)
+    second = db_manager.get_note_changes(first['next_cursor'], limit=3)
+    assert first['has_more'] and not second['has_more']
+    ids = [note['id'] for note in first['notes'] + second['notes']]
+    assert ids == sorted(note['id'] for note in db_manager.get_all_notes())
+
+    db_manager.update_note(ids[0], 'STORY', '改寫後的內容', None)
+    db_manager.delete_note(ids[1])
+
+    # 剛發生的變更在緩衝時間內不返回
+    held = db_manager.get_note_changes(second['next_cursor'])
+    assert held['notes'] == [] and held['deleted'] == []
+
+    settle = db_manager.NOTES_CHANGES_SETTLE_SECONDS
+    db_manager.NOTES_CHANGES_SETTLE_SECONDS = 0
+    try:
+        changes = db_manager.get_note_changes(second['next_cursor'])
+    finally:
+        db_manager.NOTES_CHANGES_SETTLE_SECONDS = settle
+    assert [note['content'] for note in changes['notes']] == ['改寫後的內容']
+    assert changes['deleted'] == [ids[1]]
+    assert not changes['reset']
+
+    # 股票更名（新增筆記、批次匯入、股票匯入）時，該股票的筆記也會出現在變更中
+    db_manager.add_note('2454', '聯發科技', 'TAG', '更名')
+    db_manager.add_notes_bulk([{'stock_code': '2303', 'stock_name': '聯華電子', 'note_type': 'TAG', 'content': '更名'}])
+    db_manager.import_stocks_from_iterable([{'stock_code': '2330', 'stock_name': '台灣積體電路'}])
+    db_manager.NOTES_CHANGES_SETTLE_SECONDS = 0
+    try:
+        changes = db_manager.get_note_changes(second['next_cursor'])
+    finally:
+        db_manager.NOTES_CHANGES_SETTLE_SECONDS = settle
+    names = {note['stock_code']: note['stock_name'] for note in changes['notes']}
+    assert names == {'2330': '台灣積體電路', '2454': '聯發科技', '2303': '聯華電子'}
+    assert len([note for note in changes['notes'] if note['stock_code'] == '2454']) == 3
+
+    # 早於刪除紀錄保留期限的游標需要重新載入
+    assert db_manager.get_note_changes('2000-01-01 00:00:00,0')['reset']
+
+    client = app.test_client()
+    assert client.get('/api/notes/changes?since=abc').status_code == 400
+    data = client.get('/api/notes/changes').get_json()
+    assert data['success'] and data['next_cursor'] and data['notes'] == []
+
+    # 頁面的同步起點游標在行程內快取，不必每次渲染都查詢
+    cursor = db_manager.current_changes_cursor()
+    assert cursor and db_manager.current_changes_cursor() == cursor
+    assert cursor in client.get('/').get_data(as_text=True)
+
+
+def _note_stats_snapshot():
+    connection = db_manager.get_db_connection()
+    try:
+        cursor = connection.cursor()
+        tables = {}
+        for table in ('stock_note_stats', 'stock_ref_stats', 'ref_stats'):
+            cursor.execute(f"SELECT * FROM {table} WHERE note_count > 0")
+            tables[table] = sorted(cursor.fetchall())
+        return tables
+    finally:
+        connection.close()
+
+
+def test_note_stats_follow_writes():
+    _seed()
+    summary = db_manager.get_stock_summary('2454')
+    assert summary['stock_name'] == '聯發科' and summary['note_count'] == 2
+    assert summary['note_types'] == {'TAG': 1, 'STORY': 1}
+    assert sorted(r['ref'] for r in summary['top_refs']) == ['經濟日報', '鉅亨網']
+    assert len(summary['last_note_at']) == 19
+
+    # 新增、批次新增、修改類型與來源、刪除後，增量維護的結果與重新計算相同
+    note = db_manager.add_note('2454', '聯發科', 'TAG', '邊緣AI', '經濟日報')
+    assert db_manager.add_notes_bulk([
+        {'stock_code': '2454', 'stock_name': None, 'note_type': 'STORY', 'content': '天璣旗艦晶片', 'ref': '鉅亨網',
+         'ref_time': None, 'created_at': datetime(2020, 1, 1)},
+        {'stock_code': '3008', 'stock_name': '大立光', 'note_type': 'TAG', 'content': '鏡頭', 'ref': '經濟日報',
+         'ref_time': None, 'created_at': None},
+    ]) == 2
+    assert db_manager.update_note(note['id'], 'STORY', '邊緣AI 手機', '工商時報')
+    assert db_manager.update_note(note['id'], 'STORY', '內容修改不影響統計', '工商時報')
+    assert db_manager.delete_note(note['id'])
+    assert db_manager.delete_note(1)  # 台積電唯一一筆：統計歸零後移除
+
+    summary = db_manager.get_stock_summary('2454')
+    assert summary['note_types'] == {'TAG': 1, 'STORY': 2}
+    assert summary['top_refs'][0] == {'ref': '鉅亨網', 'count': 2}
+    # 刪除最後一筆後，最後筆記時間回到剩下的筆記
+    assert summary['last_note_at'] == max(n['created_at'] for n in db_manager.get_all_notes('聯發科'))
+    assert db_manager.get_stock_summary('2330')['note_count'] == 0
+    assert db_manager.get_stock_summary('0000') is None
+
+    incremental = _note_stats_snapshot()
+    assert db_manager.rebuild_note_stats()
+    assert _note_stats_snapshot() == incremental
+    assert db_manager.get_ref_stats(2) == [{'ref': '經濟日報', 'count': 2}, {'ref': '鉅亨網', 'count': 2}]
+
+    client = app.test_client()
+    response = client.get('/api/stocks/2454/summary')
+    assert response.status_code == 200 and response.get_json()['summary']['note_count'] == 3
+    assert client.get('/api/stocks/0000/summary').status_code == 404
+    assert client.get('/api/refs?limit=1').get_json()['refs'] == [{'ref': '經濟日報', 'count': 2}]
+
+    # 刪除股票時筆記由外鍵串聯刪除（不經過 db_manager），統計仍與重新計算相同
+    _execute("DELETE FROM stocks WHERE stock_code = %s", ('2454',))
+    assert db_manager.get_stock_summary('2454') is None
+    incremental = _note_stats_snapshot()
+    assert not any(row[0] == '2454' for row in incremental['stock_note_stats'] + incremental['stock_ref_stats'])
+    assert db_manager.rebuild_note_stats()
+    assert _note_stats_snapshot() == incremental
+    assert sorted(r['ref'] for r in db_manager.get_ref_stats()) == ['工商時報', '經濟日報']
+    assert all(r['count'] == 1 for r in db_manager.get_ref_stats())
+
+
+def test_note_writes_retry_after_deadlock():
+    _seed()
+    # 第一次提交時發生死結（MySQL 已回滾整個交易）：重新執行整個交易，筆記與統計只寫入一次
+    original_sleep = db_manager.time.sleep
+    original_commit = SQLiteConnection.commit
+    failures = []
+
+    def deadlocked_commit(self):
+        if not failures:
+            failures.append(1)
+            error = db_manager.Error('Deadlock found when trying to get lock')
+            error.errno = db_manager.ER_LOCK_DEADLOCK
+            raise error
+        return original_commit(self)
+
+    db_manager.time.sleep = lambda seconds: None
+    SQLiteConnection.commit = deadlocked_commit
+    try:
+        note = db_manager.add_note('2330', '台積電', 'STORY', '法說會', '工商時報')
+    finally:
+        SQLiteConnection.commit = original_commit
+        db_manager.time.sleep = original_sleep
+
+    assert failures == [1] and note is not None
+    assert [n['id'] for n in db_manager.get_all_notes('台積電') if n['content'] == '法說會'] == [note['id']]
+    incremental = _note_stats_snapshot()
+    assert db_manager.rebuild_note_stats()
+    assert _note_stats_snapshot() == incremental
+
+    # 其他錯誤不重試
+    original_apply = db_manager._apply_note_stats
+    calls = []
+
+    def failing_apply(cursor, changes):
+        calls.append(1)
+        raise db_manager.Error('磁碟已滿')
+
+    db_manager._apply_note_stats = failing_apply
+    try:
+        assert db_manager.delete_note(note['id']) is False
+    finally:
+        db_manager._apply_note_stats = original_apply
+    assert calls == [1] and db_manager.get_note_by_id(note['id']) is not None
+
+
+def test_notes_columns_format_and_json_codec():
+    _seed()
+    client = app.test_client()
+    params = {'sort_by': 'stock_code', 'limit': 3}
+    plain = client.get('/api/notes', query_string=params)
+    columns = client.get('/api/notes', query_string=dict(params, format='columns'))
+    data = columns.get_json()
+    assert 'notes' not in data and data['total'] == 3
+    assert [dict(zip(data['columns'], row)) for row in data['rows']] == plain.get_json()['notes']
+    assert data['next_cursor'] == plain.get_json()['next_cursor']
+    assert len(columns.data) < len(plain.data)
+    # 兩種格式的 ETag 不同，不會以另一種格式的快取回應 304
+    assert plain.headers['ETag'] != columns.headers['ETag']
+
+    # 時間欄位與過去相同格式化到秒
+    note = db_manager.get_note_by_id(1)
+    assert datetime.strptime(note['created_at'], '%Y-%m-%d %H:%M:%S')
+    assert isinstance(note['updated_at'], datetime) and note['ref_time'] is None
+
+    # orjson 與標準函式庫的輸出內容相同（日期時間同 Flask 輸出 HTTP 日期）
+    import json
+    import json_codec
+    from decimal import Decimal
+    value = {'created_at': datetime(2024, 1, 2, 3, 4, 5), 'price': Decimal('612.5'), 1: '台積電'}
+    fast = json.loads(json_codec.dumps(value))
+    json_codec.ORJSON_ENABLED = False
+    try:
+        assert json.loads(json_codec.dumps(value)) == fast == {
+            'created_at': 'Tue, 02 Jan 2024 03:04:05 GMT', 'price': '612.5', '1': '台積電'}
+        assert client.get('/api/notes', query_string=params).get_json() == plain.get_json()
+    finally:
+        json_codec.ORJSON_ENABLED = True
+
+
+def test_list_queries_use_sort_indexes():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.extend([os.path.join(root, 'bench'), os.path.join(root, 'scripts')])
+    from dataset import seed
+    from check_query_plans import check_plans, is_regressed
+
+    # 資料量太少時最佳化器會選擇直接掃描，需有代表性的資料量（seed 會一併更新統計資料）
+    seed(200, 2000)
+    results = check_plans()
+    # 不搜尋與 LIKE 搜尋各 4 種排序，全文搜尋另有相關度排序，各含兩個方向的第一頁與後續頁
+    assert [sum(1 for _, mode, _, _ in results if mode == search_mode) for search_mode in (None, 'like', 'fulltext')] == [16, 16, 20]
+    assert [label for _, mode, label, plan in results if is_regressed(mode, plan)] == []
+    # 全文搜尋經由 FTS5 比對，不從頭讀取 notes 表
+    fulltext_plan = next(plan for _, mode, _, plan in results if mode == 'fulltext')
+    assert any('notes_fts VIRTUAL TABLE' in step for step in fulltext_plan.steps)
+    assert is_regressed('fulltext', fulltext_plan._replace(scanned=['n']))
+
+    # 移除索引後應被判定為退化
+    connection = db_manager.get_db_connection()
+    connection.cursor().execute("DROP INDEX idx_notes_note_type")
+    connection.commit()
+    connection.close()
+    db_manager.close_pool()  # sqlite3 的語句快取會沿用舊的查詢計畫
+    regressed = [label for _, mode, label, plan in check_plans() if is_regressed(mode, plan)]
+    assert regressed == [f'{prefix}note_type {order} {page}' for prefix in ('', 'LIKE 搜尋 ')
+                         for order in ('DESC', 'ASC') for page in ('第一頁', '後續頁')]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-v']))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+股票目錄快取測試腳本
+測試記憶體中股票搜尋的排名層級（代號完全相符、名稱完全相符、代號開頭、名稱開頭、名稱包含）與同排名內的代號排序，
+並與 SQL 搜尋（暫存的 SQLite 資料庫）比對結果順序，不需 MySQL 伺服器
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import tempfile
+
+import db_manager
+from db_backends import SQLiteBackend
+from stock_cache import StockDirectory
+
+
+def _codes(results):
+    return [stock['stock_code'] for stock in results]
+
+
+def _directory(stocks):
+    """以 (代號, 名稱) 列表建立股票目錄"""
+    directory = StockDirectory()
+    directory.load((code, name, None) for code, name in stocks)
+    return directory
+
+
+def test_ranking_tiers():
+    directory = _directory([
+        ('5', '其他'),
+        ('53', '建材'),
+        ('2305', '全友'),
+        ('9999', '5'),            # 2. 名稱完全相符
+        ('5000', '不相關'),        # 3. 代號開頭相符
+        ('5274', '信驊'),
+        ('0050', '元大台灣50'),    # 5. 名稱包含
+        ('0056', '元大高股息'),
+        ('1234', '5G概念'),        # 4. 名稱開頭相符
+        ('1111', '5奈米'),
+    ])
+
+    # 代號完全相符 > 名稱完全相符 > 代號開頭 > 名稱開頭 > 名稱包含，同排名內依代號（字串）排序
+    assert _codes(directory.search('5')) == ['5', '9999', '5000', '5274', '53', '1111', '1234', '0050']
+
+    # limit 截斷時取排名最前面的結果，同排名內取代號最小的
+    assert _codes(directory.search('5', limit=4)) == ['5', '9999', '5000', '5274']
+    assert _codes(directory.search('5', limit=7)) == ['5', '9999', '5000', '5274', '53', '1111', '1234']
+
+    # 英文不分大小寫；同一檔股票只出現一次（代號開頭與名稱包含都相符時取較前的排名）
+    directory = _directory([('TSM', '台積電ADR'), ('TSMX', 'tsm'), ('A1', 'TSMC美股'), ('B2', '美國tsm概念'), ('C3', '無關')])
+    assert _codes(directory.search('tsm')) == ['TSM', 'TSMX', 'A1', 'B2']
+    assert _codes(directory.search('無')) == ['C3']
+    assert directory.search('不存在') == []
+
+
+def test_upsert_moves_stock_between_tiers():
+    directory = StockDirectory()
+    directory.load([('2330', '台積電', '半導體'), ('1101', '台泥', '水泥'), ('2308', '台達電', None)])
+    assert _codes(directory.search('台')) == ['1101', '2308', '2330']
+
+    # 更名後只能以新名稱找到；未提供產業別時保留原值
+    directory.upsert('1101', '亞泥')
+    assert _codes(directory.search('台')) == ['2308', '2330']
+    assert _codes(directory.search('泥')) == ['1101']
+    assert directory.get('1101') == {'stock_code': '1101', 'stock_name': '亞泥', 'industry': '水泥'}
+
+    # 新增的股票依排名與代號排入既有結果之間
+    directory.upsert('2400', '台')
+    assert _codes(directory.search('台')) == ['2400', '2308', '2330']
+    assert _codes(directory.search('2')) == ['2308', '2330', '2400']
+
+
+def test_ranking_matches_sql_ordering():
+    rng = random.Random(4)
+    chars = '台積電聯華鴻海大立光中信金國泰富邦元股'
+    rows = {}
+    while len(rows) < 300:
+        code = ''.join(rng.choice('0123') for _ in range(rng.choice((2, 3, 4))))
+        name = ''.join(rng.choice(chars) for _ in range(rng.choice((1, 2, 3, 4))))
+        rows[code] = name
+    # 名稱與其他股票的代號相同（名稱完全相符與代號開頭同時出現）
+    rows['0122'] = '01'
+
+    directory = _directory(rows.items())
+
+    queries = ['0', '01', '012', '23', '3', '台', '台積', '電', '聯華', '金國', '富邦元', '股']
+    queries += rng.sample(sorted(set(rows.values())), 10) + rng.sample(sorted(rows), 10)
+
+    original_backend = db_manager.get_backend()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_manager.use_backend(SQLiteBackend(os.path.join(tmpdir, 'stock_note.db')))
+        try:
+            db_manager.import_stocks_from_iterable(
+                {'stock_code': code, 'stock_name': name} for code, name in rows.items()
+            )
+            for query in queries:
+                for limit in (1, 5, 10, 50):
+                    expected = _codes(db_manager._search_stocks_sql(query, limit))
+                    assert _codes(directory.search(query, limit)) == expected, f"{query!r} limit={limit}"
+        finally:
+            db_manager.use_backend(original_backend)
+
+
+if __name__ == "__main__":
+    tests = [
+        test_ranking_tiers,
+        test_upsert_moves_stock_between_tiers,
+        test_ranking_matches_sql_ordering,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Yahoo 搜尋結果寫回測試腳本
+測試寫回佇列的去重、只新增不存在的股票（暫存的 SQLite 資料庫，股票目錄過期時也不覆寫既有名稱），
+以及關閉時寫入佇列中剩餘的股票，不需 MySQL 伺服器或外部網路
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import time
+
+import pytest
+
+import db_manager
+from stock_cache import stock_directory
+from stock_promotion import StockPromoter
+
+
+pytestmark = pytest.mark.usefixtures('stock_db')
+
+
+class RecordingWriter:
+    """記錄每批寫入的股票，delay 秒後才返回"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, rows):
+        time.sleep(self.delay)
+        with self.lock:
+            self.batches.append([row['stock_code'] for row in rows])
+        return db_manager.StockImportResult(len(rows), 0, 0, 0)
+
+    def codes(self):
+        with self.lock:
+            return [code for batch in self.batches for code in batch]
+
+
+def test_submit_dedupes_and_skips_known_stocks():
+    stock_directory.load([('2330', '台積電', '半導體')])
+    writer = RecordingWriter()
+    promoter = StockPromoter(writer, flush_interval=0.05)
+
+    queued = promoter.submit([
+        {'code': '2330', 'name': 'TSMC'},         # 目錄中已有
+        {'code': '6789', 'name': '采鈺'},
+        {'code': '6789', 'name': '采鈺'},         # 同一批重複
+        {'code': '', 'name': '缺代號'},
+        {'code': '12345678901', 'name': '代號過長'},
+    ])
+    assert queued == 1
+    # 已排入的代號在 dedupe_ttl 內不再排入
+    assert promoter.submit([{'code': '6789', 'name': '采鈺'}]) == 0
+    promoter.flush()
+
+    assert writer.batches == [['6789']]
+    stats = promoter.stats()
+    assert stats['queued'] == 1 and stats['skipped'] == 5 and stats['written'] == 1
+    assert stats['pending'] == 0
+
+
+def test_promotion_never_overwrites_existing_stocks():
+    # 目錄是空的（例如其他 worker 或停用目錄快取），不能以目錄判斷股票是否已存在
+    assert db_manager.get_stock_by_code('2330')['stock_name'] == '台積電'
+    promoter = StockPromoter(db_manager.insert_missing_stocks, flush_interval=0.05)
+
+    assert promoter.submit([{'code': '2330', 'name': 'TAIWAN SEMICONDUCTOR'}, {'code': '6789', 'name': '采鈺'}]) == 2
+    promoter.flush()
+
+    stock = db_manager.get_stock_by_code('2330')
+    assert (stock['stock_name'], stock['industry']) == ('台積電', '半導體')
+    assert db_manager.get_stock_by_code('6789')['stock_name'] == '采鈺'
+    assert promoter.stats()['written'] == 1
+    # 目錄以資料庫中的值更新
+    assert stock_directory.get('2330')['stock_name'] == '台積電'
+    assert stock_directory.get('6789')['stock_name'] == '采鈺'
+
+    result = db_manager.insert_missing_stocks([
+        {'stock_code': '6789', 'stock_name': '另一個名稱'},
+        {'stock_code': '6790', 'stock_name': ''},
+    ])
+    assert result == db_manager.StockImportResult(inserted=0, updated=0, unchanged=1, skipped=1)
+    assert db_manager.get_stock_by_code('6789')['stock_name'] == '采鈺'
+
+
+def test_close_drains_pending_stocks():
+    writer = RecordingWriter(delay=0.05)
+    # 湊批等待時間很長：關閉時不應等到湊滿一批
+    promoter = StockPromoter(writer, batch_size=2, flush_interval=30)
+
+    codes = [str(code) for code in range(7001, 7006)]
+    assert promoter.submit([{'code': code, 'name': f'股票{code}'} for code in codes]) == 5
+
+    started = time.monotonic()
+    assert promoter.close(timeout=5)
+    assert time.monotonic() - started < 2
+    assert writer.codes() == codes
+    assert promoter.stats()['pending'] == 0
+
+    # 關閉後不再接受新的股票
+    assert promoter.submit([{'code': '7009', 'name': '股票7009'}]) == 0
+    assert promoter.stats()['dropped'] == 1
+
+    # 寫入太慢時在時限內返回
+    slow = StockPromoter(RecordingWriter(delay=0.3), batch_size=1, flush_interval=0.01)
+    slow.submit([{'code': code, 'name': f'股票{code}'} for code in codes[:3]])
+    assert not slow.close(timeout=0.1)
+    slow.flush()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-v']))
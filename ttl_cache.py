@@ -0,0 +1,77 @@
+"""
+有容量上限的 LRU + TTL 快取（執行緒安全）
+- 超過 maxsize 時淘汰最久未使用的項目
+- 每個項目可設定各自的存活秒數（例如空結果使用較短的負快取時間）
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# get() 找不到項目時的預設返回值（快取的值本身可能是空列表或 None）
+MISSING = object()
+
+
+class TTLCache:
+    """
+    參數:
+        maxsize: 最多保留的項目數
+        ttl: 預設存活秒數
+    """
+
+    def __init__(self, maxsize=256, ttl=300):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (過期時間, 值)
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+        }
+
+    def get(self, key, default=MISSING):
+        """取得未過期的項目，找不到時返回 default"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return value
+                del self._data[key]
+                self._stats['expirations'] += 1
+            self._stats['misses'] += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """存入項目，ttl 為 None 時使用預設存活秒數"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """返回命中/未命中/淘汰等統計資料"""
+        with self._lock:
+            data = dict(self._stats)
+            data['size'] = len(self._data)
+            data['maxsize'] = self.maxsize
+        return data
@@ -0,0 +1,9 @@
+"""
+WSGI 入口
+生產環境啟動方式：gunicorn -c gunicorn.conf.py wsgi:application
+"""
+
+from app import app as application
+
+if __name__ == '__main__':
+    application.run(host='0.0.0.0', port=5000)